@@ -0,0 +1,79 @@
+"""Measure the time to write a corpus shard of many documents, to open it,
+to read random documents from it and to iterate over all of them.
+
+Usage:
+    python -m benchmarks.corpus_shard [-n COUNT] [-s SAMPLE] [FILE]
+
+FILE can either be a pdf, converted once with pdftohtml before the
+benchmark, or an already converted xml file, written COUNT times to the
+shard. Defaults to the test xml file.
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from pdf_parser.pdf_parse import parse_pdf_xml
+from pdf_parser.tools.corpus import (CorpusShard, CorpusShardWriter,
+                                     SHARD_DATA_EXTENSION)
+from benchmarks.xml_parsers import _convert
+
+
+def _timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('file', nargs='?', default='tests/pdfs/test_pdf.xml')
+    parser.add_argument('-n', '--count', type=int, default=100000)
+    parser.add_argument('-s', '--sample', type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.file.endswith('.xml'):
+            xml_path = args.file
+        else:
+            xml_path = _convert(args.file, tmp_dir)
+        pdf_file = parse_pdf_xml(xml_path, compact=True)
+        hashes = ['{:032x}'.format(i) for i in range(args.count)]
+        path = os.path.join(tmp_dir, 'corpus')
+
+        def write():
+            with CorpusShardWriter(path) as writer:
+                for file_hash in hashes:
+                    writer.add(file_hash, pdf_file)
+
+        def read_random():
+            for file_hash in random.sample(hashes, args.sample):
+                shard.get(file_hash).get_page(-1)
+
+        def iterate():
+            for _, document in shard:
+                document.get_text()
+
+        write_time, _ = _timed(write)
+        open_time, shard = _timed(lambda: CorpusShard(path))
+        index_time, _ = _timed(lambda: shard.get(hashes[0]))
+        random_time, _ = _timed(read_random)
+        iterate_time, _ = _timed(iterate)
+
+        size = os.path.getsize(path + SHARD_DATA_EXTENSION)
+        print('{} documents, {} MB'.format(args.count, size // 2 ** 20))
+        print('write:       {:10.2f} ms/document'.format(
+            write_time * 1000 / args.count
+        ))
+        print('open:        {:10.2f} ms'.format(open_time * 1000))
+        print('index:       {:10.2f} ms'.format(index_time * 1000))
+        print('random read: {:10.3f} ms/document'.format(
+            random_time * 1000 / args.sample
+        ))
+        print('iteration:   {:10.3f} ms/document'.format(
+            iterate_time * 1000 / args.count
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Measure the startup time of the keyword matcher, with and without its
+saved automaton, and its matching time per document, for growing numbers of
+keywords.
+
+Usage:
+    python -m benchmarks.keyword_matcher [-r REPEAT] [-k COUNT ...] [FILE ...]
+
+FILE can either be a pdf, converted once with pdftohtml before the
+benchmark, or an already converted xml file. Defaults to the test xml file.
+The keywords are random words, along with a few words of the documents.
+"""
+import argparse
+import os
+import random
+import string
+import tempfile
+import time
+from pdf_parser.pdf_parse import parse_pdf_xml
+from pdf_parser.tools import extraction
+from tools.utils import load_keyword_matcher
+from benchmarks.xml_parsers import _convert
+
+
+def _write_keywords(path, count, documents):
+    """Write a keyword file of (int)count keywords, including some of the
+    documents' words so that they match.
+    """
+    words = set()
+    for pdf_file in documents:
+        for text in pdf_file.iter_lines_texts():
+            words.update(word.lower() for word in text.split() if word)
+    keywords = sorted(words)[:count // 100]
+    rand = random.Random(count)
+    while len(keywords) < count:
+        keywords.append(' '.join(
+            ''.join(rand.choice(string.ascii_lowercase)
+                    for _ in range(rand.randint(4, 10)))
+            for _ in range(rand.randint(1, 4))
+        ))
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(keywords))
+
+
+def _load(keywords_path):
+    """Return the matcher and the time it took to load, emptying the cache
+    of the automatons of the process first.
+    """
+    extraction._automatons.clear()
+    start = time.perf_counter()
+    matcher = load_keyword_matcher(keywords_path)
+    return matcher, time.perf_counter() - start
+
+
+def measure(keywords_path, documents, repeat):
+    """Return the build, load and best per document matching times, and the
+    size of the saved matcher.
+    """
+    matcher, build_time = _load(keywords_path)
+    load_time = min(_load(keywords_path)[1] for _ in range(repeat))
+
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for pdf_file in documents:
+            pdf_file.get_lines_by_keywords(matcher, 2)
+        timings.append((time.perf_counter() - start) / len(documents))
+    return build_time, load_time, min(timings), os.path.getsize(matcher.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    parser.add_argument('-k', '--keywords', type=int, nargs='+',
+                        default=[1000, 10000, 100000])
+    args = parser.parse_args()
+
+    files = args.files or ['tests/pdfs/test_pdf.xml']
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        documents = []
+        for path in files:
+            if path.endswith('.xml'):
+                xml_path = path
+            else:
+                xml_path = _convert(path, tmp_dir)
+            documents.append(parse_pdf_xml(xml_path, compact=True))
+
+        print('{:>10} {:>12} {:>12} {:>16} {:>12}'.format(
+            'keywords', 'build (ms)', 'load (ms)', 'match (ms/doc)',
+            'saved (kB)'
+        ))
+        for count in args.keywords:
+            keywords_path = os.path.join(tmp_dir, '{}.txt'.format(count))
+            _write_keywords(keywords_path, count, documents)
+            build_time, load_time, match_time, size = measure(
+                keywords_path,
+                documents,
+                args.repeat
+            )
+            print('{:>10} {:>12.2f} {:>12.2f} {:>16.3f} {:>12}'.format(
+                count,
+                build_time * 1000,
+                load_time * 1000,
+                match_time * 1000,
+                size // 1024,
+            ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Compare the throughput and peak memory of the pdf parsing backends on a
+corpus of pdf documents.
+
+Usage:
+    python -m benchmarks.parser_backends [-b BACKEND ...] [PATH ...]
+
+PATH can either be a pdf or a folder, whose pdfs are all converted (for
+instance the pdfs of one provider). Defaults to the test pdfs. The peak
+memory includes the backends' subprocesses.
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import time
+from pdf_parser.backends import get_backend, list_backends
+
+
+def _list_pdfs(paths):
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files.extend(sorted(
+                glob.glob(os.path.join(path, '**', '*.pdf'), recursive=True)
+            ))
+        else:
+            files.append(path)
+    return files
+
+
+def _measure(backend_name, files, queue):
+    """Run in a child process, so the peak RSS of each backend is isolated.
+    """
+    parse = get_backend(backend_name)
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    pages = failures = 0
+    start = time.perf_counter()
+    for path in files:
+        with open(path, 'rb') as f:
+            try:
+                pdf_file = parse(f, compact=True)
+            except (ImportError, FileNotFoundError) as e:
+                queue.put(str(e))
+                return
+        if pdf_file is None:
+            failures += 1
+        else:
+            pages += len(pdf_file.pages)
+    duration = time.perf_counter() - start
+    peak_rss = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_rss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    queue.put((pages, failures, duration, peak_rss))
+
+
+def measure(backend_name, files):
+    """Return the number of pages converted, the number of failed documents,
+    the total duration and the peak RSS of a backend on the files, or an
+    error message if the backend isn't available.
+    """
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_measure,
+        args=(backend_name, files, queue)
+    )
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('paths', nargs='*')
+    parser.add_argument('-b', '--backends', nargs='+',
+                        default=['pdftotext', 'pdfminer', 'poppler'],
+                        choices=list_backends())
+    args = parser.parse_args()
+
+    files = _list_pdfs(args.paths or ['tests/pdfs'])
+    print('{} documents'.format(len(files)))
+    print('{:<10} {:>8} {:>8} {:>10} {:>10} {:>14}'.format(
+        'backend', 'pages', 'failed', 'time (s)', 'pages/s', 'peak rss (kB)'
+    ))
+    for backend_name in args.backends:
+        result = measure(backend_name, files)
+        if isinstance(result, str):
+            print('{:<10} {}'.format(backend_name, result))
+            continue
+        pages, failures, duration, rss = result
+        print('{:<10} {:>8} {:>8} {:>10.2f} {:>10.1f} {:>14}'.format(
+            backend_name,
+            pages,
+            failures,
+            duration,
+            pages / duration if duration else 0,
+            rss,
+        ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Compare the memory footprint and build time of PdfFile and
+CompactPdfFile objects parsed from the pdftohtml xml output of a set of
+documents.
+
+Usage:
+    python -m benchmarks.pdf_file_memory [-r REPEAT] [FILE ...]
+
+FILE can either be a pdf, converted once with pdftohtml before the
+benchmark, or an already converted xml file. Defaults to the test pdfs.
+"""
+import argparse
+import gc
+import glob
+import os
+import tempfile
+import time
+import tracemalloc
+from pdf_parser.pdf_parse import parse_pdf_xml
+from benchmarks.xml_parsers import _convert
+
+
+def measure(xml_path, compact, repeat):
+    """Return the best parsing time and the memory held by the result."""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse_pdf_xml(xml_path, compact)
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    pdf_file = parse_pdf_xml(xml_path, compact)
+    gc.collect()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del pdf_file
+    return min(timings), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    files = args.files or glob.glob('tests/pdfs/*.pdf')
+    with tempfile.TemporaryDirectory() as xml_dir:
+        print('{:<40} {:>8} {:>12} {:>12}'.format(
+            'file', 'object', 'best (ms)', 'memory (kB)'
+        ))
+        for path in files:
+            if path.endswith('.xml'):
+                xml_path = path
+            else:
+                xml_path = _convert(path, xml_dir)
+            for name, compact in [('PdfFile', False), ('Compact', True)]:
+                timing, size = measure(xml_path, compact, args.repeat)
+                print('{:<40} {:>8} {:>12.2f} {:>12}'.format(
+                    os.path.basename(path)[:40],
+                    name,
+                    timing * 1000,
+                    size // 1024,
+                ))
+
+
+if __name__ == '__main__':
+    main()
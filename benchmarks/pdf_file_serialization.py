@@ -0,0 +1,97 @@
+"""Compare the json and binary serializations of parsed documents: the time
+to dump and load them, and their size.
+
+Usage:
+    python -m benchmarks.pdf_file_serialization [-r REPEAT] [FILE ...]
+
+FILE can either be a pdf, converted once with pdftohtml before the
+benchmark, or an already converted xml file. Defaults to the test pdfs.
+"""
+import argparse
+import glob
+import os
+import tempfile
+import time
+from pdf_parser.pdf_parse import parse_pdf_xml
+from pdf_parser.objects.PdfObjects import PdfFile, CompactPdfFile
+from benchmarks.xml_parsers import _convert
+
+
+def _best_time(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def measure_json(pdf_file, path, repeat):
+    """Return the dump and load times of the json serialization, and its
+    size.
+    """
+    def dump():
+        with open(path, 'w') as f:
+            f.write(pdf_file.to_json())
+
+    def load():
+        with open(path, 'r') as f:
+            PdfFile().from_json(f.read())
+
+    return _best_time(dump, repeat), _best_time(load, repeat), \
+        os.path.getsize(path)
+
+
+def measure_binary(compact_pdf_file, path, repeat):
+    """Return the dump and load times of the binary serialization, and its
+    size. Loading includes reading the last page, the others being built on
+    access only.
+    """
+    def load():
+        CompactPdfFile.load(path).get_page(-1)
+
+    return _best_time(lambda: compact_pdf_file.save(path), repeat), \
+        _best_time(load, repeat), os.path.getsize(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    files = args.files or glob.glob('tests/pdfs/*.pdf')
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        print('{:<40} {:>8} {:>10} {:>10} {:>10}'.format(
+            'file', 'format', 'dump (ms)', 'load (ms)', 'size (kB)'
+        ))
+        for path in files:
+            if path.endswith('.xml'):
+                xml_path = path
+            else:
+                xml_path = _convert(path, tmp_dir)
+            compact_pdf_file = parse_pdf_xml(xml_path, compact=True)
+            results = [
+                ('json', measure_json(
+                    compact_pdf_file.to_pdf_file(),
+                    os.path.join(tmp_dir, 'pdf_file.json'),
+                    args.repeat
+                )),
+                ('binary', measure_binary(
+                    compact_pdf_file,
+                    os.path.join(tmp_dir, 'pdf_file.bin'),
+                    args.repeat
+                )),
+            ]
+            for name, (dump_time, load_time, size) in results:
+                print('{:<40} {:>8} {:>10.2f} {:>10.2f} {:>10}'.format(
+                    os.path.basename(path)[:40],
+                    name,
+                    dump_time * 1000,
+                    load_time * 1000,
+                    size // 1024,
+                ))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,91 @@
+"""Compare the lxml streaming parser against the BeautifulSoup one on the
+pdftohtml xml output of a set of documents.
+
+Usage:
+    python -m benchmarks.xml_parsers [-r REPEAT] [FILE ...]
+
+FILE can either be a pdf, converted once with pdftohtml before the
+benchmark, or an already converted xml file. Defaults to the test pdfs.
+"""
+import argparse
+import glob
+import multiprocessing
+import os
+import resource
+import subprocess
+import tempfile
+import time
+from pdf_parser.pdf_parse import parse_pdf_xml, parse_pdf_xml_soup
+
+PARSERS = {
+    'lxml': parse_pdf_xml,
+    'soup': parse_pdf_xml_soup,
+}
+
+
+def _convert(pdf_path, xml_dir):
+    xml_path = os.path.join(
+        xml_dir,
+        os.path.basename(pdf_path) + '.xml'
+    )
+    subprocess.check_call(
+        ['pdftohtml', '-i', '-xml', pdf_path, xml_path],
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    return xml_path
+
+
+def _measure(parser_name, xml_path, repeat, queue):
+    """Run in a child process, so the peak RSS of each parser is isolated."""
+    parse = PARSERS[parser_name]
+    base_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(xml_path)
+        timings.append(time.perf_counter() - start)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    queue.put((min(timings), peak_rss - base_rss))
+
+
+def measure(parser_name, xml_path, repeat):
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(
+        target=_measure,
+        args=(parser_name, xml_path, repeat, queue)
+    )
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('files', nargs='*')
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    files = args.files or glob.glob('tests/pdfs/*.pdf')
+    with tempfile.TemporaryDirectory() as xml_dir:
+        print('{:<40} {:>6} {:>12} {:>14}'.format(
+            'file', 'parser', 'best (ms)', 'peak rss (kB)'
+        ))
+        for path in files:
+            if path.endswith('.xml'):
+                xml_path = path
+            else:
+                xml_path = _convert(path, xml_dir)
+            for parser_name in PARSERS:
+                timing, rss = measure(parser_name, xml_path, args.repeat)
+                print('{:<40} {:>6} {:>12.2f} {:>14}'.format(
+                    os.path.basename(path)[:40],
+                    parser_name,
+                    timing * 1000,
+                    rss,
+                ))
+
+
+if __name__ == '__main__':
+    main()
@@ -83,3 +83,13 @@ CREATE TABLE IF NOT EXISTS publications_subjects
     id_subject INT REFERENCES "subject",
     PRIMARY KEY(id_publication, id_subject)
 );
+
+CREATE TABLE IF NOT EXISTS download
+(
+    url TEXT PRIMARY KEY,
+    etag VARCHAR(1024),
+    last_modified VARCHAR(64),
+    content_length BIGINT,
+    datetime_creation TIMESTAMP,
+    datetime_update TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
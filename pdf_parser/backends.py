@@ -0,0 +1,58 @@
+"""The pdf parsing backends, by name.
+
+A backend is a function converting a pdf file object into a PdfFile, with the
+signature of parse_pdf_document:
+
+    backend(document, limits=None, first_page=None, last_page=None,
+            compact=False)
+
+It returns None if the document couldn't be converted. The backend used by the
+pipeline is selected by the PARSING_METHOD setting.
+
+All the backends build their PdfFiles the way pdftohtml's output is parsed:
+the lines are grouped from (top, height, string) words by _PdfFileBuilder, so
+they have no boldness nor font face, and the section titles are found the
+same way whatever the backend. Only the extracted text and the measured
+heights can differ.
+"""
+from .pdf_parse import parse_pdf_document
+from .pdfminer_parse import parse_pdf_document_pdfminer
+from .poppler_parse import parse_pdf_document_poppler
+
+DEFAULT_BACKEND = 'pdftotext'
+
+_backends = {}
+
+
+def register_backend(name, backend):
+    """Make the parsing function backend available as (str)name."""
+    _backends[name] = backend
+
+
+def get_backend(name=None):
+    """Return the parsing function registered as (str)name, or the default
+    backend if name is None.
+
+    Raises:
+        - ValueError if no backend is registered as name.
+    """
+    try:
+        return _backends[name or DEFAULT_BACKEND]
+    except KeyError:
+        raise ValueError('Unknown pdf parsing backend {!r} ({})'.format(
+            name,
+            '|'.join(sorted(_backends)),
+        ))
+
+
+def list_backends():
+    """Return the names of the registered backends."""
+    return sorted(_backends)
+
+
+# pdftohtml (poppler) xml output, registered under the historical name of
+# the setting as well
+register_backend('pdftotext', parse_pdf_document)
+register_backend('pdftohtml', parse_pdf_document)
+register_backend('pdfminer', parse_pdf_document_pdfminer)
+register_backend('poppler', parse_pdf_document_poppler)
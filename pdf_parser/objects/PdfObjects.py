@@ -1,8 +1,13 @@
 import re
+import sys
 import attr
 import json
 import math
-import ahocorasick
+import mmap
+import struct
+from array import array
+
+from ..tools.extraction import KeywordMatcher
 
 
 @attr.s
@@ -22,6 +27,15 @@ class PdfLine(object):
     font_face = attr.ib(default='', type=str)
 
 
+def _join_lines_texts(texts, ignore_page_numbers=False):
+    """Return the text of a page given the text of its lines. If the argument
+    ignore_page_number is True, ignore the lines containing only digits.
+    """
+    if ignore_page_numbers:
+        texts = [text for text in texts if not text.isdigit()]
+    return '\n'.join(texts)
+
+
 @attr.s
 class PdfPage(object):
     """Represent a page of text from a pdf file, defined by the following
@@ -33,6 +47,9 @@ class PdfPage(object):
     lines = attr.ib(default=[], type=list)
     number = attr.ib(default=0, type=int)
 
+    def __attrs_post_init__(self):
+        self._page_texts = {}
+
     def display_page(self):
         """Print the content of the whole page."""
         for line in self.lines:
@@ -42,16 +59,170 @@ class PdfPage(object):
         """Return a string containing the content of the page. If the argument
         ignore_page_number is True, try to ignore page number when it
         is possible.
+
+        The text is built once, on the first call.
+        """
+        if ignore_page_numbers not in self._page_texts:
+            self._page_texts[ignore_page_numbers] = _join_lines_texts(
+                [line.text for line in self.lines],
+                ignore_page_numbers
+            )
+        return self._page_texts[ignore_page_numbers]
+
+
+class BasePdfFile(object):
+    """Methods shared by the pdf file representations.
+
+    The font statistics are computed once, from an index of the lines by
+    font size built on the first query. Likewise, the text of the document
+    and the position of each line in it are computed once.
+
+    Subclasses implement _build_font_size_index, _build_text_index and
+    _get_line_key, and call _reset_indexes whenever their lines change.
+    """
+
+    def _reset_indexes(self):
+        self._font_size_index = None
+        self._font_size_list = None
+        self._font_statistics = None
+        self._text_index = None
+
+    def _build_font_size_index(self):
+        """Return a dictionary of the lines (or line references) of the file,
+        in document order, by font size.
+        """
+        raise NotImplementedError
+
+    def _get_font_size_index(self):
+        if self._font_size_index is None:
+            self._font_size_index = self._build_font_size_index()
+        return self._font_size_index
+
+    def _get_font_statistics(self):
+        """Return the mean font size, and the mean of the font sizes above
+        it, weighting each size by its number of lines.
+        """
+        if self._font_statistics is None:
+            counts = [
+                (size, len(lines))
+                for size, lines in self._get_font_size_index().items()
+            ]
+            total_fonts = sum(count for _, count in counts)
+            sum_size = sum(size * count for size, count in counts)
+            mean = math.ceil(sum_size / max(total_fonts, 1))
+
+            upper_counts = [(s, count) for s, count in counts if s > mean]
+            total_fonts = sum(count for _, count in upper_counts)
+            sum_size = sum(size * count for size, count in upper_counts)
+            upper_mean = int(sum_size / max(total_fonts, 1))
+
+            self._font_statistics = (mean, upper_mean)
+        return self._font_statistics
+
+    def get_mean_font_size(self):
+        """Return the mean of the pdf file font sizes."""
+        return self._get_font_statistics()[0]
+
+    def get_upper_mean_font_size(self):
+        """Return the mean of all fonts ubove the average size."""
+        return self._get_font_statistics()[1]
+
+    def _build_text_index(self):
+        """Return a (text, line offsets, page end offsets) tuple, where text is
+        the concatenation of the text of the pages (skipping the pages
+        containing only page numbers), line offsets the position of each
+        line in it (by line key), and page end offsets the position of the
+        end of each page in it.
+        """
+        raise NotImplementedError
+
+    def _get_line_key(self, line):
+        """Return the key of a line of the file in the line offsets."""
+        raise NotImplementedError
+
+    def _get_text_index(self):
+        if self._text_index is None:
+            self._text_index = self._build_text_index()
+        return self._text_index
+
+    def get_text(self):
+        """Return the text of the document: the text of all its pages, except
+        those containing nothing but page numbers.
+        """
+        return self._get_text_index()[0]
+
+    def get_line_offset(self, line):
+        """Return the position of a PdfLine of this file in get_text()."""
+        return self._get_text_index()[1][self._get_line_key(line)]
+
+    def get_page_end_offset(self, page_number):
+        """Return the position of the end of the page (int)page_number in
+        get_text().
+        """
+        return self._get_text_index()[2][page_number]
+
+    def get_font_size_list(self):
+        """Return a list containing all the font sizes in the pdf file."""
+        if self._font_size_list is None:
+            # The order of the sizes matters to the title detection: add
+            # them one by one, in document order, as a set of all the
+            # lines' sizes would.
+            font_sizes = set()
+            for font_size in self._get_font_size_index():
+                font_sizes.add(font_size)
+            self._font_size_list = list(font_sizes)
+        return list(self._font_size_list)
+
+    def _keyword_is_in_line(self, line, pattern):
+        return pattern.search(line)
+
+    def get_lines_by_keyword(self, keyword, context=0):
+        """Return a list of lines containing (string)keyword."""
+        lines_results = []
+        pattern = re.compile(''.join([
+            '(^|\W)',
+            keyword,
+            '(\W|$)'
+        ]))
+        if context > 0:
+            for page in self.pages:
+                lines = []
+                for num, line in enumerate(page.lines):
+                    if self._keyword_is_in_line(line.text, pattern):
+                        first_line = max(0, num - context)
+                        last_line = min(len(page.lines), num + context + 1)
+                        lines = page.lines[first_line:last_line]
+                lines_results.extend(list(map(lambda x: x.text, lines)))
+        else:
+            for page in self.pages:
+                lines = list(filter(
+                    lambda x: self._keyword_is_in_line(
+                        x.text,
+                        pattern
+                    ),
+                    page.lines
+                ))
+                lines_results.extend([line.text for line in lines])
+
+        return lines_results
+
+    def iter_lines_texts(self):
+        """Iterate over the text of all the lines of the file."""
+        raise NotImplementedError
+
+    def get_lines_by_keywords(self, keywords, context=0):
+        """Return a dictionary of lines containing one of the keyboards array
+        (or a KeywordMatcher built from them), ordered by keyword.
         """
-        if ignore_page_numbers:
-            result = list(filter(lambda x: not x.text.isdigit(), self.lines))
-            return '\n'.join(list(map(lambda x: x.text, result)))
+        if isinstance(keywords, KeywordMatcher):
+            matcher = keywords
         else:
-            return '\n'.join(list(map(lambda x: x.text, self.lines)))
+            matcher = KeywordMatcher(keywords)
+        return matcher.find_lines(self.iter_lines_texts(), context)
 
 
 @attr.s
-class PdfFile(object):
+class PdfFile(BasePdfFile):
     """Represent a pdf file, defined by the following attributes:
         - (PdfPage[])pages    : An ordered list of all the pages from the pdf.
         - (boolean)has_bold   : True if the pdf has at least one bold line,
@@ -60,6 +231,9 @@ class PdfFile(object):
     pages = attr.ib(default=[], type=list)
     has_bold = attr.ib(default=False, type=bool)
 
+    def __attrs_post_init__(self):
+        self._reset_indexes()
+
     def from_json(self, json_pdf):
         """Initialize a PdfFile object from a json representation."""
         dict_pdf = json.loads(json_pdf)
@@ -76,6 +250,7 @@ class PdfFile(object):
             pdf_pages.append(pdf_page)
         self.pages = pdf_pages
         self.has_bold = dict_pdf.get('has_bold', False)
+        self._reset_indexes()
 
     def to_json(self):
         """Return a dictionary representation of the PdfFile."""
@@ -85,51 +260,63 @@ class PdfFile(object):
     def add_page(self, pdf_page):
         """Add a PdfPage to the pages list."""
         self.pages.append(pdf_page)
+        self._reset_indexes()
+
+    def extend(self, pdf_file, page_offset=0):
+        """Append the pages of another PdfFile, adding (int)page_offset to
+        their page numbers.
+        """
+        for page in pdf_file.pages:
+            lines = [
+                attr.evolve(line, page_number=line.page_number + page_offset)
+                for line in page.lines
+            ]
+            self.pages.append(PdfPage(lines, page.number + page_offset))
+        self.has_bold = self.has_bold or pdf_file.has_bold
+        self._reset_indexes()
 
     def get_page(self, page_number):
         """Return the PdfPage for the argument (int)page_number."""
         return self.pages[page_number]
 
-    def get_mean_font_size(self):
-        """Return the mean of the pdf file font sizes."""
-        sum_size = 0
-        total_fonts = 0
+    def _build_font_size_index(self):
+        font_size_index = {}
         for page in self.pages:
             for line in page.lines:
-                sum_size += line.size
-                total_fonts += 1
-        return math.ceil(sum_size / max(total_fonts, 1))
+                font_size_index.setdefault(line.size, []).append(line)
+        return font_size_index
 
-    def get_upper_mean_font_size(self):
-        """Return the mean of all fonts ubove the average size."""
-        basic_mean = self.get_mean_font_size()
-        sum_size = 0
-        total_fonts = 0
+    def _build_text_index(self):
+        texts = []
+        line_offsets = {}
+        page_end_offsets = []
+        position = 0
+        for page in self.pages:
+            if page.get_page_text(True):
+                page_text = page.get_page_text()
+                line_position = position
+                for line in page.lines:
+                    line_offsets[id(line)] = line_position
+                    line_position += len(line.text) + 1
+                texts.append(page_text)
+                position += len(page_text)
+            else:
+                for line in page.lines:
+                    line_offsets[id(line)] = position
+            page_end_offsets.append(position)
+        return ''.join(texts), line_offsets, page_end_offsets
+
+    def _get_line_key(self, line):
+        return id(line)
+
+    def iter_lines_texts(self):
         for page in self.pages:
             for line in page.lines:
-                if line.size > basic_mean:
-                    sum_size += line.size
-                    total_fonts += 1
-        return int(sum_size / max(total_fonts, 1))
+                yield line.text
 
     def get_lines_by_font_size(self, font_size):
         """Return all the lines of (int)font_size size."""
-        lines_results = []
-        for page in self.pages:
-            lines = [line for line in page.lines if line.size == font_size]
-            lines = list(filter(lambda x: x.size == font_size, page.lines))
-            lines_results.extend(lines)
-
-        return lines_results
-
-    def get_font_size_list(self):
-        """Return a list containing all the font sizes in the pdf file."""
-        font_sizes = []
-        for page in self.pages:
-            lines = [line.size for line in page.lines]
-            font_sizes.extend(list(lines))
-        # Convert to set and back to list to remove duplicates
-        return list(set(font_sizes))
+        return list(self._get_font_size_index().get(font_size, []))
 
     def get_bold_lines(self):
         """Return all the bold lines in the document."""
@@ -141,70 +328,352 @@ class PdfFile(object):
 
         return lines_results
 
-    def _keyword_is_in_line(self, line, pattern):
-        return pattern.search(line)
 
-    def get_lines_by_keyword(self, keyword, context=0):
-        """Return a list of lines containing (string)keyword."""
-        lines_results = []
-        pattern = re.compile(''.join([
-            '(^|\W)',
-            keyword,
-            '(\W|$)'
-        ]))
-        if context > 0:
-            for page in self.pages:
-                lines = []
-                for num, line in enumerate(page.lines):
-                    if self._keyword_is_in_line(line.text, pattern):
-                        first_line = max(0, num - context)
-                        last_line = min(len(page.lines), num + context + 1)
-                        lines = page.lines[first_line:last_line]
-                lines_results.extend(list(map(lambda x: x.text, lines)))
-        else:
-            for page in self.pages:
-                lines = list(filter(
-                    lambda x: self._keyword_is_in_line(
-                        x.text,
-                        pattern
-                    ),
-                    page.lines
-                ))
-                lines_results.extend([line.text for line in lines])
+# The binary format of CompactPdfFile objects is made of a header, the font
+# faces as a json list, the page table and line columns in the order of
+# _BINARY_COLUMNS, in native byte order, and the text of the lines. Each part
+# starts on an 8 bytes boundary.
+_BINARY_MAGIC = b'PDFC'
+_BINARY_VERSION = 1
+# magic, version, byte order, has_bold, line count, page count, font faces
+# size, text size
+_BINARY_HEADER = struct.Struct('<4sHBBIIII')
+# name, typecode, and the column's length relative to the lines or pages
+_BINARY_COLUMNS = [
+    ('page_offsets', 'I', 'pages', 1),
+    ('page_numbers', 'i', 'pages', 0),
+    ('sizes', 'h', 'lines', 0),
+    ('bold', 'b', 'lines', 0),
+    ('line_page_numbers', 'i', 'lines', 0),
+    ('font_ids', 'H', 'lines', 0),
+    ('text_offsets', 'I', 'lines', 1),
+]
+_BYTE_ORDERS = {'little': 0, 'big': 1}
 
-        return lines_results
 
-    def get_lines_by_keywords(self, keywords, context=0):
-        """Return a dictionary of lines containing one of the keyboards array,
-        ordered by keyword.
+def _align(offset):
+    return (offset + 7) & ~7
+
+
+class _CompactPages(object):
+    """A read-only sequence of the pages of a CompactPdfFile, built on access.
+    """
+
+    def __init__(self, pdf_file):
+        self._pdf_file = pdf_file
+
+    def __len__(self):
+        return len(self._pdf_file.page_numbers)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return self._pdf_file.get_page(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._pdf_file.get_page(index)
+
+
+@attr.s
+class CompactPdfFile(BasePdfFile):
+    """Represent a pdf file in a columnar way: rather than a PdfLine object for
+    each line, the attributes of the lines are stored in arrays and their
+    texts in a single utf-8 buffer. PdfPage and PdfLine objects are built on
+    access. The file can be saved in a binary form of these attributes, and
+    loaded back without copying them (see from_bytes). Defined by the
+    following attributes:
+        - (array)sizes              : The font size of each line.
+        - (array)bold               : 1 if the line is bold, else 0.
+        - (array)line_page_numbers  : The page number of each line.
+        - (array)font_ids           : The index of each line's font face in
+                                      font_faces.
+        - (str[])font_faces         : The distinct font faces of the file.
+        - (bytearray)text           : The text of all the lines.
+        - (array)text_offsets       : The start of each line's text in `text`,
+                                      followed by the end of the last one.
+        - (array)page_offsets       : The index of the first line of each
+                                      page, followed by the number of lines.
+        - (array)page_numbers       : The number of each page.
+        - (boolean)has_bold         : True if the pdf has at least one bold
+                                      line, else False.
+    """
+    sizes = attr.ib(default=attr.Factory(lambda: array('h')))
+    bold = attr.ib(default=attr.Factory(lambda: array('b')))
+    line_page_numbers = attr.ib(default=attr.Factory(lambda: array('i')))
+    font_ids = attr.ib(default=attr.Factory(lambda: array('H')))
+    font_faces = attr.ib(default=attr.Factory(list))
+    text = attr.ib(default=attr.Factory(bytearray))
+    text_offsets = attr.ib(default=attr.Factory(lambda: array('I', [0])))
+    page_offsets = attr.ib(default=attr.Factory(lambda: array('I', [0])))
+    page_numbers = attr.ib(default=attr.Factory(lambda: array('i')))
+    has_bold = attr.ib(default=False, type=bool)
+
+    def __attrs_post_init__(self):
+        self._font_index = {
+            font_face: font_id
+            for font_id, font_face in enumerate(self.font_faces)
+        }
+        self._reset_indexes()
+
+    @classmethod
+    def from_pdf_file(cls, pdf_file):
+        """Build a CompactPdfFile from a PdfFile."""
+        compact_pdf_file = cls(has_bold=pdf_file.has_bold)
+        for page in pdf_file.pages:
+            compact_pdf_file.add_page(page)
+        return compact_pdf_file
+
+    def to_pdf_file(self):
+        """Return the PdfFile equivalent to this CompactPdfFile."""
+        return PdfFile(list(self.pages), self.has_bold)
+
+    def to_json(self):
+        """Return a dictionary representation of the PdfFile."""
+        return self.to_pdf_file().to_json()
+
+    def to_bytes(self):
+        """Return the binary representation of the file, to be loaded back
+        with from_bytes.
         """
+        font_faces = json.dumps(self.font_faces).encode('utf-8')
+        parts = [
+            _BINARY_HEADER.pack(
+                _BINARY_MAGIC,
+                _BINARY_VERSION,
+                _BYTE_ORDERS[sys.byteorder],
+                self.has_bold,
+                len(self.sizes),
+                len(self.page_numbers),
+                len(font_faces),
+                len(self.text),
+            ),
+            font_faces,
+        ]
+        parts.extend(
+            bytes(getattr(self, name)) for name, _, _, _ in _BINARY_COLUMNS
+        )
+        parts.append(bytes(self.text))
 
-        ac_automaton = ahocorasick.Automaton()
-        keyword_dict = {}
-        for index, keyword in enumerate(set(keywords)):
-            ac_automaton.add_word(keyword, (index, keyword))
+        binary = bytearray()
+        for part in parts:
+            binary.extend(bytes(_align(len(binary)) - len(binary)))
+            binary.extend(part)
+        return bytes(binary)
 
-        lines = []
-        for page in self.pages:
-            lines.extend(page.lines)
-        ac_automaton.make_automaton()
-        for num, line in enumerate(lines):
-            for index, value in ac_automaton.iter(line.text.lower()):
-                pattern = re.compile(''.join([
-                    '(^|\W)',
-                    value[1],
-                    '(\W|$)'
-                ]), re.IGNORECASE)
-                if self._keyword_is_in_line(line.text, pattern):
-                    first_line = max(0, num - context)
-                    last_line = min(len(lines), num + context + 1)
-                    result = lines[first_line:last_line]
-                    if value[1] in keyword_dict.keys():
-                        keyword_dict[value[1]].extend(
-                            list(map(lambda x: x.text, result))
-                        )
-                    else:
-                        keyword_dict[value[1]] = list(
-                            map(lambda x: x.text, result)
-                        )
-        return keyword_dict
+    @classmethod
+    def from_bytes(cls, buffer):
+        """Build a CompactPdfFile from its binary representation, in any
+        object supporting the buffer protocol (bytes, mmap...).
+
+        The columns and the text are views on the buffer rather than copies:
+        the resulting file is read-only.
+
+        Raises:
+            - ValueError if the buffer doesn't contain a CompactPdfFile.
+        """
+        view = memoryview(buffer)
+        try:
+            (magic, version, byte_order, has_bold, line_count, page_count,
+             font_faces_size, text_size) = _BINARY_HEADER.unpack_from(view)
+        except struct.error:
+            raise ValueError('Truncated compact pdf file header')
+        if magic != _BINARY_MAGIC or version != _BINARY_VERSION:
+            raise ValueError('Not a compact pdf file (version {})'.format(
+                _BINARY_VERSION
+            ))
+        if byte_order != _BYTE_ORDERS[sys.byteorder]:
+            raise ValueError('Compact pdf file in the wrong byte order')
+
+        offset = _BINARY_HEADER.size
+        font_faces = json.loads(
+            str(view[offset:offset + font_faces_size], 'utf-8')
+        )
+        offset += font_faces_size
+        counts = {'lines': line_count, 'pages': page_count}
+        columns = {}
+        for name, typecode, count, extra in _BINARY_COLUMNS:
+            offset = _align(offset)
+            size = (counts[count] + extra) * array(typecode).itemsize
+            column = view[offset:offset + size]
+            if len(column) != size:
+                raise ValueError('Truncated compact pdf file')
+            columns[name] = column.cast(typecode)
+            offset += size
+        offset = _align(offset)
+        text = view[offset:offset + text_size]
+        if len(text) != text_size:
+            raise ValueError('Truncated compact pdf file')
+
+        return cls(
+            font_faces=font_faces,
+            text=text,
+            has_bold=bool(has_bold),
+            **columns
+        )
+
+    def save(self, path):
+        """Write the binary representation of the file at (str)path."""
+        with open(path, 'wb') as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path):
+        """Load a CompactPdfFile saved at (str)path, mapping the file in
+        memory. Its pages are only built on access.
+        """
+        with open(path, 'rb') as f:
+            return cls.from_bytes(
+                mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            )
+
+    def add_line(self, size, bold, text, page_number, font_face):
+        """Append a line to the current page."""
+        font_id = self._font_index.get(font_face)
+        if font_id is None:
+            font_id = len(self.font_faces)
+            self.font_faces.append(font_face)
+            self._font_index[font_face] = font_id
+        self.sizes.append(size)
+        self.bold.append(1 if bold else 0)
+        self.line_page_numbers.append(page_number)
+        self.font_ids.append(font_id)
+        self.text.extend(text.encode('utf-8'))
+        self.text_offsets.append(len(self.text))
+        self._reset_indexes()
+
+    def close_page(self, number):
+        """End the current page, giving it the number (int)number."""
+        self.page_offsets.append(len(self.sizes))
+        self.page_numbers.append(number)
+
+    def add_page(self, pdf_page):
+        """Add a PdfPage to the pages list."""
+        for line in pdf_page.lines:
+            self.add_line(
+                line.size,
+                line.bold,
+                line.text,
+                line.page_number,
+                line.font_face,
+            )
+        self.close_page(pdf_page.number)
+
+    def extend(self, pdf_file, page_offset=0):
+        """Append the pages of another CompactPdfFile, adding
+        (int)page_offset to their page numbers. The columns are copied as a
+        whole rather than line by line.
+        """
+        font_ids = []
+        for font_face in pdf_file.font_faces:
+            if font_face not in self._font_index:
+                self._font_index[font_face] = len(self.font_faces)
+                self.font_faces.append(font_face)
+            font_ids.append(self._font_index[font_face])
+
+        line_offset = len(self.sizes)
+        text_offset = len(self.text)
+        self.sizes.extend(pdf_file.sizes)
+        self.bold.extend(pdf_file.bold)
+        self.line_page_numbers.extend(
+            number + page_offset for number in pdf_file.line_page_numbers
+        )
+        self.font_ids.extend(font_ids[i] for i in pdf_file.font_ids)
+        self.text.extend(pdf_file.text)
+        self.text_offsets.extend(
+            offset + text_offset for offset in pdf_file.text_offsets[1:]
+        )
+        self.page_offsets.extend(
+            offset + line_offset for offset in pdf_file.page_offsets[1:]
+        )
+        self.page_numbers.extend(
+            number + page_offset for number in pdf_file.page_numbers
+        )
+        self.has_bold = self.has_bold or pdf_file.has_bold
+        self._reset_indexes()
+
+    @property
+    def pages(self):
+        """The pages of the file, as a sequence of PdfPage objects."""
+        return _CompactPages(self)
+
+    def get_line_text(self, index):
+        """Return the text of the line number (int)index."""
+        start, end = self.text_offsets[index], self.text_offsets[index + 1]
+        return str(self.text[start:end], 'utf-8')
+
+    def get_line(self, index):
+        """Return the line number (int)index, as a PdfLine. The index is kept
+        in the line's `_index` attribute, to find it back in the file.
+        """
+        line = PdfLine(
+            self.sizes[index],
+            bool(self.bold[index]),
+            self.get_line_text(index),
+            self.line_page_numbers[index],
+            self.font_faces[self.font_ids[index]],
+        )
+        line._index = index
+        return line
+
+    def get_page(self, page_number):
+        """Return the PdfPage for the argument (int)page_number."""
+        page_number = range(len(self.page_numbers))[page_number]
+        start = self.page_offsets[page_number]
+        end = self.page_offsets[page_number + 1]
+        return PdfPage(
+            [self.get_line(index) for index in range(start, end)],
+            self.page_numbers[page_number],
+        )
+
+    def _build_text_index(self):
+        texts = []
+        line_offsets = array('I')
+        page_end_offsets = array('I')
+        position = 0
+        for page_number in range(len(self.page_numbers)):
+            start = self.page_offsets[page_number]
+            end = self.page_offsets[page_number + 1]
+            lines_texts = [self.get_line_text(i) for i in range(start, end)]
+            if _join_lines_texts(lines_texts, True):
+                line_position = position
+                for text in lines_texts:
+                    line_offsets.append(line_position)
+                    line_position += len(text) + 1
+                page_text = _join_lines_texts(lines_texts)
+                texts.append(page_text)
+                position += len(page_text)
+            else:
+                line_offsets.extend([position] * len(lines_texts))
+            page_end_offsets.append(position)
+        return ''.join(texts), line_offsets, page_end_offsets
+
+    def _get_line_key(self, line):
+        return line._index
+
+    def iter_lines_texts(self):
+        for index in range(len(self.sizes)):
+            yield self.get_line_text(index)
+
+    def _build_font_size_index(self):
+        font_size_index = {}
+        for index, size in enumerate(self.sizes):
+            if size not in font_size_index:
+                font_size_index[size] = array('I')
+            font_size_index[size].append(index)
+        return font_size_index
+
+    def get_lines_by_font_size(self, font_size):
+        """Return all the lines of (int)font_size size."""
+        return [
+            self.get_line(index)
+            for index in self._get_font_size_index().get(font_size, ())
+        ]
+
+    def get_bold_lines(self):
+        """Return all the bold lines in the document."""
+        return [
+            self.get_line(index)
+            for index, bold in enumerate(self.bold)
+            if bold
+        ]
@@ -1,18 +1,430 @@
 import math
+import functools
 import os
+import attr
 import errno
+import signal
+import tempfile
+import threading
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 import logging
 from bs4 import BeautifulSoup as bs
-from .objects.PdfObjects import PdfFile, PdfPage, PdfLine
-from .tools.extraction import _find_elements
+from lxml import etree
+from .objects.PdfObjects import PdfFile, PdfPage, PdfLine, CompactPdfFile
+from .tools.extraction import SectionAnalyzer
 
 BASE_FONT_SIZE = -10
+# Number of bytes kept from the end of the error output of the conversion
+# processes, to find out why they failed
+ERROR_OUTPUT_WINDOW = 4096
+# The messages written by poppler's tools when an allocation fails, before
+# they abort: by its allocation functions, and for an uncaught bad_alloc
+_OUT_OF_MEMORY_MESSAGES = (b'Out of memory', b'std::bad_alloc')
 
 
-def parse_pdf_document(document):
-    """ Given a path to a pdf, parse the file using pdftotext, to return a
+class ConversionLimitExceeded(Exception):
+    """Raised when the conversion of a pdf is killed for exceeding one of its
+    ConversionLimits. The `limit` attribute is either 'time', 'cpu' or
+    'memory'.
+    """
+
+    def __init__(self, document_name, limit):
+        # Keep the arguments in self.args so that the exception can be
+        # pickled back from a worker process.
+        super().__init__(document_name, limit)
+        self.document_name = document_name
+        self.limit = limit
+
+    def __str__(self):
+        return 'The conversion of [{}] exceeded its {} limit'.format(
+            self.document_name,
+            self.limit,
+        )
+
+
+@attr.s
+class ConversionLimits(object):
+    """Represent the resource limits of a pdftohtml conversion, defined by
+    the following attributes (None disabling the limit):
+        - (float)timeout    : The maximum wall-clock time, in seconds.
+        - (int)cpu_time     : The maximum CPU time, in seconds.
+        - (int)memory       : The maximum memory, in bytes.
+    """
+    timeout = attr.ib(default=None)
+    cpu_time = attr.ib(default=None)
+    memory = attr.ib(default=None)
+
+    def get_command(self, cmd):
+        """Return the command running the command cmd (a list) with the CPU
+        and memory limits, set by a shell before replacing itself with cmd.
+
+        Unlike subprocess' preexec_fn, this is safe when the processes are
+        started from several threads, like the page ranges of
+        parse_pdf_chunked.
+        """
+        ulimits = []
+        if self.cpu_time:
+            # The process is killed by a SIGKILL once it reaches the limit
+            ulimits.append('ulimit -t {}'.format(int(self.cpu_time)))
+        if self.memory:
+            # Linux doesn't enforce RLIMIT_RSS, so limit the address space
+            ulimits.append('ulimit -v {}'.format(int(self.memory) // 1024))
+        if not ulimits:
+            return list(cmd)
+        script = '; '.join(ulimits + ['exec "$0" "$@"'])
+        return ['/bin/sh', '-c', script] + list(cmd)
+
+    def get_exceeded_limit(self, returncode, error_output=b''):
+        """Return the name of the limit which most likely killed a conversion
+        process with the given returncode, or None.
+
+        poppler's tools also crash on some malformed pdfs: a crash is only
+        put down to the memory limit if the (bytes)error_output of the
+        process, or its last ERROR_OUTPUT_WINDOW bytes, reports a failed
+        allocation.
+        """
+        if self.cpu_time and returncode in (-signal.SIGKILL, -signal.SIGXCPU):
+            return 'cpu'
+        if self.memory and returncode in (-signal.SIGABRT, -signal.SIGSEGV,
+                                          -signal.SIGBUS):
+            if any(message in error_output
+                   for message in _OUT_OF_MEMORY_MESSAGES):
+                return 'memory'
+        return None
+
+
+def _read_error_output(errors):
+    """Return the last ERROR_OUTPUT_WINDOW bytes of the error output of a
+    process, written to the binary file object errors.
+    """
+    errors.seek(0, os.SEEK_END)
+    errors.seek(max(0, errors.tell() - ERROR_OUTPUT_WINDOW))
+    return errors.read()
+
+
+def _get_page_range_args(first_page, last_page):
+    """Return the pdftohtml arguments restricting the conversion to a range
+    of pages (starting at 1).
+    """
+    args = []
+    if first_page:
+        args.extend(['-f', str(first_page)])
+    if last_page:
+        args.extend(['-l', str(last_page)])
+    return args
+
+
+def get_page_count(document):
+    """Return the number of pages of a pdf document using pdfinfo, or None if
+    it couldn't be read.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        output = subprocess.check_output(
+            ['pdfinfo', document.name],
+            stderr=subprocess.DEVNULL,
+        )
+    except subprocess.CalledProcessError as e:
+        logger.warning(
+            "Couldn't get the page count of [%s]: exit code %s",
+            document.name,
+            e.returncode,
+        )
+        return None
+
+    for line in output.decode('utf-8', 'replace').splitlines():
+        if line.startswith('Pages:'):
+            return int(line.split(':', 1)[1])
+    return None
+
+
+def extract_pdf_text(document, limits=None, first_page=None, last_page=None):
+    """Return the raw text of a pdf document using pdftotext, which is much
+    cheaper than converting its layout, or None if it couldn't be extracted.
+    The pages are separated by form feeds.
+
+    The extraction can be restricted to the pages from first_page to
+    last_page (starting at 1, both included).
+
+    Raises:
+        - ConversionLimitExceeded if pdftotext exceeded the limits.
+    """
+    logger = logging.getLogger(__name__)
+    limits = limits or ConversionLimits()
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            limits.get_command([
+                'pdftotext',
+                '-q',
+                '-enc', 'UTF-8',
+                *_get_page_range_args(first_page, last_page),
+                document.name,
+                '-',
+            ]),
+            stdout=subprocess.PIPE,
+            stderr=errors,
+        )
+        try:
+            output, _ = process.communicate(timeout=limits.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.communicate()
+            raise ConversionLimitExceeded(document.name, 'time')
+        error_output = _read_error_output(errors)
+
+    if process.returncode != 0:
+        exceeded_limit = limits.get_exceeded_limit(
+            process.returncode,
+            error_output
+        )
+        if exceeded_limit:
+            raise ConversionLimitExceeded(document.name, exceeded_limit)
+
+        logger.warning(
+            "Couldn't extract the text of [%s]: exit code %s",
+            document.name,
+            process.returncode,
+        )
+        return None
+    return output.decode('utf-8', 'replace')
+
+
+def parse_pdf_document(document, use_pipe=True, limits=None,
+                       first_page=None, last_page=None, compact=False):
+    """ Given a path to a pdf, parse the file using pdftohtml, to return a
     PdfFile object, easier to analyse.
+
+    The conversion can be restricted to the pages from first_page to
+    last_page (starting at 1, both included). The pages of the resulting
+    PdfFile are still numbered from 0.
+
+    If compact is True, a CompactPdfFile is returned instead of a PdfFile.
+
+    By default, pdftohtml writes its xml output to stdout, which is parsed
+    while the conversion is still running, so that nothing is written to
+    disk. If use_pipe is False, the output is written to a temporary
+    `<document>.xml` file, which is parsed then removed.
+
+    The conversion process can be restricted using a ConversionLimits object.
+    If it exceeds one of them, it is killed and ConversionLimitExceeded is
+    raised.
+
+    Returns None if the document couldn't be converted.
+    """
+    limits = limits or ConversionLimits()
+    page_range = _get_page_range_args(first_page, last_page)
+    if use_pipe:
+        return _parse_pdf_from_pipe(document, limits, page_range, compact)
+    return _parse_pdf_from_file(document, limits, page_range, compact)
+
+
+def parse_pdf_tail(document, keywords, window, page_count=None,
+                   use_pipe=True, limits=None, compact=False, backend=None):
+    """Parse the last pages of a pdf document, looking for sections matching
+    one of the keywords.
+
+    Sections like references are usually at the end of the documents, so
+    only the last `window` pages are converted at first. The window is then
+    doubled until one of the keywords matches a section title, or until it
+    covers the whole document.
+
+    Note that the font statistics used to detect the titles are computed on
+    the converted pages only.
+
+    Args:
+        - document: The pdf file object.
+        - keywords: A list of section keywords, or a SectionAnalyzer.
+        - window: The number of pages to convert at first.
+        - page_count: The number of pages of the document, read with
+                      get_page_count if not given.
+        - backend: The parsing function to use (see pdf_parser.backends),
+                   parse_pdf_document by default.
+
+    Returns:
+        - A PdfFile of the last pages of the document, or None if the
+          document couldn't be converted.
+    """
+    if isinstance(keywords, SectionAnalyzer):
+        analyzer = keywords
+    else:
+        analyzer = SectionAnalyzer(keywords)
+
+    if backend is None:
+        backend = functools.partial(parse_pdf_document, use_pipe=use_pipe)
+
+    if not page_count:
+        page_count = get_page_count(document)
+    if not page_count:
+        return backend(document, limits=limits, compact=compact)
+
+    while True:
+        first_page = max(1, page_count - window + 1)
+        pdf_file = backend(
+            document,
+            limits=limits,
+            first_page=first_page,
+            compact=compact,
+        )
+        if not pdf_file or first_page == 1:
+            return pdf_file
+        if any(analyzer.find_elements(pdf_file).values()):
+            return pdf_file
+        window *= 2
+
+
+@attr.s
+class PageChunking(object):
+    """How big documents are split into page ranges converted in parallel,
+    defined by the following attributes:
+        - (int)min_pages    : The documents with more pages than this are
+                              split. None to never split them.
+        - (int)chunk_pages  : The number of pages of each range.
+        - (int)workers      : The number of ranges converted at the same
+                              time.
+    """
+    min_pages = attr.ib(default=None)
+    chunk_pages = attr.ib(default=200)
+    workers = attr.ib(default=4)
+
+    def get_page_ranges(self, page_count):
+        """Return the (first page, last page) ranges to convert a document of
+        (int)page_count pages, starting at 1 and both included, or None if it
+        shouldn't be split.
+        """
+        if not self.min_pages or not page_count or (
+                page_count <= self.min_pages):
+            return None
+        return [
+            (first_page, min(page_count, first_page + self.chunk_pages - 1))
+            for first_page in range(1, page_count + 1, self.chunk_pages)
+        ]
+
+
+def parse_pdf_chunked(document, chunking, page_count=None, backend=None,
+                      limits=None, compact=False):
+    """Parse a pdf document, splitting it into page ranges converted in
+    parallel if it is big enough for the PageChunking chunking. The ranges
+    are merged back into a single PdfFile (or CompactPdfFile if compact is
+    True), numbered like the one of the whole document.
+
+    Each range is converted in a thread, by its own process for the
+    pdftohtml backend, and with its own ConversionLimits.
+
+    Args:
+        - document: The pdf file object.
+        - page_count: The number of pages of the document, read with
+                      get_page_count if not given.
+        - backend: The parsing function to use (see pdf_parser.backends),
+                   parse_pdf_document by default.
+
+    Returns:
+        - The PdfFile, or None if a part of the document couldn't be
+          converted.
+
+    Raises:
+        - ConversionLimitExceeded if the conversion of a range exceeded the
+          limits.
+    """
+    backend = backend or parse_pdf_document
+    if not page_count and chunking.min_pages:
+        page_count = get_page_count(document)
+    page_ranges = chunking.get_page_ranges(page_count)
+    if not page_ranges:
+        return backend(document, limits=limits, compact=compact)
+
+    def _parse_range(page_range):
+        # Some backends read the file object: each thread has its own
+        with open(document.name, 'rb') as f:
+            return backend(
+                f,
+                limits=limits,
+                first_page=page_range[0],
+                last_page=page_range[1],
+                compact=compact,
+            )
+
+    with ThreadPoolExecutor(max_workers=chunking.workers) as executor:
+        pdf_files = list(executor.map(_parse_range, page_ranges))
+    if any(range_pdf_file is None for range_pdf_file in pdf_files):
+        return None
+
+    pdf_file = CompactPdfFile() if compact else PdfFile([])
+    for (first_page, _), range_pdf_file in zip(page_ranges, pdf_files):
+        pdf_file.extend(range_pdf_file, first_page - 1)
+    return pdf_file
+
+
+def _parse_pdf_from_pipe(document, limits, page_range, compact):
+    """Run pdftohtml with the -stdout option and parse its output stream."""
+
+    logger = logging.getLogger(__name__)
+    cmd = [
+        'pdftohtml',
+        '-i',
+        '-xml',
+        '-stdout',
+        *page_range,
+        document.name,
+    ]
+
+    with tempfile.TemporaryFile() as errors:
+        process = subprocess.Popen(
+            limits.get_command(cmd),
+            stdout=subprocess.PIPE,
+            stderr=errors,
+        )
+
+        # Killing the process closes the pipe, which ends the parsing
+        timed_out = threading.Event()
+        timer = None
+        if limits.timeout:
+            def _kill():
+                timed_out.set()
+                process.kill()
+            timer = threading.Timer(limits.timeout, _kill)
+            timer.start()
+
+        try:
+            pdf_file = parse_pdf_xml(process.stdout, compact)
+        except etree.XMLSyntaxError as e:
+            if not timed_out.is_set():
+                logger.warning(
+                    'Error trying to parse the converted pdf [%s]: %s',
+                    document.name,
+                    e,
+                )
+            pdf_file = None
+        finally:
+            if timer:
+                timer.cancel()
+            # Closing the pipe makes pdftohtml exit if we stopped reading
+            # early
+            process.stdout.close()
+            returncode = process.wait()
+        error_output = _read_error_output(errors)
+
+    if timed_out.is_set():
+        raise ConversionLimitExceeded(document.name, 'time')
+
+    if returncode != 0:
+        exceeded_limit = limits.get_exceeded_limit(returncode, error_output)
+        if exceeded_limit:
+            raise ConversionLimitExceeded(document.name, exceeded_limit)
+
+        logger.warning(
+            "The pdf [%s] could not be converted: exit code %s",
+            document.name,
+            returncode,
+        )
+        return None
+
+    return pdf_file
+
+
+def _parse_pdf_from_file(document, limits, page_range, compact):
+    """Run pdftohtml to write an xml file next to the document, then parse
+    it. The xml file is always removed, even when the conversion fails.
     """
 
     logger = logging.getLogger(__name__)
@@ -23,102 +435,262 @@ def parse_pdf_document(document):
         'pdftohtml',
         '-i',
         '-xml',
+        *page_range,
         document.name,
         parsed_path
     ]
 
     try:
-        with open(os.devnull, 'w') as FNULL:
-            subprocess.check_call(cmd, stdout=FNULL, stderr=FNULL)
+        try:
+            with open(os.devnull, 'w') as FNULL, \
+                    tempfile.TemporaryFile() as errors:
+                try:
+                    subprocess.check_call(
+                        limits.get_command(cmd),
+                        stdout=FNULL,
+                        stderr=errors,
+                        timeout=limits.timeout,
+                    )
+                finally:
+                    error_output = _read_error_output(errors)
 
-    except subprocess.CalledProcessError as e:
-        logger.warning(
-            "The pdf [%s] could not be converted: %r",
-            document.name,
-            e.stderr,
-        )
-        return None, None
+        except subprocess.TimeoutExpired:
+            # check_call already killed the process
+            raise ConversionLimitExceeded(document.name, 'time')
 
-    try:
-        # Try to get file stats in order to check both its existance
-        # and if it has some content
-        st = os.stat(parsed_path)
+        except subprocess.CalledProcessError as e:
+            exceeded_limit = limits.get_exceeded_limit(
+                e.returncode,
+                error_output
+            )
+            if exceeded_limit:
+                raise ConversionLimitExceeded(document.name, exceeded_limit)
 
-    except OSError as e:
-        if e.errno != errno.ENOENT:
-            raise
+            logger.warning(
+                "The pdf [%s] could not be converted: exit code %s",
+                document.name,
+                e.returncode,
+            )
+            return None
 
-        logger.warning('Error trying to open the parsed file: %s', e)
-        return None, None
+        try:
+            # Try to get file stats in order to check both its existance
+            # and if it has some content
+            st = os.stat(parsed_path)
 
-    if st.st_size == 0:
-        logger.warning(
-            'Error trying to open the parsed file: The file is empty'
-        )
-        return None, None
+        except OSError as e:
+            if e.errno != errno.ENOENT:
+                raise
+
+            logger.warning('Error trying to open the parsed file: %s', e)
+            return None
+
+        if st.st_size == 0:
+            logger.warning(
+                'Error trying to open the parsed file: The file is empty'
+            )
+            return None
 
-    with open(parsed_path, 'rb') as html_file:
+        try:
+            return parse_pdf_xml(parsed_path, compact)
+        except etree.XMLSyntaxError as e:
+            logger.warning(
+                'Error trying to parse the converted pdf [%s]: %s',
+                document.name,
+                e,
+            )
+            return None
+
+    finally:
+        try:
+            os.remove(parsed_path)
+        except FileNotFoundError:
+            pass
+
+
+def _get_element_string(element):
+    """Return the string held by an lxml element, following the semantics of
+    BeautifulSoup's `.string`: if the element contains a single string,
+    possibly nested in single-child tags (e.g. <text><b>foo</b></text>),
+    return it, else return None.
+    """
+    if len(element) == 0:
+        return element.text
+    if len(element) == 1 and not element.text and not element[0].tail:
+        return _get_element_string(element[0])
+    return None
+
+
+def _group_words(words):
+    """Group the words of a page into lines, yielding a (size, text) tuple for
+    each line.
+
+    Args:
+        - words: A list of (top, height, string) tuples, one for each text
+                 element of the page, in document order.
+    """
+    line = None
+    if words:
+        pos_y = words[0][0]
+        cur_line = ''
+        font_size = float(words[0][1])
+        for top, height, string in words:
+            cur_font_size = float(height)
+            if top == pos_y and font_size == cur_font_size:
+                if string:
+                    cur_line = cur_line + ' ' + string
+            else:
+                line = (int(math.ceil(font_size)), cur_line)
+                yield line
+                cur_line = string if string else ''
+                pos_y = top
+                font_size = cur_font_size
+        # The last line of the page is replaced by a copy of the previous
+        # one. Kept as is, as the analysis results depend on it.
+        if line:
+            yield line
+
+
+def _build_pdf_page(words, num):
+    """Group the words of a page into lines and return a PdfPage.
+
+    Args:
+        - words: A list of (top, height, string) tuples, one for each text
+                 element of the page, in document order.
+        - num: The page number.
+    """
+    page_lines = [
+        PdfLine(size, False, text, num, '')
+        for size, text in _group_words(words)
+    ]
+    return PdfPage(page_lines, num)
+
+
+class _PdfFileBuilder(object):
+    """Build a PdfFile, or a CompactPdfFile if compact is True, page by page.
+    """
+
+    def __init__(self, compact=False):
+        self.compact = compact
+        self.page_count = 0
+        self._file_pages = []
+        self._compact_pdf_file = CompactPdfFile()
+
+    def add_words(self, words):
+        """Group the words of the next page into lines, and add the page.
+
+        Args:
+            - words: A list of (top, height, string) tuples, one for each
+                     text element of the page, in document order.
+        """
+        num = self.page_count
+        if self.compact:
+            for size, text in _group_words(words):
+                self._compact_pdf_file.add_line(size, False, text, num, '')
+            self._compact_pdf_file.close_page(num)
+        else:
+            self._file_pages.append(_build_pdf_page(words, num))
+        self.page_count += 1
+
+    def add_page_element(self, page):
+        """Add the page of a <page> element of the pdftohtml xml output, then
+        free the element and its already processed siblings.
+        """
+        self.add_words([
+            (word.get('top'), word.get('height'), _get_element_string(word))
+            for word in page.iter('text')
+        ])
+        page.clear()
+        while page.getprevious() is not None:
+            del page.getparent()[0]
+
+    def get_pdf_file(self):
+        if self.compact:
+            return self._compact_pdf_file
+        return PdfFile(self._file_pages)
+
+
+def parse_pdf_xml(xml_file, compact=False):
+    """Parse the xml output of pdftohtml into a PdfFile object, or into a
+    CompactPdfFile object if compact is True.
+
+    The document is parsed incrementally using lxml: each <page> element is
+    converted into a PdfPage as soon as it has been read, then freed, so the
+    memory usage doesn't grow with the size of the xml tree.
+
+    Args:
+        - xml_file: A path or a binary file object containing the xml.
+    """
+    builder = _PdfFileBuilder(compact)
+    pages = etree.iterparse(
+        xml_file,
+        events=('end',),
+        tag='page',
+        recover=True,
+        huge_tree=True,
+    )
+    for _, page in pages:
+        builder.add_page_element(page)
+    return builder.get_pdf_file()
+
+
+def parse_pdf_xml_soup(xml_file):
+    """Parse the xml output of pdftohtml into a PdfFile object, loading the
+    whole document in memory with BeautifulSoup. Slower than parse_pdf_xml,
+    which should be preferred.
+
+    Args:
+        - xml_file: A path to the xml file.
+    """
+    with open(xml_file, 'rb') as html_file:
         soup = bs(html_file.read(), 'html.parser')
 
     file_pages = []
-    pages = soup.find_all('page')
-
-    for num, page in enumerate(pages):
-        words = page.find_all('text')
-
-        page_lines = []
-        pdf_line = None
-        if words:
-            pos_y = words[0].attrs['top']
-            cur_line = ''
-            font_size = float(words[0].attrs['height'])
-            for word in words:
-                cur_font_size = float(word.attrs['height'])
-                if word.attrs['top'] == pos_y and font_size == cur_font_size:
-                    if word.string:
-                        cur_line = cur_line + ' ' + word.string
-                else:
-                    pdf_line = PdfLine(
-                        int(math.ceil(font_size)),
-                        False,
-                        cur_line, num,
-                        '',
-                    )
-                    if pdf_line:
-                        page_lines.append(pdf_line)
-                    cur_line = word.string if word.string else ''
-                    pos_y = word.attrs['top']
-                    font_size = cur_font_size
-            if pdf_line:
-                page_lines.append(pdf_line)
-        file_pages.append(PdfPage(page_lines, num))
-
-    pdf_file = PdfFile(file_pages)
-    html_file.close()
-    os.remove(parsed_path)
-    return pdf_file
+    for num, page in enumerate(soup.find_all('page')):
+        words = [
+            (word.attrs['top'], word.attrs['height'], word.string)
+            for word in page.find_all('text')
+        ]
+        file_pages.append(_build_pdf_page(words, num))
+
+    return PdfFile(file_pages)
+
+
+def grab_sections(pdf_file, keywords):
+    """Given a pdf parsed file object (PdfFile) and a list of keywords
+    corresponding to titles (or a SectionAnalyzer built from them), return a
+    dictionary of the matching section of the pdf text for each keyword.
+
+    The document is analysed once for all the keywords, and the sections are
+    cut from the text of the document using the position of their titles in
+    it, which is computed once by the pdf file.
+    """
+    if isinstance(keywords, SectionAnalyzer):
+        analyzer = keywords
+    else:
+        analyzer = SectionAnalyzer(keywords)
+
+    text = pdf_file.get_text()
+    sections = {}
+    for keyword, elements in analyzer.find_elements(pdf_file).items():
+        result = []
+        for start_title, end_title in elements:
+            start = pdf_file.get_line_offset(start_title)
+            if not end_title:
+                end = len(text)
+            elif start_title.page_number != end_title.page_number:
+                end = pdf_file.get_line_offset(end_title)
+            else:
+                # A section ending on its first page is kept until the end
+                # of the page
+                end = pdf_file.get_page_end_offset(end_title.page_number)
+            result.append(text[start:end])
+        sections[keyword] = ''.join(result)
+    return sections
 
 
 def grab_section(pdf_file, keyword):
     """Given a pdf parsed file object (PdfFile) and a keyword corresponding to
     a title, returns the matching section of the pdf text.
     """
-    result = ''
-    text = ''
-    elements = _find_elements(pdf_file, keyword)
-    for start_title, end_title in elements:
-        if not end_title:
-            end_page = len(pdf_file.pages)
-        else:
-            end_page = end_title.page_number + 1
-        for page_number in range(start_title.page_number, end_page):
-            if pdf_file.get_page(page_number).get_page_text(True):
-                text += pdf_file.get_page(page_number).get_page_text()
-        if end_title and (start_title.page_number != end_title.page_number):
-            result += text[
-                text.find(start_title.text):text.find(end_title.text)
-            ]
-        else:
-            result += text[text.find(start_title.text):]
-        text = ''
-    return result
+    return grab_sections(pdf_file, [keyword])[keyword]
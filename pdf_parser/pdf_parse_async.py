@@ -0,0 +1,181 @@
+import os
+import shutil
+import logging
+from lxml import etree
+from twisted.internet import defer, protocol, reactor
+from twisted.internet.error import ProcessDone, ProcessExitedAlready
+from .pdf_parse import (ConversionLimits, ConversionLimitExceeded,
+                        ERROR_OUTPUT_WINDOW, _PdfFileBuilder,
+                        _get_page_range_args)
+
+logger = logging.getLogger(__name__)
+
+
+class PdfToHtmlProtocol(protocol.ProcessProtocol):
+    """Parse the xml output of a pdftohtml process as it is received, firing
+    its `deferred` with the PdfFile once the process has ended.
+
+    The output is fed to an lxml pull parser, and each page is converted
+    then freed as soon as it has been read, like in parse_pdf_xml.
+    """
+
+    def __init__(self, document_name, limits, compact=False):
+        self.document_name = document_name
+        self.limits = limits
+        self.deferred = defer.Deferred()
+        self.timed_out = False
+        self.timeout_call = None
+        self._builder = _PdfFileBuilder(compact)
+        self._parser = etree.XMLPullParser(
+            events=('end',),
+            tag='page',
+            recover=True,
+            huge_tree=True,
+        )
+        self._error = None
+        self._stopped_on_error = False
+        self._error_output = b''
+
+    def connectionMade(self):
+        self.transport.closeStdin()
+        if self.limits.timeout:
+            self.timeout_call = reactor.callLater(
+                self.limits.timeout,
+                self._kill,
+                True,
+            )
+
+    def _kill(self, timed_out=False):
+        self.timed_out = self.timed_out or timed_out
+        try:
+            self.transport.signalProcess('KILL')
+        except ProcessExitedAlready:
+            pass
+
+    def _read_pages(self):
+        for _, page in self._parser.read_events():
+            self._builder.add_page_element(page)
+
+    def errReceived(self, data):
+        # Only the end of the error output is needed
+        self._error_output = (
+            self._error_output + data
+        )[-ERROR_OUTPUT_WINDOW:]
+
+    def outReceived(self, data):
+        if self._error:
+            return
+        try:
+            self._parser.feed(data)
+            self._read_pages()
+        except etree.XMLSyntaxError as e:
+            # No need to convert the rest of the document
+            self._error = e
+            self._stopped_on_error = True
+            self._kill()
+
+    def processEnded(self, reason):
+        if self.timeout_call and self.timeout_call.active():
+            self.timeout_call.cancel()
+
+        if not self._error:
+            try:
+                self._parser.close()
+                self._read_pages()
+            except etree.XMLSyntaxError as e:
+                self._error = e
+
+        if self.timed_out:
+            self.deferred.errback(
+                ConversionLimitExceeded(self.document_name, 'time')
+            )
+            return
+
+        if self._stopped_on_error:
+            self._warn_parsing_error()
+            return
+
+        if reason.check(ProcessDone):
+            returncode = 0
+        elif reason.value.signal:
+            returncode = -reason.value.signal
+        else:
+            returncode = reason.value.exitCode
+        if returncode != 0:
+            exceeded_limit = self.limits.get_exceeded_limit(
+                returncode,
+                self._error_output
+            )
+            if exceeded_limit:
+                self.deferred.errback(
+                    ConversionLimitExceeded(self.document_name, exceeded_limit)
+                )
+                return
+            logger.warning(
+                "The pdf [%s] could not be converted: exit code %s",
+                self.document_name,
+                returncode,
+            )
+            self.deferred.callback(None)
+            return
+
+        if self._error:
+            self._warn_parsing_error()
+            return
+
+        self.deferred.callback(self._builder.get_pdf_file())
+
+    def _warn_parsing_error(self):
+        logger.warning(
+            'Error trying to parse the converted pdf [%s]: %s',
+            self.document_name,
+            self._error,
+        )
+        self.deferred.callback(None)
+
+
+def _spawn_pdftohtml(document_name, limits, page_range, compact):
+    cmd = [
+        shutil.which('pdftohtml') or 'pdftohtml',
+        '-i',
+        '-xml',
+        '-stdout',
+        *page_range,
+        document_name,
+    ]
+    cmd = limits.get_command(cmd)
+    process_protocol = PdfToHtmlProtocol(document_name, limits, compact)
+    reactor.spawnProcess(
+        process_protocol,
+        cmd[0],
+        cmd,
+        env=os.environ,
+        childFDs={0: 'w', 1: 'r', 2: 'r'},
+    )
+    return process_protocol.deferred
+
+
+def parse_pdf_document_async(document, limits=None, first_page=None,
+                             last_page=None, compact=False, semaphore=None):
+    """Convert a pdf document like parse_pdf_document, without blocking the
+    reactor: pdftohtml is run with reactor.spawnProcess, and its output
+    parsed as it is received.
+
+    Args:
+        - document: The pdf file object. Only its name is used, so it can be
+                    closed before the conversion starts.
+        - semaphore: A DeferredSemaphore capping the number of conversions
+                     running at the same time, if given.
+
+    Returns:
+        - A Deferred firing with the PdfFile (or CompactPdfFile if compact is
+          True), with None if the document couldn't be converted, or
+          failing with ConversionLimitExceeded if the conversion exceeded
+          the limits.
+    """
+    limits = limits or ConversionLimits()
+    page_range = _get_page_range_args(first_page, last_page)
+    args = (document.name, limits, page_range, compact)
+    if semaphore is not None:
+        return semaphore.run(_spawn_pdftohtml, *args)
+    return _spawn_pdftohtml(*args)
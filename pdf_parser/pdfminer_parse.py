@@ -0,0 +1,82 @@
+import logging
+from .pdf_parse import _PdfFileBuilder
+
+# pdfminer is an optional dependency, only needed by this backend
+try:
+    from pdfminer.high_level import extract_pages
+    from pdfminer.layout import LTTextContainer, LTTextLine
+    from pdfminer.psparser import PSException
+except ImportError:
+    extract_pages = None
+
+# pdftohtml renders the pages at a 1.5 zoom by default: the positions and
+# heights are scaled to match its output
+PDFTOHTML_ZOOM = 1.5
+
+
+def _iter_text_lines(layout_object):
+    """Yield the text lines of a pdfminer layout object, in layout order."""
+    if isinstance(layout_object, LTTextLine):
+        yield layout_object
+    elif isinstance(layout_object, LTTextContainer):
+        for child in layout_object:
+            yield from _iter_text_lines(child)
+
+
+def _get_page_words(layout_page):
+    """Return the text lines of a pdfminer page as (top, height, string)
+    tuples, like the text elements of the pdftohtml xml output.
+    """
+    words = []
+    for layout_object in layout_page:
+        for text_line in _iter_text_lines(layout_object):
+            words.append((
+                int(round((layout_page.height - text_line.y1)
+                          * PDFTOHTML_ZOOM)),
+                int(round(text_line.height * PDFTOHTML_ZOOM)),
+                text_line.get_text().rstrip(),
+            ))
+    return words
+
+
+def parse_pdf_document_pdfminer(document, limits=None, first_page=None,
+                                last_page=None, compact=False):
+    """Given a pdf file object, parse it using pdfminer, to return a PdfFile
+    object (or a CompactPdfFile if compact is True) built like the ones of
+    parse_pdf_document.
+
+    The conversion can be restricted to the pages from first_page to
+    last_page (starting at 1, both included). The pages of the resulting
+    PdfFile are still numbered from 0.
+
+    pdfminer runs in the current process: the ConversionLimits are not
+    enforced by this backend.
+
+    Returns None if the document couldn't be converted.
+    """
+    logger = logging.getLogger(__name__)
+    if extract_pages is None:
+        raise ImportError('The pdfminer backend requires pdfminer.six')
+
+    page_numbers = None
+    if first_page or last_page:
+        page_numbers = range(
+            (first_page or 1) - 1,
+            last_page if last_page else 2 ** 31
+        )
+
+    builder = _PdfFileBuilder(compact)
+    try:
+        document.seek(0)
+        layout_pages = extract_pages(document, page_numbers=page_numbers)
+        for layout_page in layout_pages:
+            builder.add_words(_get_page_words(layout_page))
+    except PSException as e:
+        logger.warning(
+            'Error trying to convert the pdf [%s] with pdfminer: %s',
+            document.name,
+            e,
+        )
+        return None
+
+    return builder.get_pdf_file()
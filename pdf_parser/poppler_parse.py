@@ -0,0 +1,86 @@
+import logging
+from .pdf_parse import _PdfFileBuilder
+
+# python-poppler is an optional dependency, only needed by this backend. It
+# binds the poppler-cpp library installed in the docker image.
+try:
+    import poppler
+except ImportError:
+    poppler = None
+
+# pdftohtml renders the pages at a 1.5 zoom by default: the positions and
+# heights are scaled to match its output
+PDFTOHTML_ZOOM = 1.5
+
+
+def _get_page_words(text_boxes):
+    """Return the words of a poppler page as (top, height, string) tuples,
+    like the text elements of the pdftohtml xml output: the consecutive
+    words with the same top and height are joined, and their height is the
+    height of their box, not their font size, like pdftohtml's.
+
+    Args:
+        - text_boxes: The poppler text boxes of the page.
+    """
+    words = []
+    for text_box in text_boxes:
+        top = int(round(text_box.bbox.y * PDFTOHTML_ZOOM))
+        height = int(round(text_box.bbox.height * PDFTOHTML_ZOOM))
+        text = text_box.text + (' ' if text_box.has_space_after else '')
+        if words and words[-1][:2] == [top, height]:
+            words[-1][2] += text
+        else:
+            words.append([top, height, text])
+    return [(top, height, text.rstrip()) for top, height, text in words]
+
+
+def parse_pdf_document_poppler(document, limits=None, first_page=None,
+                               last_page=None, compact=False):
+    """Given a pdf file object, parse it in the current process using the
+    poppler library, to return a PdfFile object (or a CompactPdfFile if
+    compact is True) built like the ones of parse_pdf_document.
+
+    Unlike parse_pdf_document, which launches pdftohtml for each document,
+    no process is started. The words of each page are read from poppler,
+    then grouped into lines like the pdftohtml output, so the sections and
+    keywords found don't depend on the backend: the lines have no boldness
+    nor font face, start with a space, and the last line of each page is
+    replaced by the previous one.
+
+    The conversion can be restricted to the pages from first_page to
+    last_page (starting at 1, both included). The pages of the resulting
+    PdfFile are still numbered from 0.
+
+    poppler runs in the current process: the ConversionLimits are not
+    enforced by this backend.
+
+    Returns None if the document couldn't be converted.
+    """
+    logger = logging.getLogger(__name__)
+    if poppler is None:
+        raise ImportError('The poppler backend requires python-poppler')
+
+    document.seek(0)
+    try:
+        pdf_document = poppler.load_from_data(document.read())
+        page_count = pdf_document.pages
+    # The bindings don't define their own errors
+    except Exception as e:
+        logger.warning(
+            'Error trying to load the pdf [%s] with poppler: %s',
+            document.name,
+            e,
+        )
+        return None
+    if pdf_document.is_locked:
+        logger.warning('Encrypted pdf [%s]', document.name)
+        return None
+
+    first_index = max(1, first_page or 1) - 1
+    last_index = min(page_count, last_page or page_count)
+
+    builder = _PdfFileBuilder(compact)
+    for index in range(first_index, last_index):
+        text_boxes = pdf_document.create_page(index).text_list()
+        builder.add_words(_get_page_words(text_boxes))
+    return builder.get_pdf_file()
@@ -0,0 +1,107 @@
+import os
+import attr
+import logging
+from ..objects.PdfObjects import CompactPdfFile
+
+logger = logging.getLogger(__name__)
+
+CACHE_FILE_EXTENSION = '.pdfc'
+# The evictions bring the cache down to this fraction of its maximum size, so
+# that its folder is only listed again once the cache has grown back
+EVICTION_RATIO = 0.9
+
+# Size of each cache folder, as found by the last eviction of this process
+# plus the size of the files it put since then. The caches are pickled to
+# the worker processes for each pdf: their state can't be kept on them.
+_cache_sizes = {}
+
+
+@attr.s
+class PdfFileCache(object):
+    """An on-disk cache of parsed pdf files, keyed by the hash of the pdf
+    documents, defined by the following attributes:
+        - (str)directory    : The folder holding the cached files.
+        - (int)max_size     : The maximum size of the cache, in bytes, or None
+                              for no limit. The least recently used files are
+                              removed to stay under it.
+
+    The files are stored in the binary form of CompactPdfFile, and memory
+    mapped when read. The cache can be shared by several processes: its files
+    are written atomically, and their modification time is used to track
+    their last use.
+
+    The size of the cache is only computed, by listing its folder, when the
+    size found last plus the size of the files put since then by the process
+    goes over the maximum size: the files put by the other processes are only
+    counted then.
+    """
+    directory = attr.ib()
+    max_size = attr.ib(default=None)
+
+    def _get_path(self, file_hash):
+        return os.path.join(self.directory, file_hash + CACHE_FILE_EXTENSION)
+
+    def get(self, file_hash):
+        """Return the CompactPdfFile cached for (str)file_hash, or None."""
+        path = self._get_path(file_hash)
+        try:
+            pdf_file = CompactPdfFile.load(path)
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        except (IOError, ValueError):
+            logger.warning('Invalid cached pdf file %s', path)
+            return None
+        return pdf_file
+
+    def put(self, file_hash, pdf_file):
+        """Cache the CompactPdfFile pdf_file for (str)file_hash, then remove
+        the least recently used files if the cache is too big.
+        """
+        path = self._get_path(file_hash)
+        temp_path = '{}.{}'.format(path, os.getpid())
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            pdf_file.save(temp_path)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, path)
+        except IOError:
+            logger.warning('Unable to cache the pdf file %s', path)
+            return
+        if self.max_size is None:
+            return
+        if self.directory in _cache_sizes:
+            _cache_sizes[self.directory] += size
+            if _cache_sizes[self.directory] <= self.max_size:
+                return
+        self.evict()
+
+    def evict(self):
+        """If the cache is over its maximum size, remove the least recently
+        used files until it is under EVICTION_RATIO of its maximum size.
+        """
+        if self.max_size is None:
+            return
+        entries = []
+        total_size = 0
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(CACHE_FILE_EXTENSION):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total_size += stat.st_size
+
+        if total_size > self.max_size:
+            entries.sort()
+            for _, size, path in entries:
+                if total_size <= self.max_size * EVICTION_RATIO:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total_size -= size
+        _cache_sizes[self.directory] = total_size
@@ -0,0 +1,232 @@
+import os
+import mmap
+import struct
+from ..objects.PdfObjects import CompactPdfFile, _align
+
+# A corpus shard is made of two files: the data file, holding the binary
+# form of each CompactPdfFile one after the other, each starting on an 8
+# bytes boundary, and the index file, holding an entry for each document.
+# Both start with a header made of a magic string and a version.
+SHARD_DATA_EXTENSION = '.shard'
+SHARD_INDEX_EXTENSION = '.index'
+
+_SHARD_VERSION = 1
+_DATA_MAGIC = b'PDFS'
+_INDEX_MAGIC = b'PDFI'
+# magic, version, padding
+_SHARD_HEADER = struct.Struct('<4sHxx')
+# md5 digest of the document, offset and size of its data
+_INDEX_ENTRY = struct.Struct('<16sQQ')
+
+
+def _read_header(f, magic):
+    """Check the header of a shard file, raising ValueError if it isn't
+    one.
+    """
+    header = f.read(_SHARD_HEADER.size)
+    if len(header) < _SHARD_HEADER.size:
+        raise ValueError('Truncated corpus shard file {}'.format(f.name))
+    file_magic, version = _SHARD_HEADER.unpack(header)
+    if file_magic != magic or version != _SHARD_VERSION:
+        raise ValueError('Not a corpus shard file (version {}): {}'.format(
+            _SHARD_VERSION,
+            f.name,
+        ))
+
+
+def _map_file(f):
+    # Empty files can't be mapped
+    if os.fstat(f.fileno()).st_size == 0:
+        return b''
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class CorpusShardWriter(object):
+    """Append parsed documents to a corpus shard, to be read back with
+    CorpusShard. The shard is made of the `<path>.shard` data file and the
+    `<path>.index` index file, created if they don't exist.
+
+    Each document is written to the data file before its index entry: a
+    document is only part of the shard once indexed, so a shard left behind
+    by an interrupted writer stays readable, and its unindexed data is
+    truncated when it is opened again.
+
+    Can be used as a context manager, closing the files on exit.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._hashes = set()
+        self._data_file = self._open(
+            path + SHARD_DATA_EXTENSION, _DATA_MAGIC
+        )
+        try:
+            self._index_file = self._open(
+                path + SHARD_INDEX_EXTENSION, _INDEX_MAGIC
+            )
+        except ValueError:
+            self._data_file.close()
+            raise
+
+        # Drop the incomplete entries and documents
+        entries_size = os.fstat(self._index_file.fileno()).st_size
+        entries_size -= _SHARD_HEADER.size
+        entries_size -= entries_size % _INDEX_ENTRY.size
+        data_end = _SHARD_HEADER.size
+        self._index_file.seek(_SHARD_HEADER.size)
+        entries = self._index_file.read(entries_size)
+        for digest, offset, size in _INDEX_ENTRY.iter_unpack(entries):
+            self._hashes.add(digest)
+            data_end = max(data_end, offset + size)
+        self._index_file.truncate(_SHARD_HEADER.size + entries_size)
+        self._index_file.seek(0, os.SEEK_END)
+        self._data_file.truncate(data_end)
+        self._data_file.seek(0, os.SEEK_END)
+
+    @staticmethod
+    def _open(path, magic):
+        try:
+            f = open(path, 'r+b')
+        except FileNotFoundError:
+            f = open(path, 'w+b')
+            f.write(_SHARD_HEADER.pack(magic, _SHARD_VERSION))
+            f.flush()
+            return f
+        try:
+            _read_header(f, magic)
+        except ValueError:
+            f.close()
+            raise
+        return f
+
+    def __len__(self):
+        return len(self._hashes)
+
+    def __contains__(self, file_hash):
+        return bytes.fromhex(file_hash) in self._hashes
+
+    def add(self, file_hash, pdf_file):
+        """Append a parsed document to the shard, unless it already holds a
+        document of the same hash.
+
+        Args:
+            - file_hash: The md5 hash of the pdf document, in hexadecimal.
+            - pdf_file: Its PdfFile or CompactPdfFile.
+
+        Returns:
+            - True if the document was added, False if it was already there.
+        """
+        digest = bytes.fromhex(file_hash)
+        if digest in self._hashes:
+            return False
+        if not isinstance(pdf_file, CompactPdfFile):
+            pdf_file = CompactPdfFile.from_pdf_file(pdf_file)
+
+        binary = pdf_file.to_bytes()
+        offset = _align(self._data_file.tell())
+        self._data_file.write(bytes(offset - self._data_file.tell()))
+        self._data_file.write(binary)
+        self._data_file.flush()
+        self._index_file.write(
+            _INDEX_ENTRY.pack(digest, offset, len(binary))
+        )
+        self._index_file.flush()
+        self._hashes.add(digest)
+        return True
+
+    def close(self):
+        self._data_file.close()
+        self._index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class CorpusShard(object):
+    """Read the documents of a corpus shard written by CorpusShardWriter.
+
+    Both files of the shard are mapped in memory: a document is only read
+    when accessed, as a read-only CompactPdfFile whose columns are views on
+    the mapped data (see CompactPdfFile.from_bytes). The documents can be
+    accessed by hash, through an index built from the index file on first
+    use, or iterated over in the order they were added.
+
+    The shard is read as it was when opened: the documents added afterwards
+    are only visible to a new CorpusShard.
+
+    Raises:
+        - ValueError if the files are not the files of a corpus shard.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        # The documents are written before their index entries: mapping the
+        # index first, the documents of its entries are all in the data
+        # mapped next, even if a writer is appending to the shard.
+        with open(path + SHARD_DATA_EXTENSION, 'rb') as data_file:
+            _read_header(data_file, _DATA_MAGIC)
+            with open(path + SHARD_INDEX_EXTENSION, 'rb') as index_file:
+                _read_header(index_file, _INDEX_MAGIC)
+                self._entries = _map_file(index_file)
+            self._data = _map_file(data_file)
+        entries_size = len(self._entries) - _SHARD_HEADER.size
+        self._count = max(0, entries_size // _INDEX_ENTRY.size)
+        # Leave out the entries of the documents still being written anyway
+        while self._count:
+            _, offset, size = self._get_entry(self._count - 1)
+            if offset + size <= len(self._data):
+                break
+            self._count -= 1
+        self._positions = None
+
+    def __len__(self):
+        return self._count
+
+    def _get_entry(self, position):
+        return _INDEX_ENTRY.unpack_from(
+            self._entries,
+            _SHARD_HEADER.size + position * _INDEX_ENTRY.size
+        )
+
+    def _get_positions(self):
+        if self._positions is None:
+            self._positions = {
+                self._get_entry(position)[0]: position
+                for position in range(self._count)
+            }
+        return self._positions
+
+    def _load(self, offset, size):
+        return CompactPdfFile.from_bytes(
+            memoryview(self._data)[offset:offset + size]
+        )
+
+    def __contains__(self, file_hash):
+        return bytes.fromhex(file_hash) in self._get_positions()
+
+    def get(self, file_hash):
+        """Return the CompactPdfFile of the document of (str)file_hash, or
+        None if the shard doesn't hold it.
+        """
+        position = self._get_positions().get(bytes.fromhex(file_hash))
+        if position is None:
+            return None
+        _, offset, size = self._get_entry(position)
+        return self._load(offset, size)
+
+    def hashes(self):
+        """Yield the hashes of the documents, in the order they were added.
+        """
+        for position in range(self._count):
+            yield self._get_entry(position)[0].hex()
+
+    def __iter__(self):
+        """Yield a (file_hash, CompactPdfFile) tuple for each document, in
+        the order they were added, which is the order of the data file.
+        """
+        for position in range(self._count):
+            digest, offset, size = self._get_entry(position)
+            yield digest.hex(), self._load(offset, size)
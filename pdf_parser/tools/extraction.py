@@ -1,69 +1,306 @@
 import re
+import pickle
+import hashlib
+import ahocorasick
+from collections import deque, OrderedDict
+
+
+def _get_title_regex(keyword):
+    return r''.join([r'(^|[\W]+)', keyword, r's?(?=[\W]+|$)'])
+
+
+class SectionAnalyzer(object):
+    """Find the titles of the sections matching a list of keywords in pdf
+    files.
+
+    The regular expressions are compiled once, and each pdf file is traversed
+    once for all the keywords, sharing the font statistics and the title
+    detection between them.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self._title_regexes = [
+            (keyword, re.compile(_get_title_regex(keyword), re.IGNORECASE))
+            for keyword in self.keywords
+        ]
+        # Matches a line if any of the keywords regexes does, to quickly
+        # skip the title-like lines matching none of them.
+        self._any_title_regex = re.compile(
+            '|'.join(
+                '(?:{})'.format(_get_title_regex(keyword))
+                for keyword in self.keywords
+            ),
+            re.IGNORECASE
+        )
+
+    def _find_titles_font_sizes(self, pdf_file):
+        """Return a dictionary of the font size of each keyword's titles, or 0
+        if no title matches the keyword.
+        """
+        titles_font_sizes = dict.fromkeys(self.keywords, 0)
+        list_fonts = pdf_file.get_font_size_list()
+        if not list_fonts or not self.keywords:
+            return titles_font_sizes
+
+        # Get the name of the biggest font
+        max_fonts_name = ''
+        for line in pdf_file.get_lines_by_font_size(max(list_fonts)):
+            max_fonts_name = line.font_face
+            break
+
+        mean_fonts = pdf_file.get_mean_font_size()
+        upper_mean = pdf_file.get_upper_mean_font_size()
+        for fsize in list_fonts:
+
+            # Skip the font sizes too small for any line to be a title
+            if pdf_file.has_bold:
+                can_be_title = (
+                    fsize >= upper_mean + (upper_mean - mean_fonts)
+                    or fsize > upper_mean + 2
+                )
+            else:
+                can_be_title = (fsize > mean_fonts + 1
+                                or fsize > upper_mean + 2)
+            if not can_be_title:
+                continue
+
+            matched_keywords = set()
+            for line in pdf_file.get_lines_by_font_size(fsize):
+
+                # If a font is bold, in title font and bigger than other,
+                # it is probably a title
+                text = line.text
+
+                # PdfFile has some bold font
+                if pdf_file.has_bold:
+                    font_is_bigger = fsize >= (upper_mean
+                                               + (upper_mean - mean_fonts))
+                    font_is_big_and_bold = font_is_bigger and line.bold
+                    font_is_title_like = (fsize > upper_mean + 2
+                                          and line.font_face == max_fonts_name)
+                    is_title = font_is_big_and_bold or font_is_title_like
+
+                # PdfFile has been parsed using pdftotext or has no bold
+                else:
+                    font_is_bigger = fsize > mean_fonts + 1
+                    font_is_title_like = (fsize > upper_mean + 2
+                                          and line.font_face == max_fonts_name)
+                    is_title = font_is_bigger or font_is_title_like
+
+                if not is_title or not self._any_title_regex.search(text):
+                    continue
+
+                for keyword, regex in self._title_regexes:
+                    if keyword not in matched_keywords and regex.search(text):
+                        matched_keywords.add(keyword)
+                        titles_font_sizes[keyword] = line.size
+
+                if len(matched_keywords) == len(titles_font_sizes):
+                    break
+
+        return titles_font_sizes
+
+    def may_find_titles(self, lines_texts):
+        """Return True if any of the lines, from an iterable of texts, could
+        be the title of a section, regardless of its font.
+        """
+        if not self.keywords:
+            return False
+        return any(self._any_title_regex.search(text) for text in lines_texts)
+
+    def find_elements(self, pdf_file):
+        """Return a dictionary of the elements defining the sections matching
+        each keyword: a list of (start title, end title) PdfLine tuples, the
+        end title being None for a section lasting until the end of the file.
+        """
+        titles_font_sizes = self._find_titles_font_sizes(pdf_file)
+
+        # Group the keywords by title font size, to go through each size's
+        # lines once
+        keywords_by_font_size = {}
+        for keyword, font_size in titles_font_sizes.items():
+            keywords_by_font_size.setdefault(font_size, []).append(keyword)
+
+        elements = {}
+        for font_size, keywords in keywords_by_font_size.items():
+            # Get all the line of found title font size
+            titles_section = pdf_file.get_lines_by_font_size(font_size)
+            lowered_texts = [line.text.lower() for line in titles_section]
+            for keyword in keywords:
+                titles = []
+                start_title = None
+                for line, text in zip(titles_section, lowered_texts):
+                    if start_title:
+                        titles.append((start_title, line))
+                        start_title = None
+                    if keyword in text:
+                        start_title = line
+                if start_title:
+                    titles.append((start_title, None))
+                elements[keyword] = titles
+
+        return elements
 
 
 def _find_elements(pdf_file, keyword):
     """Return an array of elements defining section matching the given keyword.
     Built to be used only inside the grab_section() function.
     """
+    return SectionAnalyzer([keyword]).find_elements(pdf_file)[keyword]
 
-    titles = []
-    titles_font_size = 0
-    list_fonts = pdf_file.get_font_size_list()
-    max_fonts_name = ''
-    regex = r''.join(['(^|[\W]+)', keyword, 's?(?=[\W]+|$)'])
 
-    if not list_fonts:
-        return titles
+def _is_word_character(character):
+    """Return True if the character matches the \\w regex class."""
+    return character.isalnum() or character == '_'
 
-    # Get the name of the biggest font
-    for line in pdf_file.get_lines_by_font_size(max(list_fonts)):
-        max_fonts_name = line.font_face
-        break
 
-    mean_fonts = pdf_file.get_mean_font_size()
-    upper_mean = pdf_file.get_upper_mean_font_size()
-    for fsize in list_fonts:
-        for line in pdf_file.get_lines_by_font_size(fsize):
+def _get_keywords_hash(keywords):
+    return hashlib.md5('\n'.join(keywords).encode('utf-8')).hexdigest()
 
-            # If a font is bold, in title font and bigger than other,
-            # it is probably a title
-            text = line.text
 
-            # PdfFile has some bold font
-            if pdf_file.has_bold:
-                font_is_bigger = fsize >= (upper_mean
-                                           + (upper_mean - mean_fonts))
-                font_is_big_and_bold = font_is_bigger and line.bold
-                font_is_title_like = (fsize > upper_mean + 2
-                                      and line.font_face == max_fonts_name)
-
-                if font_is_big_and_bold or font_is_title_like:
-                    match = re.search(regex, text, re.IGNORECASE)
-                    if match:
-                        titles_font_size = line.size
-                        break
-
-            # PdfFile has been parsed using pdftotext or has no bold
-            else:
-                font_is_bigger = fsize > mean_fonts + 1
-                font_is_title_like = (fsize > upper_mean + 2
-                                      and line.font_face == max_fonts_name)
-                if font_is_bigger or font_is_title_like:
-                    match = re.search(regex, text, re.IGNORECASE)
-                    if match:
-                        titles_font_size = line.size
-                        break
-
-    # Get all the line of found title font size
-    titles_section = pdf_file.get_lines_by_font_size(titles_font_size)
-    start_title = None
-    for line in titles_section:
-        if start_title:
-            titles.append((start_title, line))
-            start_title = None
-        if keyword in line.text.lower():
-            start_title = line
-    if start_title:
-        titles.append((start_title, None))
-
-    return titles
+# The (keywords, automaton) tuples already built or loaded in this process,
+# by keywords hash: the matchers sent to the worker processes only get theirs
+# once
+_automatons = {}
+
+
+class KeywordMatcher(object):
+    """Find the lines containing a list of keywords in pdf files.
+
+    The Aho-Corasick automaton is built once, and the lines of each pdf file
+    are streamed through it. A keyword only matches a line if one of its
+    occurrences in it isn't part of a bigger word; the line is then reported
+    once per occurrence of the keyword in it.
+
+    The matcher can be saved to a file, to skip building the automaton the
+    next time. When pickled, a saved matcher only keeps the path of its file,
+    and other matchers their keywords: the automaton is loaded or rebuilt
+    once per process.
+    """
+
+    def __init__(self, keywords):
+        self.keywords = list(keywords)
+        self.keywords_hash = _get_keywords_hash(self.keywords)
+        if self.keywords_hash not in _automatons:
+            _automatons[self.keywords_hash] = (
+                self.keywords,
+                self._build_automaton()
+            )
+        self._set_state(self.keywords_hash)
+
+    def _set_state(self, keywords_hash, path=None):
+        self.keywords_hash = keywords_hash
+        self.keywords, self._automaton = _automatons[keywords_hash]
+        self.path = path
+
+    def __getstate__(self):
+        if self.path:
+            return {'keywords_hash': self.keywords_hash, 'path': self.path}
+        return {'keywords': self.keywords}
+
+    def __setstate__(self, state):
+        if 'path' not in state:
+            self.__init__(state['keywords'])
+        elif state['keywords_hash'] in _automatons:
+            self._set_state(state['keywords_hash'], state['path'])
+        else:
+            self.__dict__.update(self.load(state['path']).__dict__)
+
+    def save(self, path):
+        """Save the keywords and the automaton to the file at (str)path."""
+        with open(path, 'wb') as f:
+            pickle.dump(
+                (self.keywords_hash, self.keywords, self._automaton),
+                f,
+                pickle.HIGHEST_PROTOCOL
+            )
+        self.path = path
+
+    @classmethod
+    def load(cls, path):
+        """Return the KeywordMatcher saved to the file at (str)path."""
+        with open(path, 'rb') as f:
+            keywords_hash, keywords, automaton = pickle.load(f)
+        _automatons.setdefault(keywords_hash, (keywords, automaton))
+        matcher = cls.__new__(cls)
+        matcher._set_state(keywords_hash, path)
+        return matcher
+
+    def _build_automaton(self):
+        """Return the automaton matching the keywords, or None if there are
+        no keywords.
+        """
+        if not self.keywords:
+            return None
+        automaton = ahocorasick.Automaton()
+        for keyword in set(self.keywords):
+            automaton.add_word(keyword, keyword)
+        automaton.make_automaton()
+        return automaton
+
+    def match_line(self, text):
+        """Return an ordered dictionary of the number of occurrences of each
+        keyword matching the (str)text of a line.
+        """
+        text = text.lower()
+        occurrences = OrderedDict()
+        bounded_keywords = set()
+        for end, keyword in self._automaton.iter(text):
+            occurrences[keyword] = occurrences.get(keyword, 0) + 1
+            if keyword in bounded_keywords:
+                continue
+            start = end - len(keyword) + 1
+            if start > 0 and _is_word_character(text[start - 1]):
+                continue
+            if end + 1 < len(text) and _is_word_character(text[end + 1]):
+                continue
+            bounded_keywords.add(keyword)
+        return OrderedDict(
+            (keyword, count) for keyword, count in occurrences.items()
+            if keyword in bounded_keywords
+        )
+
+    def matches_any(self, lines_texts):
+        """Return True if any keyword matches any of the lines, from an
+        iterable of texts.
+        """
+        if self._automaton is None:
+            return False
+        return any(self.match_line(text) for text in lines_texts)
+
+    def find_lines(self, lines_texts, context=0):
+        """Return a dictionary of the lines containing each keyword, from an
+        iterable of the texts of all the lines of a document. The (int)context
+        lines before and after each matching line are returned with it.
+        """
+        keyword_blocks = OrderedDict()
+        if self._automaton is None:
+            return {}
+
+        previous_lines = deque(maxlen=context)
+        # The blocks still waiting for their following context lines, along
+        # with the number of lines they're missing
+        open_blocks = deque()
+        for text in lines_texts:
+            for block in open_blocks:
+                block[0].append(text)
+                block[1] -= 1
+            while open_blocks and not open_blocks[0][1]:
+                open_blocks.popleft()
+
+            for keyword, count in self.match_line(text).items():
+                blocks = keyword_blocks.setdefault(keyword, [])
+                for _ in range(count):
+                    block = list(previous_lines)
+                    block.append(text)
+                    blocks.append(block)
+                    if context:
+                        open_blocks.append([block, context])
+            if context:
+                previous_lines.append(text)
+
+        return {
+            keyword: [text for block in blocks for text in block]
+            for keyword, blocks in keyword_blocks.items()
+        }
@@ -0,0 +1,131 @@
+import logging
+from ..pdf_parse import extract_pdf_text, get_page_count
+
+logger = logging.getLogger(__name__)
+
+# Size of the chunks the pdf files are scanned by
+CHUNK_SIZE = 65536
+# The end of file marker is expected in the last bytes of the file
+EOF_WINDOW = 1024
+
+_MARKERS = [b'/Encrypt', b'/Font', b'/ObjStm']
+
+
+class PdfRejected(Exception):
+    """Raised when a pdf fails its pre-check, before being converted. The
+    `reason` attribute is either 'corrupt', 'encrypted' or 'image_only'.
+    """
+
+    def __init__(self, document_name, reason):
+        # Keep the arguments in self.args so that the exception can be
+        # pickled back from a worker process.
+        super().__init__(document_name, reason)
+        self.document_name = document_name
+        self.reason = reason
+
+    def __str__(self):
+        return 'The pdf [{}] was rejected: {}'.format(
+            self.document_name,
+            self.reason,
+        )
+
+
+def _scan_pdf(document):
+    """Return whether the document starts with a pdf header, the set of
+    _MARKERS found in its raw bytes, and whether it ends with an end of file
+    marker. The file is read by chunks.
+    """
+    document.seek(0)
+    header = document.read(EOF_WINDOW)
+    has_header = b'%PDF-' in header
+
+    found = set()
+    overlap = max(len(marker) for marker in _MARKERS) - 1
+    tail = b''
+    chunk = header
+    while chunk:
+        # Keep the end of the previous chunk, for the markers between chunks
+        data = tail + chunk
+        for marker in _MARKERS:
+            if marker not in found and marker in data:
+                found.add(marker)
+        tail = data[-max(overlap, EOF_WINDOW):]
+        chunk = document.read(CHUNK_SIZE)
+
+    return has_header, found, b'%%EOF' in tail[-EOF_WINDOW:]
+
+
+def _get_spread_pages(first_page, page_count, count):
+    """Return at most count page numbers spread evenly from first_page to
+    the last page of a document of page_count pages, both included.
+    """
+    pages = range(first_page, page_count + 1)
+    if not pages or count < 1:
+        return []
+    if count == 1:
+        return [pages[-1]]
+    return sorted({
+        pages[(len(pages) - 1) * i // (count - 1)]
+        for i in range(count)
+    })
+
+
+def _has_text_further(document, probe_pages, limits):
+    """Return whether one of probe_pages pages spread through the rest of
+    the document, after its first probe_pages pages, has some text, or if
+    it can't be told.
+    """
+    page_count = get_page_count(document)
+    if not page_count:
+        return True
+    for page in _get_spread_pages(probe_pages + 1, page_count, probe_pages):
+        text = extract_pdf_text(
+            document,
+            limits,
+            first_page=page,
+            last_page=page
+        )
+        if text is None or text.strip():
+            return True
+    return False
+
+
+def check_pdf(document, probe_pages=3, limits=None):
+    """Check that a pdf document is worth converting, before converting it,
+    and return the reason why it isn't ('corrupt', 'encrypted' or
+    'image_only'), or None if it is.
+
+    The raw bytes of the file are scanned for its header, its end of file
+    marker, an encryption dictionary and font resources. When they are not
+    conclusive (encrypted documents can still be readable, fonts can be
+    hidden in compressed object streams, and poppler can repair some broken
+    files), the text of the first (int)probe_pages pages is extracted with
+    pdftotext. If they have no text, as when a report starts with a full
+    page cover image, probe_pages other pages spread through the rest of
+    the document are probed before rejecting it as image-only.
+
+    Args:
+        - document: The pdf file object.
+        - limits: The ConversionLimits of the text extraction.
+
+    Raises:
+        - ConversionLimitExceeded if the text extraction exceeded the limits.
+    """
+    has_header, markers, has_eof = _scan_pdf(document)
+    if not has_header:
+        return 'corrupt'
+
+    is_encrypted = b'/Encrypt' in markers
+    has_fonts = b'/Font' in markers
+    if not has_fonts and b'/ObjStm' not in markers:
+        return 'image_only'
+    if has_fonts and has_eof and not is_encrypted:
+        return None
+
+    text = extract_pdf_text(document, limits, last_page=probe_pages)
+    if text is None:
+        return 'encrypted' if is_encrypted else 'corrupt'
+    if not text.strip() and not _has_text_further(
+            document, probe_pages, limits):
+        return 'image_only'
+    return None
@@ -48,10 +48,40 @@ class TestDBTools(unittest.TestCase):
         self.database._execute('DELETE FROM keyword')
         self.database._execute('DELETE FROM publication')
         self.database._execute('DELETE FROM provider')
+        self.database._execute('DELETE FROM download')
 
     def test_full_publication(self):
         self.assertTrue(self.database.get_scraping_info('0' * 32))
 
+    def test_download_validators(self):
+        validators = {
+            'etag': '"foo"',
+            'last_modified': 'Mon, 01 Jan 2018 00:00:00 GMT',
+            'content_length': 1024,
+        }
+        self.database.set_download_validators('http://foo.bar', validators)
+        # Urls without publications are left out
+        self.database.set_download_validators('http://bar.foo', validators)
+        self.assertEqual(
+            self.database.get_download_validators(),
+            {'http://foo.bar': validators}
+        )
+
+        validators['etag'] = '"bar"'
+        self.database.set_download_validators('http://foo.bar', validators)
+        self.assertEqual(
+            self.database.get_download_validators()['http://foo.bar'],
+            validators
+        )
+
+        self.database.reset_scraped()
+        self.assertEqual(self.database.get_download_validators(), {})
+
+    def test_scraped_urls(self):
+        self.assertEqual(self.database.get_scraped_urls(), {'http://foo.bar'})
+        self.database.reset_scraped()
+        self.assertEqual(self.database.get_scraped_urls(), set())
+
     def test_joints(self):
         self.database._execute('SELECT * FROM section')
         self.assertTrue(self.database.cursor.fetchone())
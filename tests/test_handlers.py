@@ -0,0 +1,411 @@
+import os
+import gc
+import hashlib
+import unittest
+from twisted.internet import defer
+from twisted.python.failure import Failure
+from twisted.web.client import ResponseDone, ResponseFailed
+from twisted.web.http import _DataLoss
+from twisted.web.http_headers import Headers as TxHeaders
+from twisted.web.iweb import UNKNOWN_LENGTH
+from scrapy.http import Request, Response
+from wsf_scraping.handlers import (SpooledResponse, NotPdfResponse,
+                                   NotModified, is_unchanged,
+                                   _SpoolingResponseReader, _SpoolingAgent)
+from wsf_scraping.middlewares import (ConditionalDownloadMiddleware,
+                                      KnownUrlsMiddleware, get_document_key)
+from wsf_scraping.spiders.base_spider import BaseSpider
+
+TEST_PDF = 'tests/pdfs/test_pdf.pdf'
+
+
+class _FakeProducer(object):
+
+    def __init__(self):
+        self.aborted = False
+
+    def abortConnection(self):
+        self.aborted = True
+
+    loseConnection = abortConnection
+
+
+class _FakeTransport(object):
+
+    def __init__(self):
+        self._producer = _FakeProducer()
+
+
+class _FakeTxResponse(object):
+
+    def __init__(self, content_type=b'application/pdf',
+                 length=UNKNOWN_LENGTH, code=200, etag=None):
+        self.code = code
+        self.length = length
+        self.headers = TxHeaders({b'content-type': [content_type]})
+        if etag:
+            self.headers.setRawHeaders(b'etag', [etag])
+        self._transport = _FakeTransport()
+
+
+class _FakeDatabase(object):
+
+    def __init__(self, validators, urls=()):
+        self.validators = validators
+        self.urls = set(urls)
+
+    def get_scraped_urls(self):
+        return set(self.urls)
+
+    def get_download_validators(self):
+        return dict(self.validators)
+
+    def set_download_validators(self, url, validators):
+        self.validators[url] = validators
+
+
+class _FakeStats(object):
+
+    def __init__(self):
+        self.stats = {}
+
+    def inc_value(self, key, spider=None):
+        self.stats[key] = self.stats.get(key, 0) + 1
+
+    def get_value(self, key, default=None, spider=None):
+        return self.stats.get(key, default)
+
+    def set_value(self, key, value, spider=None):
+        self.stats[key] = value
+
+
+class TestSpoolingHandler(unittest.TestCase):
+
+    def setUp(self):
+        with open(TEST_PDF, 'rb') as f:
+            self.body = f.read()
+
+    def _read(self, reason, maxsize=0, fail_on_dataloss=True,
+              check_magic=False, body=None):
+        finished = defer.Deferred()
+        results = []
+        finished.addBoth(results.append)
+        self.txresponse = _FakeTxResponse()
+        reader = _SpoolingResponseReader(
+            finished,
+            self.txresponse,
+            Request('http://foo.bar'),
+            maxsize,
+            0,
+            fail_on_dataloss,
+            check_magic=check_magic,
+        )
+        body = self.body if body is None else body
+        for start in range(0, len(body), 1000):
+            reader.dataReceived(body[start:start + 1000])
+        reader.connectionLost(Failure(reason))
+        return reader, results[0]
+
+    def test_reader(self):
+        _, (txresponse, spool_file, flags) = self._read(ResponseDone())
+        self.assertIs(txresponse, self.txresponse)
+        self.assertIsNone(flags)
+        self.assertEqual(spool_file.size, len(self.body))
+        self.assertEqual(
+            spool_file.hash,
+            hashlib.md5(self.body).hexdigest()
+        )
+        with open(spool_file.path, 'rb') as f:
+            self.assertEqual(f.read(), self.body)
+
+        # The file is removed with the SpoolFile
+        path = spool_file.path
+        del spool_file
+        gc.collect()
+        self.assertFalse(os.path.exists(path))
+
+    def test_reader_errors(self):
+        dataloss = ResponseFailed([Failure(_DataLoss())])
+        reader, failure = self._read(dataloss)
+        self.assertIsInstance(failure, Failure)
+        self.assertFalse(os.path.exists(reader._file.name))
+
+        _, (_, spool_file, flags) = self._read(
+            dataloss,
+            fail_on_dataloss=False
+        )
+        self.assertEqual(flags, ['dataloss'])
+
+        reader, failure = self._read(ResponseDone(), maxsize=100)
+        self.assertTrue(failure.check(defer.CancelledError))
+        self.assertFalse(os.path.exists(reader._file.name))
+
+    def test_save_spooled_pdf(self):
+        _, (_, spool_file, _) = self._read(ResponseDone())
+        request = Request('http://foo.bar', meta={'data_dict': {}})
+        response = SpooledResponse(
+            'http://foo.bar',
+            headers={'content-type': b'application/pdf'},
+            request=request,
+            spool_file=spool_file,
+        ).replace(status=200)
+        self.assertIs(response.spool_file, spool_file)
+
+        item = BaseSpider().save_pdf(response)
+        del response, spool_file
+        gc.collect()
+        # The spider took the ownership of the spooled file
+        self.assertTrue(os.path.exists(item['pdf']))
+        self.assertEqual(item['hash'], hashlib.md5(self.body).hexdigest())
+        os.unlink(item['pdf'])
+
+    def test_save_binary_pdf(self):
+        request = Request('http://foo.bar', meta={'data_dict': {}})
+        spider = BaseSpider()
+        for content_type, body, is_pdf in [
+            (b'application/octet-stream', self.body, True),
+            (b'binary/octet-stream', self.body, True),
+            (None, self.body, True),
+            (b'application/octet-stream', b'<html></html>', False),
+            (b'text/html', self.body, False),
+        ]:
+            headers = {'content-type': content_type} if content_type else {}
+            item = spider.save_pdf(Response(
+                'http://foo.bar',
+                headers=headers,
+                body=body,
+                request=request,
+            ))
+            self.assertEqual(bool(item), is_pdf)
+            if item:
+                os.unlink(item['pdf'])
+
+        # The spooled responses are checked from their file
+        _, (_, spool_file, _) = self._read(ResponseDone())
+        item = spider.save_pdf(SpooledResponse(
+            'http://foo.bar',
+            headers={'content-type': b'binary/octet-stream'},
+            request=request,
+            spool_file=spool_file,
+        ))
+        self.assertEqual(item['hash'], hashlib.md5(self.body).hexdigest())
+        os.unlink(item['pdf'])
+
+    def test_reader_magic(self):
+        _, (_, spool_file, _) = self._read(ResponseDone(), check_magic=True)
+        self.assertEqual(spool_file.size, len(self.body))
+
+        # Aborted once the magic bytes window is received
+        reader, failure = self._read(
+            ResponseDone(),
+            check_magic=True,
+            body=b'<html>' + b' ' * 5000,
+        )
+        self.assertEqual(failure.value.reason, 'magic')
+        self.assertEqual(reader._bytes_received, 2000)
+        self.assertTrue(self.txresponse._transport._producer.aborted)
+        self.assertFalse(os.path.exists(reader._file.name))
+
+        _, failure = self._read(
+            ResponseDone(),
+            check_magic=True,
+            body=b'<html></html>',
+        )
+        self.assertTrue(failure.check(NotPdfResponse))
+
+    def test_rejection_reason(self):
+        agent = _SpoolingAgent(check_pdf=True)
+        for txresponse, reason in [
+            (_FakeTxResponse(), None),
+            (_FakeTxResponse(b'application/octet-stream'), None),
+            (_FakeTxResponse(b'text/html; charset=utf-8'), 'content_type'),
+            (_FakeTxResponse(b'text/html', code=404), None),
+            (_FakeTxResponse(length=2), 'content_length'),
+        ]:
+            self.assertEqual(agent._get_rejection_reason(txresponse), reason)
+        self.assertIsNone(
+            _SpoolingAgent()._get_rejection_reason(
+                _FakeTxResponse(b'text/html')
+            )
+        )
+        self.assertTrue(_SpoolingAgent(check_pdf=True)._should_spool(
+            _FakeTxResponse(b'application/octet-stream')
+        ))
+
+    def test_is_unchanged(self):
+        validators = {
+            'etag': '"foo"',
+            'last_modified': 'Mon, 01 Jan 2018 00:00:00 GMT',
+            'content_length': 1024,
+        }
+        self.assertTrue(is_unchanged(validators, validators))
+        self.assertFalse(is_unchanged(validators, {'etag': '"bar"'}))
+        self.assertTrue(is_unchanged(
+            dict(validators, etag=None),
+            dict(validators, etag='"bar"')
+        ))
+        self.assertFalse(is_unchanged(
+            dict(validators, etag=None),
+            dict(validators, etag=None, content_length=1000)
+        ))
+        self.assertFalse(is_unchanged(
+            dict(validators, etag=None, content_length=None),
+            validators
+        ))
+
+        request = Request(
+            'http://foo.bar',
+            meta={'download_validators': validators}
+        )
+        self.assertTrue(_SpoolingAgent._is_unchanged(
+            _FakeTxResponse(etag=b'"foo"'),
+            request
+        ))
+        self.assertFalse(_SpoolingAgent._is_unchanged(
+            _FakeTxResponse(etag=b'"bar"'),
+            request
+        ))
+
+
+class TestConditionalDownloadMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.spider = BaseSpider()
+        self.validators = {
+            'etag': '"foo"',
+            'last_modified': None,
+            'content_length': 1024,
+        }
+        self.database = _FakeDatabase({'http://foo.bar': self.validators})
+        self.stats = _FakeStats()
+        self.middleware = ConditionalDownloadMiddleware(
+            self.database,
+            self.stats
+        )
+        self.middleware.spider_opened(self.spider)
+
+    def _request(self, url='http://foo.bar'):
+        return Request(url, callback=self.spider.save_pdf)
+
+    def test_conditional_request(self):
+        request = self._request()
+        self.middleware.process_request(request, self.spider)
+        self.assertEqual(request.headers[b'If-None-Match'], b'"foo"')
+        self.assertNotIn(b'If-Modified-Since', request.headers)
+
+        with self.assertRaises(NotModified):
+            self.middleware.process_response(
+                request,
+                Response('http://foo.bar', status=304),
+                self.spider,
+            )
+        self.assertEqual(self.stats.stats, {
+            'conditional_download/sent': 1,
+            'conditional_download/not_modified': 1,
+        })
+
+        # Only the pdfs are requested conditionally
+        request = Request('http://foo.bar')
+        self.middleware.process_request(request, self.spider)
+        self.assertNotIn(b'If-None-Match', request.headers)
+
+    def test_response_validators(self):
+        request = self._request('http://bar.foo')
+        request.meta['data_dict'] = {}
+        self.middleware.process_request(request, self.spider)
+        self.assertNotIn(b'If-None-Match', request.headers)
+        response = self.middleware.process_response(
+            request,
+            Response(
+                'http://bar.foo',
+                headers={
+                    'Content-Type': 'application/pdf',
+                    'Last-Modified': 'Mon, 01 Jan 2018 00:00:00 GMT',
+                },
+                body=b'%PDF-',
+                request=request,
+            ),
+            self.spider,
+        )
+        validators = {
+            'etag': None,
+            'last_modified': 'Mon, 01 Jan 2018 00:00:00 GMT',
+            'content_length': 5,
+        }
+        # Only stored by the pipeline, once the item is stored
+        self.assertNotIn('http://bar.foo', self.database.validators)
+        item = self.spider.save_pdf(response)
+        os.unlink(item['pdf'])
+        self.assertEqual(item['download_validators'], validators)
+
+
+class TestKnownUrlsMiddleware(unittest.TestCase):
+
+    def setUp(self):
+        self.spider = BaseSpider()
+        self.database = _FakeDatabase({}, [
+            'https://apps.who.int/iris/bitstream/handle/10665/272346/'
+            'foo.pdf?sequence=1&isAllowed=y',
+            'http://foo.bar/foo.pdf?b=2&a=1',
+        ])
+        self.stats = _FakeStats()
+        self.middleware = KnownUrlsMiddleware(self.database, self.stats)
+        self.middleware.spider_opened(self.spider)
+
+    def test_document_key(self):
+        key = 'apps.who.int/iris/handle/10665/272346'
+        for url in [
+            'http://apps.who.int/iris/handle/10665/272346?show=full',
+            'http://apps.who.int/iris/bitstream/handle/10665/272346/'
+            'bar.pdf?sequence=3&isAllowed=y',
+            'https://apps.who.int/iris/handle/10665/272346#foo',
+        ]:
+            self.assertEqual(get_document_key(url), key)
+        self.assertNotEqual(
+            get_document_key('http://apps.who.int/iris/handle/10665/27234'),
+            key
+        )
+        self.assertEqual(
+            get_document_key('http://foo.bar/foo.pdf?sequence=1&b=2&a=1'),
+            'foo.bar/foo.pdf?a=1&b=2&sequence=1'
+        )
+        self.assertEqual(
+            get_document_key(
+                'http://foo.bar/iris/bitstream/10665/1/bar.pdf?sequence=1'
+            ),
+            'foo.bar/iris/bitstream/10665/1/bar.pdf'
+        )
+        # The parameters of the other providers' urls are kept
+        self.assertNotEqual(
+            get_document_key('http://foo.bar/doc?show=1'),
+            get_document_key('http://foo.bar/doc?show=2')
+        )
+
+    def test_skip_known_urls(self):
+        requests = [
+            Request('http://apps.who.int/iris/handle/10665/272346?show=full'),
+            Request('http://foo.bar/foo.pdf?a=1&b=2'),
+            Request('http://foo.bar/foo.pdf?a=1&b=2', dont_filter=True),
+            Request('http://foo.bar/bar.pdf'),
+            {'title': 'foo'},
+        ]
+        result = list(self.middleware.process_spider_output(
+            Response('http://foo.bar'),
+            requests,
+            self.spider
+        ))
+        self.assertEqual(result, requests[2:])
+        self.assertEqual(
+            list(self.middleware.process_start_requests(
+                requests[:1],
+                self.spider
+            )),
+            []
+        )
+
+        self.middleware.spider_closed(self.spider)
+        self.assertEqual(self.stats.stats, {
+            'known_urls/checked': 4,
+            'known_urls/skipped': 3,
+            'known_urls/hit_rate': 0.75,
+        })
@@ -1,9 +1,13 @@
 import unittest
 import json
-from pdf_parser.pdf_parse import parse_pdf_document
-from pdf_parser.objects.PdfObjects import PdfFile
+import os
+import tempfile
+from pdf_parser.pdf_parse import parse_pdf_document, parse_pdf_xml
+from pdf_parser.objects.PdfObjects import (PdfFile, PdfPage, PdfLine,
+                                           CompactPdfFile)
 
 TEST_PDF = 'tests/pdfs/test_pdf.pdf'
+TEST_XML = 'tests/pdfs/test_pdf.xml'
 
 """Test file content (html transcription):
 <h1>Test</h1>
@@ -119,3 +123,102 @@ class TestPdfObjects(unittest.TestCase):
         pdf_file.from_json(JSON_PDF)
         pdf_export = pdf_file.to_json()
         self.assertEqual(pdf_export, JSON_PDF)
+
+    def test_font_index_reset(self):
+        pdf_file = PdfFile([])
+        pdf_file.from_json(JSON_PDF)
+        self.assertEqual(len(pdf_file.get_lines_by_font_size(12)), 1)
+        pdf_file.add_page(PdfPage([PdfLine(12, False, 'Page 3', 3, '')], 3))
+        self.assertEqual(len(pdf_file.get_lines_by_font_size(12)), 2)
+        self.assertEqual(pdf_file.get_mean_font_size(), 15)
+
+    def test_text_index(self):
+        pdf_file = PdfFile([])
+        pdf_file.from_json(JSON_PDF)
+        pdf_file.add_page(PdfPage([PdfLine(12, False, '3', 3, '')], 3))
+        text = pdf_file.get_text()
+        self.assertEqual(
+            text,
+            'Page 1 - Title 1Page 2 - Title 2\nPage 2 - Text 1'
+        )
+        line = pdf_file.get_page(1).lines[1]
+        offset = pdf_file.get_line_offset(line)
+        self.assertEqual(text[offset:], line.text)
+        self.assertEqual(pdf_file.get_page_end_offset(0), 16)
+        self.assertEqual(pdf_file.get_page_end_offset(2), len(text))
+        compact_pdf_file = CompactPdfFile.from_pdf_file(pdf_file)
+        self.assertEqual(compact_pdf_file.get_text(), text)
+        self.assertEqual(
+            compact_pdf_file.get_line_offset(compact_pdf_file.get_line(2)),
+            offset
+        )
+
+
+class TestCompactPdfFile(unittest.TestCase):
+
+    def setUp(self):
+        self.pdf_file = PdfFile()
+        self.pdf_file.from_json(JSON_PDF)
+        self.compact_pdf_file = CompactPdfFile.from_pdf_file(self.pdf_file)
+
+    def test_views(self):
+        self.assertEqual(len(self.compact_pdf_file.pages), 2)
+        self.assertEqual(
+            self.compact_pdf_file.get_page(1),
+            self.pdf_file.get_page(1)
+        )
+        self.assertEqual(
+            self.compact_pdf_file.get_line(2).text,
+            'Page 2 - Text 1'
+        )
+
+    def test_statistics(self):
+        for method in ['get_mean_font_size', 'get_upper_mean_font_size',
+                       'get_font_size_list', 'get_bold_lines']:
+            self.assertEqual(
+                getattr(self.compact_pdf_file, method)(),
+                getattr(self.pdf_file, method)()
+            )
+        self.assertEqual(
+            self.compact_pdf_file.get_lines_by_font_size(17),
+            self.pdf_file.get_lines_by_font_size(17)
+        )
+
+    def test_to_json(self):
+        self.assertEqual(self.compact_pdf_file.to_json(), JSON_PDF)
+
+    def test_parse_compact(self):
+        self.assertEqual(
+            parse_pdf_xml(TEST_XML, compact=True).to_pdf_file(),
+            parse_pdf_xml(TEST_XML)
+        )
+
+    def test_binary_round_trip(self):
+        binary = self.compact_pdf_file.to_bytes()
+        loaded_pdf_file = CompactPdfFile.from_bytes(binary)
+        self.assertEqual(loaded_pdf_file.to_json(), JSON_PDF)
+        self.assertEqual(loaded_pdf_file.to_bytes(), binary)
+        self.assertEqual(
+            loaded_pdf_file.get_mean_font_size(),
+            self.pdf_file.get_mean_font_size()
+        )
+
+    def test_binary_load(self):
+        pdf_file = parse_pdf_xml(TEST_XML, compact=True)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'test_pdf.bin')
+            pdf_file.save(path)
+            loaded_pdf_file = CompactPdfFile.load(path)
+            self.assertEqual(
+                loaded_pdf_file.to_pdf_file(),
+                pdf_file.to_pdf_file()
+            )
+            self.assertEqual(loaded_pdf_file.get_text(), pdf_file.get_text())
+
+    def test_binary_invalid(self):
+        with self.assertRaises(ValueError):
+            CompactPdfFile.from_bytes(b'')
+        with self.assertRaises(ValueError):
+            CompactPdfFile.from_bytes(JSON_PDF.encode('utf-8'))
+        with self.assertRaises(ValueError):
+            CompactPdfFile.from_bytes(self.compact_pdf_file.to_bytes()[:-8])
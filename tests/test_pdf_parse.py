@@ -0,0 +1,287 @@
+import io
+import os
+import sys
+import pickle
+import unittest
+import subprocess
+from collections import namedtuple
+from twisted.python.failure import Failure
+from twisted.internet.error import ProcessDone, ProcessTerminated
+from pdf_parser.pdf_parse import (parse_pdf_document, parse_pdf_xml,
+                                  parse_pdf_xml_soup, ConversionLimits,
+                                  ConversionLimitExceeded, get_page_count,
+                                  parse_pdf_tail, extract_pdf_text,
+                                  parse_pdf_chunked, PageChunking,
+                                  grab_sections, _PdfFileBuilder)
+from pdf_parser.objects.PdfObjects import PdfFile, CompactPdfFile
+from pdf_parser.pdf_parse_async import PdfToHtmlProtocol
+from pdf_parser.backends import get_backend
+from pdf_parser import pdfminer_parse, poppler_parse
+
+TEST_PDF = 'tests/pdfs/test_pdf.pdf'
+TEST_XML = 'tests/pdfs/test_pdf.xml'
+
+
+class TestPdfParse(unittest.TestCase):
+
+    def test_parse_xml(self):
+        pdf_file = parse_pdf_xml(TEST_XML)
+        self.assertEqual(len(pdf_file.pages), 2)
+        self.assertEqual(pdf_file.get_page(1).number, 1)
+        self.assertEqual(
+            pdf_file.get_page(0).lines[0].text.strip(),
+            'Test'
+        )
+
+    def test_parse_xml_matches_soup(self):
+        self.assertEqual(parse_pdf_xml(TEST_XML), parse_pdf_xml_soup(TEST_XML))
+
+    def test_parse_xml_file_object(self):
+        with open(TEST_XML, 'rb') as f:
+            xml_content = f.read()
+        pdf_file = parse_pdf_xml(io.BytesIO(xml_content))
+        self.assertEqual(pdf_file, parse_pdf_xml(TEST_XML))
+
+    def test_parse_document_pipe_matches_file(self):
+        with open(TEST_PDF, 'rb') as f:
+            piped_pdf_file = parse_pdf_document(f)
+            self.assertFalse(os.path.exists(TEST_PDF + '.xml'))
+            pdf_file = parse_pdf_document(f, use_pipe=False)
+            self.assertFalse(os.path.exists(TEST_PDF + '.xml'))
+        self.assertTrue(piped_pdf_file.pages)
+        self.assertEqual(piped_pdf_file, pdf_file)
+
+    def test_conversion_cpu_limit(self):
+        limits = ConversionLimits(cpu_time=1)
+        process = subprocess.Popen(
+            limits.get_command([sys.executable, '-c', 'while True: pass']),
+        )
+        returncode = process.wait(timeout=30)
+        self.assertEqual(limits.get_exceeded_limit(returncode), 'cpu')
+
+    def test_conversion_crash(self):
+        limits = ConversionLimits(memory=2 ** 30)
+        for script, exceeded_limit in [
+            # A crash well under the memory limit
+            ('import os; os.abort()', None),
+            ('import os, sys; sys.stderr.write("Out of memory\\n"); '
+             'sys.stderr.flush(); os.abort()', 'memory'),
+        ]:
+            process = subprocess.Popen(
+                limits.get_command([sys.executable, '-c', script]),
+                stderr=subprocess.PIPE,
+            )
+            _, error_output = process.communicate(timeout=30)
+            self.assertEqual(
+                limits.get_exceeded_limit(process.returncode, error_output),
+                exceeded_limit
+            )
+
+    def test_limited_command(self):
+        cmd = ['echo', 'test']
+        self.assertEqual(ConversionLimits().get_command(cmd), cmd)
+        limited_cmd = ConversionLimits(
+            cpu_time=7,
+            memory=2 ** 30
+        ).get_command(['sh', '-c', 'ulimit -t; ulimit -v'])
+        output = subprocess.check_output(limited_cmd)
+        self.assertEqual(output.split(), [b'7', b'1048576'])
+
+    def test_conversion_limit_exceeded_pickle(self):
+        error = pickle.loads(pickle.dumps(
+            ConversionLimitExceeded('foo.pdf', 'memory')
+        ))
+        self.assertEqual(error.limit, 'memory')
+        self.assertEqual(error.document_name, 'foo.pdf')
+
+    def test_parse_tail(self):
+        with open(TEST_PDF, 'rb') as f:
+            self.assertEqual(get_page_count(f), 1)
+            pdf_file = parse_pdf_tail(f, ['references'], 1)
+            self.assertEqual(pdf_file, parse_pdf_document(f))
+
+    def test_extract_text(self):
+        with open(TEST_PDF, 'rb') as f:
+            text = extract_pdf_text(f)
+        self.assertIn('References', text.splitlines())
+
+
+def _parse_xml_range(document, limits=None, first_page=None, last_page=None,
+                     compact=False):
+    """A backend converting a range of the pages of the test xml file,
+    numbered from 0 like the ranges converted by pdftohtml.
+    """
+    first_index = (first_page or 1) - 1
+    pages = parse_pdf_xml(TEST_XML).pages[first_index:last_page]
+    pdf_file = PdfFile([])
+    pdf_file.extend(PdfFile(pages), -first_index)
+    if compact:
+        return CompactPdfFile.from_pdf_file(pdf_file)
+    return pdf_file
+
+
+class TestPageChunking(unittest.TestCase):
+
+    def test_page_ranges(self):
+        chunking = PageChunking(min_pages=10, chunk_pages=4)
+        self.assertIsNone(chunking.get_page_ranges(10))
+        self.assertIsNone(chunking.get_page_ranges(None))
+        self.assertEqual(
+            chunking.get_page_ranges(11),
+            [(1, 4), (5, 8), (9, 11)]
+        )
+        self.assertIsNone(PageChunking().get_page_ranges(1000))
+
+    def test_parse_chunked(self):
+        chunking = PageChunking(min_pages=1, chunk_pages=1, workers=2)
+        keywords = ['references', 'appendix']
+        for compact in [False, True]:
+            with open(TEST_XML, 'rb') as f:
+                serial_pdf_file = _parse_xml_range(f, compact=compact)
+                pdf_file = parse_pdf_chunked(
+                    f,
+                    chunking,
+                    page_count=2,
+                    backend=_parse_xml_range,
+                    compact=compact,
+                )
+            self.assertEqual(pdf_file, serial_pdf_file)
+            self.assertEqual(
+                grab_sections(pdf_file, keywords),
+                grab_sections(serial_pdf_file, keywords)
+            )
+            self.assertEqual(
+                pdf_file.get_lines_by_keywords(['test'], 1),
+                serial_pdf_file.get_lines_by_keywords(['test'], 1)
+            )
+
+
+class TestAsyncParse(unittest.TestCase):
+
+    def _run_protocol(self, reason, compact=False, data=None,
+                      error_output=b''):
+        process_protocol = PdfToHtmlProtocol(
+            TEST_XML,
+            ConversionLimits(cpu_time=1, memory=2 ** 30),
+            compact,
+        )
+        process_protocol.errReceived(error_output)
+        if data is None:
+            with open(TEST_XML, 'rb') as f:
+                data = f.read()
+        # Feed the output by small chunks, like a process pipe would
+        for i in range(0, len(data), 100):
+            process_protocol.outReceived(data[i:i + 100])
+        process_protocol.processEnded(Failure(reason))
+        results = []
+        process_protocol.deferred.addBoth(results.append)
+        return results[0]
+
+    def test_protocol(self):
+        self.assertEqual(
+            self._run_protocol(ProcessDone(0)),
+            parse_pdf_xml(TEST_XML)
+        )
+        self.assertEqual(
+            self._run_protocol(ProcessDone(0), compact=True),
+            parse_pdf_xml(TEST_XML, compact=True)
+        )
+
+    def test_protocol_errors(self):
+        self.assertIsNone(self._run_protocol(ProcessTerminated(exitCode=1)))
+        failure = self._run_protocol(ProcessTerminated(signal=9))
+        self.assertIsInstance(failure.value, ConversionLimitExceeded)
+        self.assertEqual(failure.value.limit, 'cpu')
+
+        self.assertIsNone(self._run_protocol(ProcessTerminated(signal=6)))
+        failure = self._run_protocol(
+            ProcessTerminated(signal=6),
+            error_output=b'Syntax Error: foo\nOut of memory\n'
+        )
+        self.assertEqual(failure.value.limit, 'memory')
+
+
+class TestBackends(unittest.TestCase):
+
+    def test_get_backend(self):
+        self.assertIs(get_backend('pdftotext'), parse_pdf_document)
+        self.assertIs(get_backend(), parse_pdf_document)
+        with self.assertRaises(ValueError):
+            get_backend('unknown')
+
+    @unittest.skipIf(pdfminer_parse.extract_pages is None,
+                     'pdfminer.six is not installed')
+    def test_pdfminer(self):
+        parse = get_backend('pdfminer')
+        with open(TEST_PDF, 'rb') as f:
+            pdf_file = parse(f)
+            self.assertEqual(len(pdf_file.pages), 1)
+            self.assertEqual(
+                [line.text.strip() for line in pdf_file.pages[0].lines[:4]],
+                ['Test', 'Test', 'Test bold', 'References']
+            )
+            self.assertEqual(
+                parse(f, compact=True).to_pdf_file(),
+                pdf_file
+            )
+            self.assertEqual(len(parse(f, first_page=2).pages), 0)
+
+    def test_poppler_words(self):
+        Rectangle = namedtuple('Rectangle', ['x', 'y', 'width', 'height'])
+
+        class TextBox(object):
+
+            def __init__(self, text, top, height, has_space_after=True):
+                self.text = text
+                # In points, where the pdftohtml output is zoomed by 1.5
+                self.bbox = Rectangle(72, top / 1.5, 10, height / 1.5)
+                self.has_space_after = has_space_after
+
+        # The second page of the test pdf
+        words = poppler_parse._get_page_words([
+            TextBox('Appendix', 112, 29, False),
+            TextBox('Test', 147, 22),
+            TextBox('appendix', 147, 22, False),
+            TextBox('2', 1200, 17, False),
+        ])
+        self.assertEqual(words, [
+            (112, 29, 'Appendix'),
+            (147, 22, 'Test appendix'),
+            (1200, 17, '2'),
+        ])
+
+        # The lines are built like the ones of pdftohtml
+        builder = _PdfFileBuilder()
+        builder.add_words(words)
+        self.assertEqual(
+            [(line.size, line.bold, line.text, line.font_face)
+             for line in builder.get_pdf_file().pages[0].lines],
+            [(line.size, line.bold, line.text, line.font_face)
+             for line in parse_pdf_xml(TEST_XML).pages[1].lines]
+        )
+
+    @unittest.skipIf(poppler_parse.poppler is None,
+                     'python-poppler is not installed')
+    def test_poppler(self):
+        parse = get_backend('poppler')
+        with open(TEST_PDF, 'rb') as f:
+            pdf_file = parse(f)
+            self.assertEqual(len(pdf_file.pages), 1)
+            self.assertEqual(
+                [line.text.strip() for line in pdf_file.pages[0].lines[:4]],
+                ['Test', 'Test', 'Test bold', 'References']
+            )
+            self.assertEqual(
+                parse(f, compact=True).to_pdf_file(),
+                pdf_file
+            )
+
+    @unittest.skipIf(poppler_parse.poppler is None,
+                     'python-poppler is not installed')
+    def test_poppler_sections(self):
+        keywords = ['references', 'appendix']
+        with open(TEST_PDF, 'rb') as f:
+            self.assertEqual(
+                grab_sections(get_backend('poppler')(f), keywords),
+                grab_sections(parse_pdf_document(f), keywords)
+            )
@@ -1,8 +1,24 @@
 import unittest
-from pdf_parser.tools.extraction import _find_elements
-from pdf_parser.pdf_parse import parse_pdf_document
+import os
+import pickle
+import tempfile
+from unittest import mock
+from tools.utils import load_keyword_matcher
+from pdf_parser.tools.cache import PdfFileCache
+from pdf_parser.tools.corpus import (CorpusShard, CorpusShardWriter,
+                                     SHARD_DATA_EXTENSION)
+from pdf_parser.tools import corpus, precheck
+from pdf_parser.tools.precheck import (check_pdf, PdfRejected, CHUNK_SIZE,
+                                       _get_spread_pages)
+from pdf_parser.tools.extraction import (_find_elements, SectionAnalyzer,
+                                         KeywordMatcher)
+from pdf_parser.objects.PdfObjects import (PdfFile, PdfPage, PdfLine,
+                                           CompactPdfFile)
+from pdf_parser.pdf_parse import (parse_pdf_document, parse_pdf_xml,
+                                  grab_section, grab_sections)
 
 TEST_PDF = 'tests/pdfs/test_pdf.pdf'
+TEST_XML = 'tests/pdfs/test_pdf.xml'
 
 
 class TestTools(unittest.TestCase):
@@ -17,3 +33,339 @@ class TestTools(unittest.TestCase):
     def test_element_finder(self):
         elements = _find_elements(self.pdf_file_object, 'Reference')
         self.assertEqual(elements, [])
+
+
+class TestSectionAnalyzer(unittest.TestCase):
+
+    def setUp(self):
+        self.pdf_file = parse_pdf_xml(TEST_XML)
+        self.keywords = ['references', 'appendix', 'acknowledgement']
+        self.analyzer = SectionAnalyzer(self.keywords)
+
+    def test_find_elements(self):
+        elements = self.analyzer.find_elements(self.pdf_file)
+        self.assertEqual(set(elements.keys()), set(self.keywords))
+        self.assertEqual(len(elements['references']), 1)
+        start_title, end_title = elements['references'][0]
+        self.assertEqual(start_title.text, 'References')
+        self.assertEqual(end_title.text.strip(), 'Appendix')
+        self.assertEqual(elements['acknowledgement'], [])
+        for keyword in self.keywords:
+            self.assertEqual(
+                elements[keyword],
+                _find_elements(self.pdf_file, keyword)
+            )
+
+    def test_may_find_titles(self):
+        self.assertTrue(self.analyzer.may_find_titles(['Intro', 'Appendix']))
+        self.assertFalse(self.analyzer.may_find_titles(['Appendixes']))
+        self.assertFalse(SectionAnalyzer([]).may_find_titles(['Appendix']))
+
+    def test_grab_sections(self):
+        sections = grab_sections(self.pdf_file, self.analyzer)
+        self.assertTrue(sections['references'].startswith('References'))
+        self.assertEqual(sections['acknowledgement'], '')
+        for keyword in self.keywords:
+            self.assertEqual(
+                sections[keyword],
+                grab_section(self.pdf_file, keyword)
+            )
+
+    def test_grab_section_repeated_title(self):
+        # The title text also appears in the body, before the title
+        pages = [
+            PdfPage([
+                PdfLine(10, False, 'Intro', 0, 'A'),
+                PdfLine(10, False, 'References', 0, 'A'),
+                PdfLine(20, False, 'References', 0, 'A'),
+                PdfLine(10, False, 'A reference', 0, 'A'),
+            ], 0),
+            PdfPage([
+                PdfLine(10, False, 'Another reference', 1, 'A'),
+                PdfLine(20, False, 'Appendix', 1, 'A'),
+                PdfLine(10, False, 'Appendix text', 1, 'A'),
+            ], 1),
+        ]
+        pdf_file = PdfFile(pages)
+        expected = 'References\nA referenceAnother reference\n'
+        self.assertEqual(grab_section(pdf_file, 'references'), expected)
+        compact_file = CompactPdfFile.from_pdf_file(pdf_file)
+        self.assertEqual(grab_section(compact_file, 'references'), expected)
+
+
+class TestKeywordMatcher(unittest.TestCase):
+
+    def setUp(self):
+        self.matcher = KeywordMatcher(['test', 'machine learning'])
+        self.lines = [
+            'Testing the matcher',
+            'A test, another test',
+            'Machine learning',
+            'contest',
+            'End',
+        ]
+
+    def test_match_line(self):
+        self.assertEqual(self.matcher.match_line('Testing'), {})
+        self.assertEqual(self.matcher.match_line('test_case'), {})
+        self.assertEqual(self.matcher.match_line('test-case'), {'test': 1})
+        # All the occurrences count once one is on word boundaries
+        self.assertEqual(self.matcher.match_line('tests test'), {'test': 2})
+
+    def test_matches_any(self):
+        self.assertTrue(self.matcher.matches_any(self.lines))
+        self.assertFalse(self.matcher.matches_any(['contest', 'End']))
+        self.assertFalse(KeywordMatcher([]).matches_any(self.lines))
+
+    def test_find_lines(self):
+        keyword_lines = self.matcher.find_lines(iter(self.lines))
+        self.assertEqual(keyword_lines, {
+            'test': ['A test, another test', 'A test, another test'],
+            'machine learning': ['Machine learning'],
+        })
+
+    def test_find_lines_context(self):
+        keyword_lines = self.matcher.find_lines(iter(self.lines), 1)
+        self.assertEqual(keyword_lines['test'], self.lines[0:3] * 2)
+        self.assertEqual(keyword_lines['machine learning'], self.lines[1:4])
+
+    def test_pickle(self):
+        matcher = pickle.loads(pickle.dumps(self.matcher))
+        self.assertEqual(matcher.keywords, self.matcher.keywords)
+        self.assertEqual(
+            matcher.find_lines(self.lines, 2),
+            self.matcher.find_lines(self.lines, 2)
+        )
+
+    def test_save_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, 'matcher.automaton')
+            self.matcher.save(path)
+            matcher = KeywordMatcher.load(path)
+            self.assertEqual(matcher.keywords, self.matcher.keywords)
+            self.assertEqual(
+                matcher.find_lines(self.lines),
+                self.matcher.find_lines(self.lines)
+            )
+            # A saved matcher is pickled as its path
+            self.assertEqual(
+                pickle.loads(pickle.dumps(matcher)).keywords,
+                self.matcher.keywords
+            )
+
+    def test_load_keyword_matcher(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            keywords_path = os.path.join(tmp_dir, 'keywords.txt')
+            with open(keywords_path, 'w') as f:
+                f.write('# Comment\nTest\nmachine learning\n')
+            matcher = load_keyword_matcher(keywords_path)
+            self.assertEqual(matcher.keywords, self.matcher.keywords)
+            self.assertEqual(len(os.listdir(tmp_dir)), 2)
+            self.assertEqual(
+                load_keyword_matcher(keywords_path).path,
+                matcher.path
+            )
+
+            with open(keywords_path, 'a') as f:
+                f.write('data\n')
+            matcher = load_keyword_matcher(keywords_path)
+            self.assertEqual(matcher.keywords[-1], 'data')
+            # The matcher of the previous version of the file is removed
+            self.assertEqual(len(os.listdir(tmp_dir)), 2)
+
+    def test_no_keywords(self):
+        self.assertEqual(KeywordMatcher([]).find_lines(self.lines), {})
+
+
+class TestPdfFileCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pdf_file = parse_pdf_xml(TEST_XML, compact=True)
+        self.file_size = len(self.pdf_file.to_bytes())
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_get_put(self):
+        cache = PdfFileCache(self.tmp_dir.name)
+        self.assertIsNone(cache.get('hash'))
+        cache.put('hash', self.pdf_file)
+        self.assertEqual(
+            cache.get('hash').to_pdf_file(),
+            self.pdf_file.to_pdf_file()
+        )
+
+    def test_eviction(self):
+        cache = PdfFileCache(self.tmp_dir.name, int(2.5 * self.file_size))
+        cache.put('hash_1', self.pdf_file)
+        cache.put('hash_2', self.pdf_file)
+        os.utime(cache._get_path('hash_1'), (0, 0))
+        os.utime(cache._get_path('hash_2'), (1, 1))
+        # Using the first file makes the second one the least recently used
+        self.assertIsNotNone(cache.get('hash_1'))
+        cache.put('hash_3', self.pdf_file)
+        self.assertIsNotNone(cache.get('hash_1'))
+        self.assertIsNone(cache.get('hash_2'))
+        self.assertIsNotNone(cache.get('hash_3'))
+
+    def test_eviction_scans(self):
+        cache = PdfFileCache(self.tmp_dir.name, int(10.5 * self.file_size))
+        with mock.patch('os.scandir', wraps=os.scandir) as scandir:
+            for index in range(12):
+                cache.put('hash_{}'.format(index), self.pdf_file)
+            # Only listed by the first put, and once over the maximum size,
+            # where 2 files were removed
+            self.assertEqual(scandir.call_count, 2)
+        self.assertEqual(len(os.listdir(self.tmp_dir.name)), 10)
+
+
+class TestCorpusShard(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, 'corpus')
+        self.pdf_file = parse_pdf_xml(TEST_XML)
+        self.hashes = ['{:032x}'.format(i) for i in range(3)]
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_write_read(self):
+        with CorpusShardWriter(self.path) as writer:
+            for file_hash in self.hashes:
+                self.assertTrue(writer.add(file_hash, self.pdf_file))
+            self.assertFalse(writer.add(self.hashes[0], self.pdf_file))
+        # Append to an existing shard
+        with CorpusShardWriter(self.path) as writer:
+            self.assertEqual(len(writer), 3)
+            self.assertIn(self.hashes[1], writer)
+            writer.add('f' * 32, CompactPdfFile())
+
+        shard = CorpusShard(self.path)
+        self.assertEqual(len(shard), 4)
+        self.assertEqual(list(shard.hashes()), self.hashes + ['f' * 32])
+        self.assertEqual(
+            shard.get(self.hashes[2]).to_pdf_file(),
+            self.pdf_file
+        )
+        self.assertEqual(shard.get('f' * 32).to_pdf_file(), PdfFile())
+        self.assertIsNone(shard.get('e' * 32))
+        self.assertNotIn('e' * 32, shard)
+        for file_hash, pdf_file in shard:
+            self.assertIn(file_hash, shard)
+            self.assertEqual(
+                pdf_file.get_text(),
+                shard.get(file_hash).get_text()
+            )
+
+    def test_interrupted_writer(self):
+        with CorpusShardWriter(self.path) as writer:
+            writer.add(self.hashes[0], self.pdf_file)
+        data_size = os.path.getsize(self.path + SHARD_DATA_EXTENSION)
+        # A document written without its index entry
+        with open(self.path + SHARD_DATA_EXTENSION, 'ab') as f:
+            f.write(b'\0' * 100)
+        self.assertEqual(len(CorpusShard(self.path)), 1)
+        with CorpusShardWriter(self.path) as writer:
+            self.assertEqual(
+                os.path.getsize(self.path + SHARD_DATA_EXTENSION),
+                data_size
+            )
+            writer.add(self.hashes[1], self.pdf_file)
+        self.assertEqual(
+            CorpusShard(self.path).get(self.hashes[1]).to_pdf_file(),
+            self.pdf_file
+        )
+
+    def test_concurrent_writer(self):
+        with CorpusShardWriter(self.path) as writer:
+            writer.add(self.hashes[0], self.pdf_file)
+            map_file = corpus._map_file
+
+            # A document added between the mappings of the two files
+            def _map_file(f):
+                mapped = map_file(f)
+                if len(writer) == 1:
+                    writer.add(self.hashes[1], self.pdf_file)
+                return mapped
+
+            with mock.patch.object(corpus, '_map_file', _map_file):
+                shard = CorpusShard(self.path)
+        self.assertEqual(len(shard), 1)
+        self.assertEqual(
+            shard.get(self.hashes[0]).to_pdf_file(),
+            self.pdf_file
+        )
+        self.assertEqual(len(CorpusShard(self.path)), 2)
+
+    def test_invalid_shard(self):
+        with open(self.path + SHARD_DATA_EXTENSION, 'wb') as f:
+            f.write(b'not a shard')
+        with self.assertRaises(ValueError):
+            CorpusShardWriter(self.path)
+        with self.assertRaises(ValueError):
+            CorpusShard(self.path)
+
+
+class TestCheckPdf(unittest.TestCase):
+
+    def _check_bytes(self, content):
+        with tempfile.NamedTemporaryFile(suffix='.pdf') as f:
+            f.write(content)
+            f.flush()
+            f.seek(0)
+            return check_pdf(f)
+
+    def test_valid_pdf(self):
+        with open(TEST_PDF, 'rb') as f:
+            self.assertIsNone(check_pdf(f))
+
+    def test_corrupt(self):
+        self.assertEqual(self._check_bytes(b'<html></html>'), 'corrupt')
+        self.assertEqual(self._check_bytes(b''), 'corrupt')
+
+    def test_image_only(self):
+        content = b''.join([
+            b'%PDF-1.4\n',
+            b'1 0 obj << /Type /XObject /Subtype /Image >> endobj\n',
+            b' ' * CHUNK_SIZE,
+            b'trailer << /Root 1 0 R >>\n%%EOF\n',
+        ])
+        self.assertEqual(self._check_bytes(content), 'image_only')
+
+    def test_spread_pages(self):
+        self.assertEqual(_get_spread_pages(4, 100, 3), [4, 52, 100])
+        self.assertEqual(_get_spread_pages(4, 5, 3), [4, 5])
+        self.assertEqual(_get_spread_pages(4, 3, 3), [])
+
+    def test_image_cover(self):
+        # Fonts hidden in object streams, and a cover image followed by
+        # blank pages
+        content = b'%PDF-1.5\n<< /Type /ObjStm >>\n%%EOF\n'
+        texts = {(None, 3): '\f\f\f', (4, 4): '\f', (52, 52): 'Foo\f'}
+
+        def extract_pdf_text(document, limits=None, first_page=None,
+                             last_page=None):
+            return texts.get((first_page, last_page), '\f')
+
+        with mock.patch.object(precheck, 'extract_pdf_text',
+                               extract_pdf_text), \
+                mock.patch.object(precheck, 'get_page_count',
+                                  return_value=100):
+            self.assertIsNone(self._check_bytes(content))
+            del texts[52, 52]
+            self.assertEqual(self._check_bytes(content), 'image_only')
+
+    def test_marker_between_chunks(self):
+        content = b''.join([
+            b'%PDF-1.4\n',
+            b' ' * (1024 + CHUNK_SIZE - 20),
+            b'<< /Type /Font >>',
+            b'\n%%EOF\n',
+        ])
+        self.assertIsNone(self._check_bytes(content))
+
+    def test_rejected_pickle(self):
+        error = pickle.loads(pickle.dumps(PdfRejected('foo.pdf', 'corrupt')))
+        self.assertEqual(error.reason, 'corrupt')
@@ -0,0 +1,252 @@
+import os
+import errno
+import logging
+import unittest
+import tempfile
+from collections import namedtuple
+from unittest import mock
+from twisted.internet import defer
+from twisted.python.failure import Failure
+from scrapy.exceptions import DropItem
+from pdf_parser.pdf_parse import parse_pdf_xml
+from pdf_parser.tools.cache import PdfFileCache
+from pdf_parser.tools.corpus import CorpusShard
+from pdf_parser.tools.precheck import PdfRejected
+from pdf_parser.tools.extraction import SectionAnalyzer, KeywordMatcher
+from wsf_scraping import pipelines
+from wsf_scraping.items import Article
+from wsf_scraping.pipelines import (analyse_pdf, analyse_pdf_data,
+                                    analyse_pdf_before_conversion,
+                                    WsfScrapingPipeline)
+
+TEST_PDF = 'tests/pdfs/test_pdf.pdf'
+TEST_XML = 'tests/pdfs/test_pdf.xml'
+
+
+class _RecordingBackend(object):
+    """A parsing backend converting the test xml file, recording the page
+    ranges it is asked to convert.
+    """
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, document, limits=None, first_page=None,
+                 last_page=None, compact=False):
+        self.calls.append((first_page, last_page))
+        return parse_pdf_xml(TEST_XML, compact)
+
+
+class TestAnalysePdf(unittest.TestCase):
+
+    def setUp(self):
+        self.section_analyzer = SectionAnalyzer(['references'])
+        self.backend = _RecordingBackend()
+
+    def _analyse(self, keywords, **kwargs):
+        return analyse_pdf(
+            TEST_PDF,
+            self.section_analyzer,
+            KeywordMatcher(keywords),
+            0,
+            backend=self.backend,
+            **kwargs
+        )
+
+    def test_analyse(self):
+        sections, keyword_dict, source = self._analyse(['test'])
+        self.assertIn('References', sections)
+        self.assertIn('test', keyword_dict)
+        self.assertEqual(source, 'conversion')
+        self.assertEqual(self.backend.calls, [(None, None)])
+
+    def test_tail_pages_with_keywords(self):
+        # The keywords need the whole document: it is converted once
+        sections, keyword_dict, _ = self._analyse(
+            ['test'],
+            sections_tail_pages=1
+        )
+        self.assertEqual(self.backend.calls, [(None, None)])
+        self.assertIn('References', sections)
+        self.assertIn('test', keyword_dict)
+
+    def test_analyse_converted_data(self):
+        # The steps of the pdfs converted in the reactor thread
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pdf_cache = PdfFileCache(tmp_dir)
+            self.assertIsNone(analyse_pdf_before_conversion(
+                TEST_PDF,
+                self.section_analyzer,
+                KeywordMatcher(['test']),
+                0,
+                pdf_cache=pdf_cache,
+                file_hash='0' * 32,
+            ))
+
+            sections, keyword_dict, source = analyse_pdf_data(
+                parse_pdf_xml(TEST_XML, compact=True).to_bytes(),
+                self.section_analyzer,
+                KeywordMatcher(['test']),
+                0,
+                pdf_cache,
+                '0' * 32,
+            )
+            self.assertEqual(source, 'conversion')
+            self.assertEqual(
+                (sections, keyword_dict),
+                self._analyse(['test'])[:2]
+            )
+
+            # The converted file was cached
+            result = analyse_pdf_before_conversion(
+                TEST_PDF,
+                self.section_analyzer,
+                KeywordMatcher(['test']),
+                0,
+                pdf_cache=pdf_cache,
+                file_hash='0' * 32,
+            )
+            self.assertEqual(result, (sections, keyword_dict, 'cache'))
+
+    def test_corpus(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            self._analyse(['test'], file_hash='0' * 32, corpus_dir=tmp_dir)
+            self._analyse(['test'], file_hash='0' * 32, corpus_dir=tmp_dir)
+            self._analyse(['test'], file_hash='1' * 32, corpus_dir=tmp_dir)
+            pipelines._corpus_writers.pop(tmp_dir).close()
+            shard = CorpusShard(
+                os.path.join(tmp_dir, 'corpus-{}'.format(os.getpid()))
+            )
+            self.assertEqual(list(shard.hashes()), ['0' * 32, '1' * 32])
+            self.assertEqual(
+                shard.get('0' * 32).to_pdf_file(),
+                parse_pdf_xml(TEST_XML)
+            )
+
+
+_ScrapingInfo = namedtuple('_ScrapingInfo', ['id', 'scrape_again'])
+
+
+class _FakeDatabase(object):
+
+    def __init__(self):
+        self.validators = {}
+        self.publications = []
+
+    def set_download_validators(self, url, validators):
+        self.validators[url] = validators
+
+    def get_scraping_info(self, file_hash):
+        for publication in self.publications:
+            if publication['hash'] == file_hash:
+                return _ScrapingInfo(len(self.publications), False)
+        return None
+
+    def get_or_create_name(self, name, table):
+        return 1
+
+    def insert_full_publication(self, item, id_provider):
+        self.publications.append(item)
+        return len(self.publications)
+
+    def insert_joints_and_text(self, table, values, id_publication):
+        pass
+
+    def insert_joints(self, table, values, id_publication):
+        pass
+
+
+class _FakeSpider(object):
+    name = 'foo'
+
+
+class TestPipeline(unittest.TestCase):
+
+    def _pipeline(self):
+        pipeline = WsfScrapingPipeline.__new__(WsfScrapingPipeline)
+        pipeline.database = _FakeDatabase()
+        pipeline.pending_hashes = {}
+        return pipeline
+
+    def test_same_hash_items(self):
+        pipeline = self._pipeline()
+        analyses = []
+
+        def check_keywords(item, spider_name, pdf_path):
+            analyses.append(defer.Deferred())
+            return analyses[-1]
+
+        pipeline.check_keywords = check_keywords
+        results = {}
+        pdf_paths = []
+        for uri in ['http://foo.bar', 'http://bar.foo']:
+            with tempfile.NamedTemporaryFile(delete=False) as tf:
+                tf.write(b'%PDF-')
+            pdf_paths.append(tf.name)
+            d = pipeline.process_item(
+                Article(uri=uri, pdf=tf.name, hash='0' * 32),
+                _FakeSpider()
+            )
+            d.addBoth(lambda result, uri=uri: results.update({uri: result}))
+        # The second item waits for the first one
+        self.assertEqual(len(analyses), 1)
+        analyses[0].callback(Article(
+            uri='http://foo.bar',
+            hash='0' * 32,
+            text='foo'
+        ))
+        self.assertEqual(len(pipeline.database.publications), 1)
+        self.assertEqual(results['http://foo.bar']['uri'], 'http://foo.bar')
+        # Then is found in the database
+        results['http://bar.foo'].trap(DropItem)
+        self.assertFalse(os.path.exists(pdf_paths[1]))
+        os.unlink(pdf_paths[0])
+        self.assertEqual(pipeline.pending_hashes, {})
+
+    def test_store_download_validators(self):
+        pipeline = self._pipeline()
+        validators = {
+            'etag': '"foo"',
+            'last_modified': None,
+            'content_length': 1024,
+        }
+        item = pipeline._store_download_validators(Article(
+            uri='http://foo.bar',
+            download_validators=validators,
+        ))
+        self.assertNotIn('download_validators', item)
+        self.assertEqual(
+            pipeline.database.validators,
+            {'http://foo.bar': validators}
+        )
+
+    def _rejected(self, quarantine_dir):
+        pipeline = WsfScrapingPipeline.__new__(WsfScrapingPipeline)
+        pipeline.settings = {'PDF_QUARANTINE_DIR': quarantine_dir}
+        pipeline.logger = logging.getLogger(__name__)
+        with tempfile.NamedTemporaryFile(delete=False) as tf:
+            tf.write(b'%PDF-')
+        try:
+            raise PdfRejected('foo.pdf', 'encrypted')
+        except PdfRejected:
+            failure = Failure()
+        item = Article(pdf=tf.name)
+        self.assertIs(pipeline._remove_pdf_on_error(failure, item), failure)
+        self.assertFalse(os.path.exists(tf.name))
+        return tf.name
+
+    def test_quarantine(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            pdf_path = self._rejected(tmp_dir)
+            self.assertTrue(os.path.exists(os.path.join(
+                tmp_dir, 'encrypted', os.path.basename(pdf_path)
+            )))
+        self._rejected('')
+
+    def test_quarantine_error(self):
+        # e.g. the cross-device links: the pdf is deleted instead
+        error = OSError(errno.EXDEV, 'Invalid cross-device link')
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with mock.patch.object(pipelines.shutil, 'move',
+                                   side_effect=error):
+                self._rejected(tmp_dir)
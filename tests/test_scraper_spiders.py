@@ -1,3 +1,5 @@
+import os
+import hashlib
 import unittest
 from scrapy.http import Response, Request
 from wsf_scraping.spiders.base_spider import BaseSpider
@@ -47,6 +49,16 @@ class TestSpiders(unittest.TestCase):
         self.assertTrue(res)
         self.assertTrue('foo' == res['title'])
 
+    def test_save_pdf_hash(self):
+        """Tests that the hash of the item is the md5 hash of the saved file.
+        """
+        res = BaseSpider().save_pdf(self.pdf_response)
+        with open(res['pdf'], 'rb') as f:
+            content = f.read()
+        os.unlink(res['pdf'])
+        self.assertEqual(content, self.pdf_response.body)
+        self.assertEqual(res['hash'], hashlib.md5(content).hexdigest())
+
     def test_who_spider(self):
         """Tests if, given a pdf-like response containing a data_dict metadata,
         the save_pdf method does:
@@ -83,6 +83,66 @@ class DatabaseConnector:
         result = self.cursor.fetchone()
         return result
 
+    def get_download_validators(self):
+        """Return the validators (ETag, Last-Modified and Content-Length) of
+        the last download of each publication url, as a dictionary of
+        dictionaries indexed by url. The publications to scrape again are
+        left out, so that they are downloaded again.
+        """
+        self._execute(
+            """
+            SELECT download.url, etag, last_modified, content_length
+            FROM download
+            JOIN publication ON publication.url = download.url
+            GROUP BY download.url
+            HAVING NOT bool_or(COALESCE(scrape_again, FALSE));
+            """
+        )
+        return {
+            row.url: {
+                'etag': row.etag,
+                'last_modified': row.last_modified,
+                'content_length': row.content_length,
+            }
+            for row in self.cursor.fetchall()
+        }
+
+    def set_download_validators(self, url, validators):
+        """Store the validators of the last download of an url, as returned
+        by get_download_validators.
+        """
+        self._execute(
+            """
+            INSERT INTO download(url, etag, last_modified, content_length,
+                                 datetime_creation)
+            VALUES(%s, %s, %s, %s, %s)
+            ON CONFLICT (url) DO UPDATE
+            SET
+                etag = EXCLUDED.etag,
+                last_modified = EXCLUDED.last_modified,
+                content_length = EXCLUDED.content_length,
+                datetime_update = CURRENT_TIMESTAMP;
+            """,
+            (url, validators.get('etag'), validators.get('last_modified'),
+             validators.get('content_length'), datetime.now(),)
+        )
+
+    def get_scraped_urls(self):
+        """Return the set of the urls of the publications already scraped.
+        The publications to scrape again are left out, so that they are
+        requested again.
+        """
+        self._execute(
+            """
+            SELECT url
+            FROM publication
+            WHERE url IS NOT NULL
+            GROUP BY url
+            HAVING NOT bool_or(COALESCE(scrape_again, FALSE));
+            """
+        )
+        return {row.url for row in self.cursor.fetchall()}
+
     def get_publications(self, offset=0, limit=-1):
         """Return a list of publications. By default, returns every
         publications. This method accepts start and end arguments to
@@ -1,7 +1,11 @@
 # # -*- coding: utf-8 -*-
 
+import os
+import glob
+import pickle
 import hashlib
 import logging
+from pdf_parser.tools.extraction import KeywordMatcher
 
 
 def parse_keywords_files(file_path):
@@ -36,3 +40,43 @@ def get_file_hash(file_path):
                 break
             hasher.update(buf)
     return hasher.hexdigest()
+
+
+def load_keyword_matcher(file_path):
+    """Return a KeywordMatcher for the keywords of a keyword file.
+
+    The matcher is saved next to the keyword file, in a file named after the
+    hash of its content, and loaded from there as long as the keyword file
+    doesn't change, which is faster than building it again.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        file_hash = get_file_hash(file_path)
+    except IOError:
+        return KeywordMatcher(parse_keywords_files(file_path))
+
+    matcher_path = '{}.{}.automaton'.format(file_path, file_hash)
+    try:
+        matcher = KeywordMatcher.load(matcher_path)
+        logger.debug("Loaded keyword matcher from %s", matcher_path)
+        return matcher
+    except FileNotFoundError:
+        pass
+    except (IOError, EOFError, ValueError, pickle.UnpicklingError):
+        logger.warning("Unable to load keyword matcher at %s", matcher_path)
+
+    matcher = KeywordMatcher(parse_keywords_files(file_path))
+    try:
+        # Write to a temporary file first, so that another process never
+        # loads a partial file
+        temp_path = '{}.{}'.format(matcher_path, os.getpid())
+        matcher.save(temp_path)
+        os.replace(temp_path, matcher_path)
+        matcher.path = matcher_path
+        # Remove the matchers saved for previous versions of the file
+        for path in glob.glob('{}.*.automaton'.format(file_path)):
+            if path != matcher_path:
+                os.remove(path)
+    except IOError:
+        logger.warning("Unable to save keyword matcher at %s", matcher_path)
+    return matcher
@@ -0,0 +1,472 @@
+import os
+import attr
+import hashlib
+import logging
+import tempfile
+import weakref
+from twisted.internet import defer, protocol
+from twisted.python.failure import Failure
+from twisted.web.client import ResponseDone, ResponseFailed
+from twisted.web.http import _DataLoss, PotentialDataLoss
+from twisted.web.iweb import UNKNOWN_LENGTH
+from scrapy.http import Headers, Response
+from scrapy.exceptions import IgnoreRequest
+from scrapy.core.downloader.handlers.http11 import (HTTP11DownloadHandler,
+                                                    ScrapyAgent)
+
+logger = logging.getLogger(__name__)
+
+SPOOLED_CONTENT_TYPE = b'application/pdf'
+# The content types a pdf can be served with: the binary ones are told apart
+# from the pdfs by their first bytes
+PDF_CONTENT_TYPES = {
+    b'application/pdf',
+    b'application/x-pdf',
+    b'application/octet-stream',
+    b'binary/octet-stream',
+}
+PDF_MAGIC = b'%PDF-'
+# The pdf header is expected in the first bytes of the file
+PDF_MAGIC_WINDOW = 1024
+
+
+class NotPdfResponse(IgnoreRequest):
+    """Raised when the download of a pdf is cancelled because the response
+    isn't one. The `reason` attribute is either 'content_type',
+    'content_length' or 'magic'.
+    """
+
+    def __init__(self, url, reason):
+        super().__init__(url, reason)
+        self.url = url
+        self.reason = reason
+
+    def __str__(self):
+        return 'Not a pdf ({}): {}'.format(self.reason, self.url)
+
+
+class NotModified(IgnoreRequest):
+    """Raised when a pdf is not downloaded again because it didn't change
+    since the last crawl: either the server answered a conditional request
+    with 304 Not Modified, or the headers of its response are the same as
+    the last time.
+    """
+
+    def __init__(self, url):
+        super().__init__(url)
+        self.url = url
+
+    def __str__(self):
+        return 'Not modified: {}'.format(self.url)
+
+
+def expects_pdf(request, spider):
+    """Return whether a request is expected to be answered with a pdf: the
+    value of its `expect_pdf` meta key if set, or else if its callback is
+    the spider's `save_pdf` method.
+    """
+    if 'expect_pdf' in request.meta:
+        return request.meta['expect_pdf']
+    save_pdf = getattr(spider, 'save_pdf', None)
+    return save_pdf is not None and request.callback == save_pdf
+
+
+def is_pdf_response(response):
+    """Return whether a scrapy response is a pdf: either typed as one, or
+    served with one of the binary PDF_CONTENT_TYPES (or none) and starting
+    with the pdf header, like the responses SpoolingDownloadHandler lets
+    through when it checks the pdf downloads.
+    """
+    content_type = response.headers.get(b'content-type', b'')
+    content_type = content_type.split(b';')[0].strip().lower()
+    if content_type == b'application/pdf':
+        return True
+    if content_type and content_type not in PDF_CONTENT_TYPES:
+        return False
+
+    spool_file = getattr(response, 'spool_file', None)
+    if spool_file is not None:
+        with open(spool_file.path, 'rb') as f:
+            head = f.read(PDF_MAGIC_WINDOW)
+    else:
+        head = response.body[:PDF_MAGIC_WINDOW]
+    return PDF_MAGIC in head
+
+
+def get_download_validators(headers, content_length=None):
+    """Return the validators of a response, to be compared with the ones of
+    a later response to tell if it changed: a dictionary of its ETag and
+    Last-Modified headers (as strings, or None) and of its (int)
+    content_length (None if unknown).
+    """
+    validators = {'content_length': content_length}
+    for key, header in [('etag', b'etag'),
+                        ('last_modified', b'last-modified')]:
+        value = headers.get(header)
+        validators[key] = value.decode('latin-1') if value else None
+    return validators
+
+
+def is_unchanged(validators, last_validators):
+    """Return whether the response of validators is the same as the one of
+    last_validators: same ETag if both have one, or else same Last-Modified
+    and Content-Length.
+    """
+    if validators['etag'] and last_validators.get('etag'):
+        return validators['etag'] == last_validators['etag']
+    return (validators['last_modified'] is not None
+            and validators['content_length'] is not None
+            and validators['last_modified']
+            == last_validators.get('last_modified')
+            and validators['content_length']
+            == last_validators.get('content_length'))
+
+
+def _get_content_type(txresponse):
+    content_type = txresponse.headers.getRawHeaders(
+        b'content-type', [b'']
+    )[0]
+    return content_type.split(b';')[0].strip().lower()
+
+
+def _remove_file(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+@attr.s
+class SpoolFile(object):
+    """A response body spooled to a file, defined by the following
+    attributes:
+        - (str)path     : The path of the file.
+        - (str)hash     : The md5 hash of the body.
+        - (int)size     : The size of the body, in bytes.
+
+    The file is removed once the SpoolFile is garbage collected, unless it
+    was claimed by its new owner beforehand.
+    """
+    path = attr.ib()
+    hash = attr.ib()
+    size = attr.ib()
+
+    def __attrs_post_init__(self):
+        self._finalizer = weakref.finalize(self, _remove_file, self.path)
+
+    def claim(self):
+        """Take the ownership of the file, which is then left on disk, and
+        return its path.
+        """
+        self._finalizer.detach()
+        return self.path
+
+
+class SpooledResponse(Response):
+    """A Response whose body was written to a SpoolFile while downloaded
+    instead of being kept in memory: its `body` is empty, and its
+    `spool_file` attribute holds the SpoolFile.
+    """
+
+    def __init__(self, *args, **kwargs):
+        self.spool_file = kwargs.pop('spool_file', None)
+        super().__init__(*args, **kwargs)
+
+    def replace(self, *args, **kwargs):
+        kwargs.setdefault('spool_file', self.spool_file)
+        return super().replace(*args, **kwargs)
+
+
+class _SpoolingResponseReader(protocol.Protocol):
+    """Write a response body to a file and hash it as it is received, like
+    scrapy's _ResponseReader buffers it in memory. Fire `finished` with a
+    (txresponse, SpoolFile, flags) tuple once the body is complete.
+
+    If check_magic is True, the download is aborted, failing with
+    NotPdfResponse, as soon as the first bytes received show that the body
+    isn't a pdf.
+    """
+
+    def __init__(self, finished, txresponse, request, maxsize, warnsize,
+                 fail_on_dataloss, spool_dir=None, check_magic=False):
+        self._finished = finished
+        self._txresponse = txresponse
+        self._request = request
+        self._maxsize = maxsize
+        self._warnsize = warnsize
+        self._fail_on_dataloss = fail_on_dataloss
+        self._reached_warnsize = False
+        self._bytes_received = 0
+        self._hasher = hashlib.md5()
+        self._file = tempfile.NamedTemporaryFile(delete=False, dir=spool_dir)
+        self._check_magic = check_magic
+        self._head = b''
+
+    def dataReceived(self, bodyBytes):
+        # Data can still be received after the download was cancelled
+        if self._finished.called:
+            return
+
+        self._file.write(bodyBytes)
+        self._hasher.update(bodyBytes)
+        self._bytes_received += len(bodyBytes)
+
+        if self._check_magic:
+            self._head += bodyBytes[:PDF_MAGIC_WINDOW]
+            if PDF_MAGIC in self._head:
+                self._check_magic = False
+                self._head = b''
+            elif len(self._head) >= PDF_MAGIC_WINDOW:
+                self._reject()
+                return
+
+        if self._maxsize and self._bytes_received > self._maxsize:
+            logger.error(
+                'Received (%s) bytes larger than download max size (%s)'
+                ' in request %s.',
+                self._bytes_received,
+                self._maxsize,
+                self._request,
+            )
+            self._finished.cancel()
+
+        if (self._warnsize and self._bytes_received > self._warnsize
+                and not self._reached_warnsize):
+            self._reached_warnsize = True
+            logger.warning(
+                'Received more bytes than download warn size (%s) in'
+                ' request %s.',
+                self._warnsize,
+                self._request,
+            )
+
+    def _reject(self):
+        """Fail the download with NotPdfResponse, and abort it."""
+        logger.info(
+            'Cancelling download of %s after %s bytes: not a pdf',
+            self._request.url,
+            self._bytes_received,
+        )
+        self._finished.errback(
+            Failure(NotPdfResponse(self._request.url, 'magic'))
+        )
+        self._txresponse._transport._producer.abortConnection()
+
+    def connectionLost(self, reason):
+        self._file.close()
+        if self._finished.called:
+            _remove_file(self._file.name)
+            return
+
+        flags = None
+        if reason.check(ResponseDone):
+            pass
+        elif reason.check(PotentialDataLoss):
+            flags = ['partial']
+        elif (reason.check(ResponseFailed)
+                and any(r.check(_DataLoss) for r in reason.value.reasons)
+                and not self._fail_on_dataloss):
+            flags = ['dataloss']
+        else:
+            _remove_file(self._file.name)
+            self._finished.errback(reason)
+            return
+
+        # The whole body was shorter than the magic bytes window
+        if self._check_magic:
+            _remove_file(self._file.name)
+            self._finished.errback(
+                Failure(NotPdfResponse(self._request.url, 'magic'))
+            )
+            return
+
+        spool_file = SpoolFile(
+            self._file.name,
+            self._hasher.hexdigest(),
+            self._bytes_received,
+        )
+        self._finished.callback((self._txresponse, spool_file, flags))
+
+
+class _SpoolingAgent(ScrapyAgent):
+    """A ScrapyAgent spooling the bodies of the successful pdf responses to
+    files, and returning them as SpooledResponses.
+
+    If check_pdf is True, the request expects a pdf: its download is
+    cancelled, failing with NotPdfResponse, as soon as its headers or first
+    bytes show that the response isn't one.
+
+    If the request has `download_validators` in its meta, the validators of
+    the last download of its url (see get_download_validators), its
+    download is cancelled, failing with NotModified, if the headers of the
+    response are the same.
+    """
+
+    def __init__(self, spool_dir=None, check_pdf=False, **kwargs):
+        super().__init__(**kwargs)
+        self._spool_dir = spool_dir
+        self._check_pdf = check_pdf
+
+    def _should_spool(self, txresponse):
+        if txresponse.code != 200 or txresponse.length == 0:
+            return False
+        # The compressed bodies are decompressed by a middleware, in memory
+        if txresponse.headers.hasHeader(b'content-encoding'):
+            return False
+        return (self._check_pdf
+                or _get_content_type(txresponse) == SPOOLED_CONTENT_TYPE)
+
+    def _get_rejection_reason(self, txresponse):
+        """Return why a response expected to be a pdf can't be one, from its
+        headers, or None.
+        """
+        if not self._check_pdf or txresponse.code != 200:
+            return None
+        content_type = _get_content_type(txresponse)
+        if content_type and content_type not in PDF_CONTENT_TYPES:
+            return 'content_type'
+        if (txresponse.length != UNKNOWN_LENGTH
+                and txresponse.length < len(PDF_MAGIC)):
+            return 'content_length'
+        return None
+
+    @staticmethod
+    def _is_unchanged(txresponse, request):
+        last_validators = request.meta.get('download_validators')
+        if not last_validators or txresponse.code != 200:
+            return False
+        content_length = None
+        if txresponse.length != UNKNOWN_LENGTH:
+            content_length = txresponse.length
+        validators = get_download_validators(
+            Headers(txresponse.headers.getAllRawHeaders()),
+            content_length,
+        )
+        return is_unchanged(validators, last_validators)
+
+    def _cb_bodyready(self, txresponse, request):
+        if self._is_unchanged(txresponse, request):
+            logger.info(
+                'Cancelling download of %s: unchanged since the last crawl',
+                request.url,
+            )
+            txresponse._transport._producer.loseConnection()
+            raise NotModified(request.url)
+
+        reason = self._get_rejection_reason(txresponse)
+        if reason:
+            expected_size = txresponse.length
+            if expected_size == UNKNOWN_LENGTH:
+                expected_size = 'unknown'
+            logger.info(
+                'Cancelling download of %s (%s bytes): not a pdf (%s)',
+                request.url,
+                expected_size,
+                reason,
+            )
+            txresponse._transport._producer.loseConnection()
+            raise NotPdfResponse(request.url, reason)
+
+        if not self._should_spool(txresponse):
+            return super()._cb_bodyready(txresponse, request)
+
+        maxsize = request.meta.get('download_maxsize', self._maxsize)
+        warnsize = request.meta.get('download_warnsize', self._warnsize)
+        expected_size = -1
+        if txresponse.length != UNKNOWN_LENGTH:
+            expected_size = txresponse.length
+        fail_on_dataloss = request.meta.get(
+            'download_fail_on_dataloss',
+            self._fail_on_dataloss
+        )
+
+        if maxsize and expected_size > maxsize:
+            error_msg = (
+                'Cancelling download of {}: expected response size ({})'
+                ' larger than download max size ({}).'
+            ).format(request.url, expected_size, maxsize)
+            logger.error(error_msg)
+            txresponse._transport._producer.loseConnection()
+            raise defer.CancelledError(error_msg)
+
+        if warnsize and expected_size > warnsize:
+            logger.warning(
+                'Expected response size (%s) larger than download warn size'
+                ' (%s) in request %s.',
+                expected_size,
+                warnsize,
+                request,
+            )
+
+        def _cancel(_):
+            txresponse._transport._producer.abortConnection()
+
+        d = defer.Deferred(_cancel)
+        txresponse.deliverBody(_SpoolingResponseReader(
+            d,
+            txresponse,
+            request,
+            maxsize,
+            warnsize,
+            fail_on_dataloss,
+            self._spool_dir,
+            self._check_pdf,
+        ))
+
+        # Used by ScrapyAgent on timeouts
+        self._txresponse = txresponse
+
+        return d
+
+    def _cb_bodydone(self, result, request, url):
+        txresponse, body, flags = result
+        if not isinstance(body, SpoolFile):
+            return super()._cb_bodydone(result, request, url)
+        return SpooledResponse(
+            url=url,
+            status=int(txresponse.code),
+            headers=Headers(txresponse.headers.getAllRawHeaders()),
+            flags=flags,
+            spool_file=body,
+        )
+
+
+class SpoolingDownloadHandler(HTTP11DownloadHandler):
+    """A download handler writing the pdf responses to files while they are
+    downloaded, hashing them at the same time, instead of holding them in
+    memory. The memory used by a download is then bounded by the size of
+    the received chunks.
+
+    The pdf responses are returned as SpooledResponses, whose files are
+    written in the PDF_SPOOL_DIR setting folder (or the system's temporary
+    folder). The other responses are downloaded like HTTP11DownloadHandler
+    does.
+
+    If the PDF_CHECK_DOWNLOADS setting is True, the requests expecting a
+    pdf (the ones with an `expect_pdf` meta key, or else a spider's
+    `save_pdf` callback) are cancelled as soon as their Content-Type,
+    Content-Length or first bytes show that they aren't one.
+
+    The requests are also cancelled when their response didn't change since
+    the last crawl (see ConditionalDownloadMiddleware).
+    """
+
+    def __init__(self, settings):
+        super().__init__(settings)
+        self._spool_dir = settings.get('PDF_SPOOL_DIR') or None
+        self._check_downloads = settings.getbool('PDF_CHECK_DOWNLOADS')
+
+    def download_request(self, request, spider):
+        agent = _SpoolingAgent(
+            spool_dir=self._spool_dir,
+            check_pdf=(self._check_downloads
+                       and expects_pdf(request, spider)),
+            contextFactory=self._contextFactory,
+            pool=self._pool,
+            maxsize=getattr(spider, 'download_maxsize',
+                            self._default_maxsize),
+            warnsize=getattr(spider, 'download_warnsize',
+                             self._default_warnsize),
+            fail_on_dataloss=self._fail_on_dataloss,
+        )
+        return agent.download_request(request)
@@ -24,3 +24,5 @@ class Article(scrapy.Item):
     types = scrapy.Field()
     provider = scrapy.Field()
     date_scraped = scrapy.Field()
+    # The validators of the pdf response, stored once the item is stored
+    download_validators = scrapy.Field()
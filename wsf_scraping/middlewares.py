@@ -1,11 +1,28 @@
 # -*- coding: utf-8 -*-
 import os
+import re
 import logging
 import sentry_sdk
 from twisted.python import log
+from w3lib.url import canonicalize_url, url_query_cleaner
 from scrapy import signals
+from scrapy.http import Request
 from scrapy import logformatter
+from scrapy.exceptions import NotConfigured
+from tools import DatabaseConnector
+from wsf_scraping.handlers import (NotModified, SpooledResponse, expects_pdf,
+                                   get_download_validators)
 
+# The query parameters of the DSpace urls which don't change the document
+# they point to, like the `sequence` and `isAllowed` parameters of the WHO
+# IRIS bitstreams or the `show` parameter of their metadata pages. The other
+# urls keep them.
+IGNORED_URL_PARAMETERS = ['sequence', 'isAllowed', 'show']
+# DSpace repositories, like WHO IRIS, serve the metadata page of a document
+# at <base>/handle/<handle> and its files at
+# <base>/bitstream/handle/<handle>/<file name>
+_DSPACE_URL = re.compile(r'^[^?]*/(?:bitstream|handle)/')
+_DSPACE_HANDLE_URL = re.compile(r'^(.*?/)(?:bitstream/)?handle/(\d+/\d+)(/|$)')
 
 sentry_sdk.init(os.getenv('SENTRY_DSN'))
 
@@ -21,6 +38,30 @@ def log_to_sentry(event):
 log.addObserver(log_to_sentry)
 
 
+def get_document_key(url):
+    """Return the key identifying the document an url points to: its
+    canonical form (see w3lib's canonicalize_url) without scheme and
+    fragment, and without the IGNORED_URL_PARAMETERS for the DSpace
+    /bitstream/ and /handle/ urls. The metadata pages and the files of a
+    DSpace document share the key of its handle.
+
+    Args:
+        - url: The url of a document, or of any other page.
+
+    Returns:
+        - The key of the url, as a string.
+    """
+    key = canonicalize_url(url).split('://', 1)[-1]
+    if not _DSPACE_URL.match(key):
+        return key
+    url = url_query_cleaner(url, IGNORED_URL_PARAMETERS, remove=True)
+    key = canonicalize_url(url).split('://', 1)[-1]
+    match = _DSPACE_HANDLE_URL.match(key)
+    if match:
+        return '{}handle/{}'.format(match.group(1), match.group(2))
+    return key
+
+
 class PoliteLogFormatter(logformatter.LogFormatter):
     def dropped(self, item, exception, response, spider):
         return {
@@ -80,3 +121,193 @@ class WsfScrapingSpiderMiddleware(object):
     def spider_opened(self, spider):
         # spider.logger.info('Spider opened: %s' % spider.name)
         pass
+
+
+class ConditionalDownloadMiddleware(object):
+    """Only download again the pdfs of the publications already scraped if
+    they changed since the last crawl.
+
+    The validators (ETag, Last-Modified and Content-Length headers) of the
+    pdf responses are put in the `response_validators` meta key of their
+    request, carried by the items of save_pdf, and stored in the database,
+    by url, by the pipeline once the items are stored: a pdf whose
+    processing failed is downloaded again. On later crawls, the
+    requests to the urls of scraped publications are sent with
+    If-None-Match and If-Modified-Since headers: a 304 Not Modified
+    response fails them with NotModified. So does a response with the same
+    validators, cancelled by SpoolingDownloadHandler before its body is
+    downloaded.
+
+    The publications to scrape again are always downloaded again. Enabled by
+    the CONDITIONAL_DOWNLOADS setting.
+    """
+
+    def __init__(self, database, stats):
+        self.database = database
+        self.stats = stats
+        self.validators = {}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('CONDITIONAL_DOWNLOADS'):
+            raise NotConfigured
+        middleware = cls(
+            DatabaseConnector(crawler.settings['DATABASE_URL']),
+            crawler.stats,
+        )
+        crawler.signals.connect(
+            middleware.spider_opened,
+            signal=signals.spider_opened
+        )
+        return middleware
+
+    def spider_opened(self, spider):
+        self.validators = self.database.get_download_validators()
+        spider.logger.info(
+            'Loaded the download validators of %d urls',
+            len(self.validators),
+        )
+
+    def process_request(self, request, spider):
+        if 'download_validators' in request.meta:
+            return None
+        validators = self.validators.get(request.url)
+        if not validators or not expects_pdf(request, spider):
+            return None
+
+        if validators['etag']:
+            request.headers[b'If-None-Match'] = validators['etag']
+        if validators['last_modified']:
+            request.headers[b'If-Modified-Since'] = (
+                validators['last_modified']
+            )
+        request.meta['download_validators'] = validators
+        self.stats.inc_value('conditional_download/sent', spider=spider)
+        return None
+
+    def process_response(self, request, response, spider):
+        if response.status == 304 and 'download_validators' in request.meta:
+            self.stats.inc_value(
+                'conditional_download/not_modified',
+                spider=spider
+            )
+            raise NotModified(request.url)
+
+        if response.status != 200 or not expects_pdf(request, spider):
+            return response
+
+        if 'download_validators' in request.meta:
+            self.stats.inc_value(
+                'conditional_download/modified',
+                spider=spider
+            )
+        content_length = response.headers.get(b'content-length')
+        if content_length and content_length.isdigit():
+            content_length = int(content_length)
+        elif isinstance(response, SpooledResponse):
+            content_length = response.spool_file.size
+        else:
+            content_length = len(response.body)
+        request.meta['response_validators'] = get_download_validators(
+            response.headers,
+            content_length
+        )
+        return response
+
+    def process_exception(self, request, exception, spider):
+        if isinstance(exception, NotModified):
+            self.stats.inc_value(
+                'conditional_download/unchanged',
+                spider=spider
+            )
+        return None
+
+
+class KnownUrlsMiddleware(object):
+    """Drop the requests to the documents already scraped before they are
+    sent, instead of downloading them to find out from their hash.
+
+    At spider open, the urls of the scraped publications are loaded from the
+    database, indexed by their document key (see get_document_key). The
+    requests yielded by the spider, or its start requests, are then dropped
+    if their key is in the index: the pdf requests to a known url, with or
+    without its query parameters, and for DSpace repositories like WHO IRIS,
+    the requests to the metadata page of a known document too. Requests
+    with dont_filter set are left alone.
+
+    The publications to scrape again are always requested again. Enabled by
+    the SKIP_KNOWN_URLS setting.
+
+    Stats:
+        - known_urls/checked: The number of requests looked up.
+        - known_urls/skipped: The number of requests dropped.
+        - known_urls/hit_rate: skipped / checked, set when the spider
+                               closes.
+    """
+
+    def __init__(self, database, stats):
+        self.database = database
+        self.stats = stats
+        self.known_keys = set()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        if not crawler.settings.getbool('SKIP_KNOWN_URLS'):
+            raise NotConfigured
+        middleware = cls(
+            DatabaseConnector(crawler.settings['DATABASE_URL']),
+            crawler.stats,
+        )
+        crawler.signals.connect(
+            middleware.spider_opened,
+            signal=signals.spider_opened
+        )
+        crawler.signals.connect(
+            middleware.spider_closed,
+            signal=signals.spider_closed
+        )
+        return middleware
+
+    def spider_opened(self, spider):
+        self.known_keys = {
+            get_document_key(url)
+            for url in self.database.get_scraped_urls()
+        }
+        spider.logger.info(
+            'Loaded %d known document urls',
+            len(self.known_keys),
+        )
+
+    def spider_closed(self, spider):
+        checked = self.stats.get_value('known_urls/checked', spider=spider)
+        if not checked:
+            return
+        skipped = self.stats.get_value(
+            'known_urls/skipped',
+            0,
+            spider=spider
+        )
+        self.stats.set_value(
+            'known_urls/hit_rate',
+            skipped / checked,
+            spider=spider
+        )
+
+    def _filter(self, result, spider):
+        for request in result:
+            if isinstance(request, Request) and not request.dont_filter:
+                self.stats.inc_value('known_urls/checked', spider=spider)
+                if get_document_key(request.url) in self.known_keys:
+                    self.stats.inc_value('known_urls/skipped', spider=spider)
+                    spider.logger.debug(
+                        'Skipping the known url %s',
+                        request.url
+                    )
+                    continue
+            yield request
+
+    def process_spider_output(self, response, result, spider):
+        return self._filter(result, spider)
+
+    def process_start_requests(self, start_requests, spider):
+        return self._filter(start_requests, spider)
@@ -1,32 +1,286 @@
 # -*- coding: utf-8 -*-
 import os
+import shutil
 import logging
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 from scrapy import spiderloader
+from twisted.internet import defer, reactor
 from tools import DatabaseConnector
-from tools.utils import parse_keywords_files, get_file_hash
+from tools.utils import (parse_keywords_files, load_keyword_matcher,
+                         get_file_hash)
 from scrapy.utils.project import get_project_settings
 from scrapy.exceptions import DropItem
-from pdf_parser.pdf_parse import parse_pdf_document, grab_section
+from pdf_parser.pdf_parse import (parse_pdf_document, parse_pdf_tail,
+                                  get_page_count, grab_sections,
+                                  extract_pdf_text, parse_pdf_chunked,
+                                  PageChunking,
+                                  ConversionLimits, ConversionLimitExceeded)
+from pdf_parser.tools.extraction import SectionAnalyzer
+from pdf_parser.objects.PdfObjects import CompactPdfFile
+from pdf_parser.tools.cache import PdfFileCache
+from pdf_parser.tools.corpus import CorpusShardWriter
+from pdf_parser.backends import get_backend
+from pdf_parser.pdf_parse_async import parse_pdf_document_async
+from pdf_parser.tools.precheck import check_pdf, PdfRejected
+
+# The corpus shard writer of the current process, by corpus folder
+_corpus_writers = {}
+
+
+def add_to_corpus(corpus_dir, file_hash, pdf_file):
+    """Append a converted CompactPdfFile to the corpus shard of the current
+    process in the folder corpus_dir (see pdf_parser.tools.corpus). A shard
+    can only have one writer: each process of the pool has its own shard,
+    named after its pid.
+    """
+    writer = _corpus_writers.get(corpus_dir)
+    if writer is None:
+        os.makedirs(corpus_dir, exist_ok=True)
+        writer = CorpusShardWriter(
+            os.path.join(corpus_dir, 'corpus-{}'.format(os.getpid()))
+        )
+        _corpus_writers[corpus_dir] = writer
+    writer.add(file_hash, pdf_file)
+
+
+def analyse_pdf(pdf_path, section_analyzer, keyword_matcher,
+                keywords_context, limits=None, sections_tail_pages=0,
+                pdf_cache=None, file_hash=None, backend=parse_pdf_document,
+                text_prefilter=False, precheck_pages=0, chunking=None,
+                corpus_dir=None):
+    """Convert a pdf file to a python object and analyse it to find keywords
+    and sections.
+
+    This is the CPU intensive part of the pipeline, run in its process pool:
+    it only takes and returns picklable values.
+
+    If sections_tail_pages is set and there are no keywords to look for,
+    the sections are looked for in the last pages of the document only (see
+    parse_pdf_tail). The keywords need the whole document, which is then
+    converted once instead.
+
+    The pdf is converted by the parsing function backend (see
+    pdf_parser.backends).
+
+    If a PdfFileCache is given, the document is looked for in it using its
+    hash before being converted, and cached once fully converted.
+
+    If precheck_pages is set, the document is checked with check_pdf before
+    being converted, probing the text of its first precheck_pages pages if
+    needed.
+
+    If a PageChunking is given, big documents are converted by page ranges,
+    in parallel (see parse_pdf_chunked).
+
+    If text_prefilter is True, the raw text of the document is extracted
+    first, and the document is only converted if a keyword or a possible
+    section title appear in it.
+
+    If corpus_dir is set, the fully converted documents are appended to the
+    corpus shard of the process in this folder (see add_to_corpus).
+
+    Returns:
+        - A (sections, keywords, source) tuple, source being 'cache' if the
+          document came from the cache, 'prefilter' if it was skipped by the
+          text prefilter, else 'conversion'. None if the pdf couldn't be
+          converted.
+
+    Raises:
+        - ConversionLimitExceeded if the conversion exceeded the limits.
+        - PdfRejected if the document failed its pre-check.
+    """
+
+    result = analyse_pdf_before_conversion(
+        pdf_path,
+        section_analyzer,
+        keyword_matcher,
+        keywords_context,
+        limits,
+        pdf_cache,
+        file_hash,
+        text_prefilter,
+        precheck_pages,
+    )
+    if result:
+        return result
+
+    # Convert PDF content to text format
+    pdf_file = section_pdf_file = None
+    page_count = None
+    with open(pdf_path, 'rb') as f:
+        if sections_tail_pages and not keyword_matcher.keywords:
+            page_count = get_page_count(f)
+            pdf_file = section_pdf_file = parse_pdf_tail(
+                f,
+                section_analyzer,
+                sections_tail_pages,
+                page_count,
+                limits=limits,
+                compact=True,
+                backend=backend,
+            )
+            if not pdf_file:
+                return None
+
+            # The tail can already cover the whole document
+            if not page_count or len(pdf_file.pages) == page_count:
+                if pdf_cache:
+                    pdf_cache.put(file_hash, pdf_file)
+                if corpus_dir:
+                    add_to_corpus(corpus_dir, file_hash, pdf_file)
+
+        if not pdf_file:
+            pdf_file = parse_pdf_chunked(
+                f,
+                chunking or PageChunking(),
+                page_count,
+                backend=backend,
+                limits=limits,
+                compact=True,
+            )
+            section_pdf_file = section_pdf_file or pdf_file
+            if pdf_file and pdf_cache:
+                pdf_cache.put(file_hash, pdf_file)
+            if pdf_file and corpus_dir:
+                add_to_corpus(corpus_dir, file_hash, pdf_file)
+
+    if not pdf_file:
+        return None
+
+    sections, keyword_dict = analyse_pdf_file(
+        pdf_file,
+        section_analyzer,
+        keyword_matcher,
+        keywords_context,
+        section_pdf_file,
+    )
+    return sections, keyword_dict, 'conversion'
+
+
+def analyse_pdf_before_conversion(pdf_path, section_analyzer,
+                                  keyword_matcher, keywords_context,
+                                  limits=None, pdf_cache=None,
+                                  file_hash=None, text_prefilter=False,
+                                  precheck_pages=0):
+    """Run the steps of analyse_pdf preceding the conversion of a pdf file:
+    look for it in the PdfFileCache pdf_cache, then pre-check it and
+    pre-filter its text if enabled.
+
+    Returns:
+        - The (sections, keywords, source) tuple of analyse_pdf if the
+          document came from the cache or was skipped by the text prefilter,
+          else None: the document has to be converted.
+
+    Raises:
+        - ConversionLimitExceeded if the text extraction exceeded the limits.
+        - PdfRejected if the document failed its pre-check.
+    """
+    if pdf_cache:
+        pdf_file = pdf_cache.get(file_hash)
+        if pdf_file is not None:
+            sections, keyword_dict = analyse_pdf_file(
+                pdf_file,
+                section_analyzer,
+                keyword_matcher,
+                keywords_context,
+            )
+            return sections, keyword_dict, 'cache'
+
+    with open(pdf_path, 'rb') as f:
+        if precheck_pages:
+            reason = check_pdf(f, precheck_pages, limits)
+            if reason:
+                raise PdfRejected(pdf_path, reason)
+
+        if text_prefilter:
+            text = extract_pdf_text(f, limits)
+            if text is not None:
+                lines = text.splitlines()
+                if not (keyword_matcher.matches_any(lines)
+                        or section_analyzer.may_find_titles(lines)):
+                    return {}, {}, 'prefilter'
+    return None
+
+
+def analyse_pdf_data(data, section_analyzer, keyword_matcher,
+                     keywords_context, pdf_cache=None, file_hash=None,
+                     corpus_dir=None):
+    """Analyse a converted pdf file, given as the binary representation of
+    its CompactPdfFile (see CompactPdfFile.to_bytes), and cache it in the
+    PdfFileCache pdf_cache and the corpus of corpus_dir if given. Used to run
+    the analysis of the pdfs converted in the reactor thread in the process
+    pool.
+
+    Returns:
+        - The (sections, keywords, source) tuple of analyse_pdf.
+    """
+    pdf_file = CompactPdfFile.from_bytes(data)
+    if pdf_cache:
+        pdf_cache.put(file_hash, pdf_file)
+    if corpus_dir:
+        add_to_corpus(corpus_dir, file_hash, pdf_file)
+    sections, keyword_dict = analyse_pdf_file(
+        pdf_file,
+        section_analyzer,
+        keyword_matcher,
+        keywords_context,
+    )
+    return sections, keyword_dict, 'conversion'
+
+
+def analyse_pdf_file(pdf_file, section_analyzer, keyword_matcher,
+                     keywords_context, section_pdf_file=None):
+    """Find the sections and keywords of a converted pdf file, the sections
+    being looked for in section_pdf_file if given.
+
+    Returns:
+        - A (sections, keywords) tuple of dictionaries.
+    """
+
+    # Fetch references or other keyworded list
+    sections = {}
+    for keyword, section in grab_sections(
+            section_pdf_file or pdf_file, section_analyzer).items():
+
+        # If no section matchs, leave the attribute undefined
+        if section:
+            sections[keyword.title()] = section
+
+    # Fetch references or other keyworded list
+    keyword_dict = pdf_file.get_lines_by_keywords(
+        keyword_matcher,
+        keywords_context
+    )
+
+    return sections, keyword_dict
 
 
 class WsfScrapingPipeline(object):
-    def __init__(self):
+    def __init__(self, stats):
         """Initialise the pipeline, giveng it the settings and keywords."""
 
         self.settings = get_project_settings()
+        self.stats = stats
 
-        self.keywords = parse_keywords_files(
+        self.keyword_matcher = load_keyword_matcher(
             self.settings['KEYWORDS_FILE']
         )
+        self.keywords = self.keyword_matcher.keywords
 
         self.section_keywords = parse_keywords_files(
             self.settings['SECTIONS_KEYWORDS_FILE']
         )
+        self.section_analyzer = SectionAnalyzer(self.section_keywords)
 
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
-        self.logger.info(self.keywords)
+        self.logger.info('Loaded %d keywords', len(self.keywords))
+        if self.settings.getint('SECTIONS_TAIL_PAGES') and self.keywords:
+            self.logger.warning(
+                'SECTIONS_TAIL_PAGES is ignored: the pdfs are fully '
+                'converted to look for keywords'
+            )
 
         spider_loader = spiderloader.SpiderLoader.from_settings(self.settings)
         spiders = spider_loader.list()
@@ -35,55 +289,246 @@ class WsfScrapingPipeline(object):
             folder_path = os.path.join('results', 'pdfs', spider_name)
             os.makedirs(folder_path, exist_ok=True)
 
+        # The pdf analysis is run in separate processes, to avoid blocking
+        # the reactor and to use all the available cores.
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.settings.getint('PDF_PROCESS_POOL_SIZE') or None
+        )
+        self.parsing_backend = get_backend(self.settings['PARSING_METHOD'])
+        # Converting with pdftohtml processes driven by the reactor instead
+        self.async_conversion_semaphore = None
+        if self.settings.getbool('PDF_ASYNC_CONVERSION'):
+            if self.parsing_backend is not parse_pdf_document:
+                raise ValueError(
+                    'PDF_ASYNC_CONVERSION requires the pdftohtml backend, '
+                    'not PARSING_METHOD={!r}'.format(
+                        self.settings['PARSING_METHOD']
+                    )
+                )
+            self.async_conversion_semaphore = defer.DeferredSemaphore(
+                self.settings.getint('PDF_ASYNC_MAX_CONVERSIONS')
+            )
+        self.page_chunking = PageChunking(
+            min_pages=self.settings.getint('PDF_CHUNK_MIN_PAGES') or None,
+            chunk_pages=self.settings.getint('PDF_CHUNK_PAGES'),
+            workers=self.settings.getint('PDF_CHUNK_WORKERS'),
+        )
+        self.conversion_limits = ConversionLimits(
+            timeout=self.settings.getfloat('PDF_CONVERSION_TIMEOUT') or None,
+            cpu_time=self.settings.getint('PDF_CONVERSION_CPU_LIMIT') or None,
+            memory=(
+                self.settings.getint('PDF_CONVERSION_MEMORY_LIMIT') * 2 ** 20
+            ) or None,
+        )
+
+        # Parsed documents, to skip their conversion when scraped again
+        self.pdf_cache = None
+        if self.settings['PDF_CACHE_DIR']:
+            # The backends don't build the same files
+            self.pdf_cache = PdfFileCache(
+                os.path.join(
+                    self.settings['PDF_CACHE_DIR'],
+                    self.settings['PARSING_METHOD']
+                ),
+                self.settings.getint('PDF_CACHE_SIZE') * 2 ** 20 or None,
+            )
+
         self.database = DatabaseConnector(
             self.settings['DATABASE_URL']
         )
+        # Hashes of the items being analysed, with the Deferreds of the items
+        # with the same pdf waiting for them to be stored
+        self.pending_hashes = {}
         self.logger.info(
             'Pipeline initialized FEED_CONFIG=%s',
             self.settings.get('FEED_CONFIG'),
         )
 
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.stats)
+
+    def close_spider(self, spider):
+        self.executor.shutdown()
+
+    def _run_in_pool(self, func, *args):
+        """Run func(*args) in the process pool, and return a Deferred firing
+        with its result in the reactor thread.
+        """
+        d = defer.Deferred()
+
+        def _on_done(future):
+            error = future.exception()
+            if error is not None:
+                reactor.callFromThread(d.errback, error)
+            else:
+                reactor.callFromThread(d.callback, future.result())
+
+        self.executor.submit(func, *args).add_done_callback(_on_done)
+        return d
+
     def check_keywords(self, item, spider_name, base_pdf_path):
         """Convert the pdf file to a python object and analyse it to find
         keywords and section based on the section/keywords files provided.
+
+        The analysis is run in the process pool: this returns a Deferred
+        firing with the completed item.
         """
 
-        # Convert PDF content to text format
-        with open(item['pdf'], 'rb') as f:
+        self.logger.info(
+            'Processing: %s',
+            item['pdf']
+        )
 
-            self.logger.info(
-                'Processing: %s',
-                item['pdf']
+        if self.async_conversion_semaphore:
+            d = self._analyse_pdf_async(item)
+        else:
+            d = self._run_in_pool(
+                analyse_pdf,
+                item['pdf'],
+                self.section_analyzer,
+                self.keyword_matcher,
+                self.settings['KEYWORDS_CONTEXT'],
+                self.conversion_limits,
+                self.settings.getint('SECTIONS_TAIL_PAGES'),
+                self.pdf_cache,
+                item['hash'],
+                self.parsing_backend,
+                self.settings.getbool('PDF_TEXT_PREFILTER'),
+                self.settings.getint('PDF_PRECHECK_PROBE_PAGES'),
+                self.page_chunking,
+                self.settings['PDF_CORPUS_DIR'] or None,
             )
+        d.addCallbacks(
+            self._fill_item,
+            self._remove_pdf_on_error,
+            callbackArgs=(item, spider_name),
+            errbackArgs=(item,),
+        )
+        d.addErrback(self._drop_on_conversion_limit)
+        d.addErrback(self._drop_on_rejected_pdf)
+        return d
 
-            pdf_file = parse_pdf_document(f)
+    def _analyse_pdf_async(self, item):
+        """Analyse the pdf like analyse_pdf, but convert it with
+        parse_pdf_document_async: the steps preceding the conversion and the
+        analysis of the converted pdf are still run in the process pool, and
+        only the pdftohtml process is driven by the reactor. The tail pages
+        and the chunking are not used.
 
-            # If the PDF couldn't be converted, still remove the pdf file
+        Returns:
+            - A Deferred firing with the same result as analyse_pdf.
+        """
+        d = self._run_in_pool(
+            analyse_pdf_before_conversion,
+            item['pdf'],
+            self.section_analyzer,
+            self.keyword_matcher,
+            self.settings['KEYWORDS_CONTEXT'],
+            self.conversion_limits,
+            self.pdf_cache,
+            item['hash'],
+            self.settings.getbool('PDF_TEXT_PREFILTER'),
+            self.settings.getint('PDF_PRECHECK_PROBE_PAGES'),
+        )
+
+        def _convert(result):
+            if result:
+                return result
+            with open(item['pdf'], 'rb') as f:
+                d = parse_pdf_document_async(
+                    f,
+                    self.conversion_limits,
+                    compact=True,
+                    semaphore=self.async_conversion_semaphore,
+                )
+            return d.addCallback(_analyse)
+
+        def _analyse(pdf_file):
             if not pdf_file:
-                os.remove(item['pdf'])
-                return item
-
-            for keyword in self.section_keywords:
-                # Fetch references or other keyworded list
-                section = grab_section(pdf_file, keyword)
-
-                # Add references and PDF name to JSON returned file
-                # If no section matchs, leave the attribute undefined
-                if section:
-                    item['sections'][keyword.title()] = section
-
-            # Fetch references or other keyworded list
-            keyword_dict = pdf_file.get_lines_by_keywords(
-                self.keywords,
-                self.settings['KEYWORDS_CONTEXT']
+                return None
+            return self._run_in_pool(
+                analyse_pdf_data,
+                pdf_file.to_bytes(),
+                self.section_analyzer,
+                self.keyword_matcher,
+                self.settings['KEYWORDS_CONTEXT'],
+                self.pdf_cache,
+                item['hash'],
+                self.settings['PDF_CORPUS_DIR'] or None,
             )
 
-            # Add references and PDF name to JSON returned file
-            # If no section matchs, leave the attribute undefined
-            if keyword_dict:
-                item['keywords'] = keyword_dict
+        return d.addCallback(_convert)
 
-        # has_keywords = len(item['keywords'])
+    def _remove_pdf_on_error(self, failure, item):
+        """Don't leave the pdf file behind if its analysis failed. The pdfs
+        rejected by the pre-check are moved to the quarantine folder instead,
+        if there is one.
+        """
+        quarantine_dir = self.settings['PDF_QUARANTINE_DIR']
+        if quarantine_dir and failure.check(PdfRejected):
+            folder_path = os.path.join(quarantine_dir, failure.value.reason)
+            try:
+                os.makedirs(folder_path, exist_ok=True)
+                # The quarantine folder may be on another filesystem
+                shutil.move(
+                    item['pdf'],
+                    os.path.join(folder_path, os.path.basename(item['pdf']))
+                )
+                return failure
+            except OSError as e:
+                self.logger.warning(
+                    "Couldn't quarantine the pdf %s: %s", item['pdf'], e
+                )
+        try:
+            os.unlink(item['pdf'])
+        except FileNotFoundError:
+            pass
+        return failure
+
+    def _drop_on_conversion_limit(self, failure):
+        """Drop the items whose conversion was killed, so that the crawl
+        carries on.
+        """
+        failure.trap(ConversionLimitExceeded)
+        self.stats.inc_value(
+            'pdf_conversion/limit_exceeded/{}'.format(failure.value.limit)
+        )
+        raise DropItem(str(failure.value))
+
+    def _drop_on_rejected_pdf(self, failure):
+        """Drop the items whose pdf failed the pre-check, counting them by
+        reason.
+        """
+        failure.trap(PdfRejected)
+        self.stats.inc_value(
+            'pdf_precheck/{}'.format(failure.value.reason)
+        )
+        raise DropItem(str(failure.value))
+
+    def _fill_item(self, result, item, spider_name):
+        """Add the result of analyse_pdf to the item."""
+
+        # If the PDF couldn't be converted, still remove the pdf file
+        if not result:
+            os.remove(item['pdf'])
+            return item
+
+        sections, keyword_dict, source = result
+        if source == 'prefilter':
+            self.stats.inc_value('pdf_prefilter/skipped')
+        elif self.settings.getbool('PDF_TEXT_PREFILTER'):
+            self.stats.inc_value('pdf_prefilter/passed')
+        if self.pdf_cache and source != 'prefilter':
+            self.stats.inc_value(
+                'pdf_cache/hit' if source == 'cache' else 'pdf_cache/miss'
+            )
+
+        # Add references and PDF name to JSON returned file
+        # If no section matchs, leave the attribute undefined
+        item['sections'].update(sections)
+        if keyword_dict:
+            item['keywords'] = keyword_dict
 
         # If we need to keep the pdf, move it, else delete it
         try:
@@ -100,63 +545,108 @@ class WsfScrapingPipeline(object):
         return item
 
     def process_item(self, item, spider):
-        """Process items sent by the spider."""
+        """Process items sent by the spider.
+
+        Return a Deferred, firing once the item is analysed and stored. The
+        items with the same pdf as an item being analysed wait for it to be
+        stored, then are checked against the database again, so the same pdf
+        is never stored twice.
+        """
 
         if not item['pdf']:
             raise DropItem(
                 'Empty filename, could not parse the pdf.'
             )
-        item['hash'] = get_file_hash(item['pdf'])
+        # The spiders hash the pdfs while saving them
+        if not item.get('hash'):
+            item['hash'] = get_file_hash(item['pdf'])
+        waiting = self.pending_hashes.get(item['hash'])
+        if waiting is not None:
+            d = defer.Deferred()
+            waiting.append(d)
+            return d.addCallback(lambda _: self.process_item(item, spider))
         db_item = self.database.get_scraping_info(item['hash'])
 
         if not db_item:
-            full_item = self.check_keywords(item, spider.name, item['pdf'])
-            if not item.get('text'):
-                raise DropItem(
-                    'Empty file text, could not find section or keywords.'
-                )
-            id_provider = self.database.get_or_create_name(
-                spider.name, 'provider'
-            )
-            id_publication = self.database.insert_full_publication(
-                full_item,
-                id_provider
-            )
-            self.database.insert_joints_and_text(
-                'section',
-                full_item.get('sections'),
-                id_publication
-            )
-            self.database.insert_joints_and_text(
-                'keyword',
-                full_item.get('keywords'),
-                id_publication
-            )
-            self.database.insert_joints(
-                'type',
-                full_item.get('types'),
-                id_publication
-            )
-            self.database.insert_joints(
-                'subject',
-                full_item.get('subjects'),
-                id_publication
-            )
+            d = self.check_keywords(item, spider.name, item['pdf'])
+            d.addCallback(self._insert_item, spider)
 
         elif db_item.scrape_again:
+            d = self.check_keywords(item, spider.name, item['pdf'])
+            d.addCallback(self._update_item, db_item)
 
-            # Convert the item to dict so we can give it an ID
-            full_item = dict(self.check_keywords(
-                item, spider.name, item['pdf']
-            ))
-
-            full_item['id'] = db_item.id
-            self.database.update_full_publication(full_item)
         else:
             # File is already scraped in the database
             os.unlink(item['pdf'])
+            self._store_download_validators(item)
             raise DropItem(
                 'Item footprint is already in the database'
             )
 
+        self.pending_hashes[item['hash']] = []
+        d.addCallback(self._store_download_validators)
+        return d.addBoth(self._release_hash, item['hash'])
+
+    def _release_hash(self, result, file_hash):
+        """Let the items waiting for the item of file_hash through, once it
+        is stored or dropped.
+        """
+        for waiting in self.pending_hashes.pop(file_hash):
+            waiting.callback(None)
+        return result
+
+    def _store_download_validators(self, item):
+        """Store the validators of the pdf response of a stored item (see
+        ConditionalDownloadMiddleware), so that it is only downloaded again
+        if it changed. Only the items analysed and stored get there.
+        """
+        validators = item.pop('download_validators', None)
+        if validators:
+            self.database.set_download_validators(item['uri'], validators)
+        return item
+
+    def _insert_item(self, full_item, spider):
+        """Store a newly analysed item in the database."""
+
+        if not full_item.get('text'):
+            raise DropItem(
+                'Empty file text, could not find section or keywords.'
+            )
+        id_provider = self.database.get_or_create_name(
+            spider.name, 'provider'
+        )
+        id_publication = self.database.insert_full_publication(
+            full_item,
+            id_provider
+        )
+        self.database.insert_joints_and_text(
+            'section',
+            full_item.get('sections'),
+            id_publication
+        )
+        self.database.insert_joints_and_text(
+            'keyword',
+            full_item.get('keywords'),
+            id_publication
+        )
+        self.database.insert_joints(
+            'type',
+            full_item.get('types'),
+            id_publication
+        )
+        self.database.insert_joints(
+            'subject',
+            full_item.get('subjects'),
+            id_publication
+        )
+        return full_item
+
+    def _update_item(self, item, db_item):
+        """Update an already stored item with its new analysis."""
+
+        # Convert the item to dict so we can give it an ID
+        full_item = dict(item)
+
+        full_item['id'] = db_item.id
+        self.database.update_full_publication(full_item)
         return full_item
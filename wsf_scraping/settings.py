@@ -48,6 +48,37 @@ DOWNLOAD_TIMEOUT = 20
 DOWNLOAD_FAIL_ON_DATALOSS = True
 DOWNLOAD_DELAY = 0.25
 
+# Write the pdf responses to files while they are downloaded, in the
+# PDF_SPOOL_DIR folder (the system's temporary folder if empty), rather than
+# holding them in memory
+DOWNLOAD_HANDLERS = {
+    'http': 'wsf_scraping.handlers.SpoolingDownloadHandler',
+    'https': 'wsf_scraping.handlers.SpoolingDownloadHandler',
+}
+PDF_SPOOL_DIR = ''
+# Cancel the downloads expected to be pdfs (the requests to the spiders'
+# save_pdf) as soon as their headers or first bytes show they are not
+PDF_CHECK_DOWNLOADS = True
+
+# Only download again the pdfs of the scraped publications if they changed
+# since the last crawl, using the ETag, Last-Modified and Content-Length
+# headers of their last download, stored in the database once they are
+# analysed
+CONDITIONAL_DOWNLOADS = True
+DOWNLOADER_MIDDLEWARES = {
+    'wsf_scraping.middlewares.ConditionalDownloadMiddleware': 560,
+}
+
+# Don't request the documents of the publications already scraped at all, by
+# matching the urls yielded by the spiders against the publication urls
+# stored in the database. This replaces the conditional downloads for the
+# known urls: their changes are then never seen, so it is disabled by
+# default.
+SKIP_KNOWN_URLS = False
+SPIDER_MIDDLEWARES = {
+    'wsf_scraping.middlewares.KnownUrlsMiddleware': 550,
+}
+
 HTTPCACHE_ENABLED = False
 
 AUTOTHROTTLE_ENABLED = True
@@ -68,12 +99,71 @@ NICE_GET_HISTORY = False
 NICE_GET_EVIDENCES = False
 NICE_ARTICLES_COUNT = -1
 
+# Backend converting the pdfs (see pdf_parser.backends): pdftotext, which
+# runs poppler's pdftohtml, pdfminer, which requires pdfminer.six, or
+# poppler, which requires python-poppler and runs in the worker processes
+PARSING_METHOD = 'pdftotext'  # pdftotext|pdfminer|poppler
+
 # Wether or not keep the PDF on a keyword match
-PARSING_METHOD = 'pdftotext'  # pdftotext|pdfminer
 KEEP_PDF = False
 DOWNLOAD_ONLY = False
 KEYWORDS_CONTEXT = 0
 
+# Number of processes used to analyse the pdfs (0 to use every core)
+PDF_PROCESS_POOL_SIZE = 0
+
+# Limits of each pdf conversion: wall-clock and CPU time (seconds) and
+# memory (megabytes). Set to 0 to disable. Conversions exceeding them are
+# killed, and their items dropped.
+PDF_CONVERSION_TIMEOUT = 600
+PDF_CONVERSION_CPU_LIMIT = 300
+PDF_CONVERSION_MEMORY_LIMIT = 2048
+
+# The pdfs with more pages than PDF_CHUNK_MIN_PAGES (0 to disable) are
+# converted by ranges of PDF_CHUNK_PAGES pages, PDF_CHUNK_WORKERS at a time,
+# each range having the conversion limits above.
+PDF_CHUNK_MIN_PAGES = 0
+PDF_CHUNK_PAGES = 200
+PDF_CHUNK_WORKERS = 4
+
+# Convert the pdfs with pdftohtml processes spawned by the reactor, at most
+# PDF_ASYNC_MAX_CONVERSIONS at a time, instead of in the process pool. The
+# cache, pre-check, text pre-filter and analysis still run in the process
+# pool, but the tail pages and chunking are not used in this mode, which
+# requires the pdftotext (pdftohtml) PARSING_METHOD.
+PDF_ASYNC_CONVERSION = False
+PDF_ASYNC_MAX_CONVERSIONS = 8
+
+# If set, only convert the last pages of the pdfs (growing the window until a
+# section is found) to look for sections. Only used with an empty
+# KEYWORDS_FILE: the keywords are looked for in the whole pdfs, which are then
+# converted once.
+SECTIONS_TAIL_PAGES = 0
+
+# Folder where the parsed pdfs are cached, by hash, to skip their conversion
+# when they are scraped again (empty to disable), and maximum size of this
+# cache in megabytes (0 for no limit). The least recently used are removed.
+PDF_CACHE_DIR = './results/pdf_cache'
+PDF_CACHE_SIZE = 1024
+
+# Folder where the converted pdfs are appended to corpus shards (see
+# pdf_parser.tools.corpus), one per process of the pool, to be read again
+# without converting them. Empty to disable.
+PDF_CORPUS_DIR = ''
+
+# Extract the raw text of the pdfs with pdftotext first, and skip their
+# conversion if no keyword and no section title can be found in it
+PDF_TEXT_PREFILTER = False
+
+# Check the pdfs before converting them, and drop the corrupt, encrypted and
+# image-only ones. The text of the first pages, then of as many pages spread
+# through the rest of the pdf, is probed when the raw file is not conclusive
+# (0 to disable the check). The rejected pdfs are moved to a folder per reason
+# of the quarantine folder, or deleted if it is empty. Nothing removes the
+# quarantined pdfs: only set it to inspect the rejections of a crawl.
+PDF_PRECHECK_PROBE_PAGES = 3
+PDF_QUARANTINE_DIR = ''
+
 # Jsonlines are cleaner for big feeds
 FEED_FORMAT = 'jsonlines'
 FEED_EXPORT_ENCODING = 'utf-8'
@@ -1,9 +1,15 @@
 import scrapy
+import hashlib
 import tempfile
+from scrapy.exceptions import IgnoreRequest
 from scrapy.spidermiddlewares.httperror import HttpError
 from twisted.internet.error import DNSLookupError
 from twisted.internet.error import TimeoutError
 from wsf_scraping.items import Article
+from wsf_scraping.handlers import is_pdf_response
+
+# Size of the blocks the pdfs are written and hashed by
+WRITE_BLOCK_SIZE = 65536
 
 
 class BaseSpider(scrapy.Spider):
@@ -27,6 +33,10 @@ class BaseSpider(scrapy.Spider):
             request = failure.request
             self.logger.warning('TimeoutError on %s', request.url)
 
+        elif failure.check(IgnoreRequest):
+            # e.g. the downloads cancelled because they are not pdfs
+            self.logger.info('Ignored request (%s)', failure.value)
+
         else:
             self.logger.error(repr(failure))
 
@@ -35,11 +45,29 @@ class BaseSpider(scrapy.Spider):
         content_type = response_headers.get('content-type', '').split(b';')[0]
         return desired_extension == content_type
 
+    def _write_pdf(self, body):
+        """Write a response body to a temporary file, hashing each block as
+        it is written. Return the file name and the md5 hash of the body.
+        """
+        hasher = hashlib.md5()
+        body = memoryview(body)
+        with tempfile.NamedTemporaryFile(delete=False) as tf:
+            for start in range(0, len(body), WRITE_BLOCK_SIZE):
+                block = body[start:start + WRITE_BLOCK_SIZE]
+                hasher.update(block)
+                tf.write(block)
+        return tf.name, hasher.hexdigest()
+
     def save_pdf(self, response):
         """ Save the response body to a temporary PDF file.
 
-        If the response body is PDF-typed, save the PDF to a tempfile to parse
-        it later. Else, just drop te item.
+        If the response body is a PDF, either typed as one or binary and
+        starting with the pdf header (see is_pdf_response), save the PDF to a
+        tempfile to parse it later. Else, just drop te item. The md5 hash of
+        the file is computed while it is written, and stored in the item's
+        `hash` field.
+        The responses spooled by SpoolingDownloadHandler are already written
+        and hashed: their file is used as is.
 
         The item will be later deleted in the pipeline.py file.
 
@@ -52,13 +80,15 @@ class BaseSpider(scrapy.Spider):
 
         data_dict = response.meta.get('data_dict', {})
 
-        is_pdf = self._check_headers(response.headers)
+        is_pdf = is_pdf_response(response)
 
         if not is_pdf:
             self.logger.info('Not a PDF, aborting (%s)', response.url)
             return
 
-        if not response.body:
+        spool_file = getattr(response, 'spool_file', None)
+        size = spool_file.size if spool_file else len(response.body)
+        if not size:
             self.logger.warning(
                 'Empty filename or content, could not save the file.'
                 ' [Url: %s]',
@@ -67,9 +97,10 @@ class BaseSpider(scrapy.Spider):
             return
 
         # Download PDF file to /tmp
-        with tempfile.NamedTemporaryFile(delete=False) as tf:
-            tf.write(response.body)
-            filename = tf.name
+        if spool_file:
+            filename, file_hash = spool_file.claim(), spool_file.hash
+        else:
+            filename, file_hash = self._write_pdf(response.body)
 
         article = Article({
             'title': data_dict.get('title'),
@@ -79,8 +110,10 @@ class BaseSpider(scrapy.Spider):
             'types': data_dict.get('types'),
             'subjects': data_dict.get('subjects'),
             'pdf': filename,
+            'hash': file_hash,
             'sections': {},
-            'keywords': {}
+            'keywords': {},
+            'download_validators': response.meta.get('response_validators'),
         })
 
         return article